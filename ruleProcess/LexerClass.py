@@ -1,10 +1,15 @@
+import re
+import functools
+import regexBackends
+
 #########################
 # Custom Error Classes
 #########################
 
 class LexerClass:
 
-    def __init__(self,lexicon,ukToken):
+    def __init__(self,lexicon,ukToken,positional=False,dispatch=None,dispatchDefault=None,dispatchGuards=None,
+        startChars=None,startGuards=None):
         '''
         Steps through rule strings searching for 
         high-level rule string components.
@@ -16,53 +21,158 @@ class LexerClass:
         - Entity Token
         - Plurality Token (uncertainty)
         - Logical AND/OR Tokens
+
+        If "positional" is True, token classes are
+        called with the whole rule string and the
+        current index, "tok_c(inputString,idx)", and
+        their "start"/"end" spans are absolute positions
+        in the rule string.  No suffix of the rule string
+        is copied while lexing.  Otherwise each token
+        class receives the suffix "inputString[idx:]".
+
+        Unknown regions are built as
+        "ukToken(inputString,start,end)".
+
+        "dispatch" optionally maps the character at the
+        current index to the token classes which can start
+        with it, "dispatchDefault" lists the classes for
+        any other character.  Only those classes are tried
+        first, and the rest of the lexicon is probed as a
+        fallback if none of them match.  How often each 
+        case happens is counted in "dispatchStats".
+
+        "dispatchGuards" is a list of (matcher,classes)
+        pairs for token classes that can start with any
+        character.  If the matcher finds its pattern after
+        the current index, those classes are tried too.
+
+        "startChars" optionally lists every character a
+        token can start with.  When no token is found, 
+        the lexer jumps to the next of those characters
+        instead of probing each position of the unknown
+        region.  "startGuards" are matchers for tokens
+        that can start with any character: if one finds
+        its pattern after the current index, positions
+        are probed one by one as before.
         '''
         self.lexicon=lexicon
         self.ukToken=ukToken
-        
+        self.positional=positional
+        self.dispatch=None
+        if dispatch is not None:
+            self.set_dispatch(dispatch,dispatchDefault,dispatchGuards)
+        self.dispatchStats={'dispatched':0,'fallback':0}
+        self.skipPattern=None
+        if startChars is not None:
+            self.set_start_chars(startChars,startGuards)
+
+    def set_dispatch(self,dispatch,dispatchDefault=None,dispatchGuards=None):
+        '''
+        Stores the first-character dispatch table.  Token 
+        classes are kept in lexicon order, and each entry
+        is paired with the classes left for the fallback.
+        '''
+        def _entry(classes):
+            first=[c for c in self.lexicon if c in classes]
+            rest=[c for c in self.lexicon if c not in classes]
+            return((first,rest))
+        self.dispatchTable=dispatch
+        self.dispatch={ch:_entry(classes) for ch,classes in dispatch.items()}
+        self.dispatchDefault=_entry(dispatchDefault if dispatchDefault is not None else [])
+        self.dispatchGuards=[(m,_entry(classes)) for m,classes in (dispatchGuards if dispatchGuards is not None else [])]
+
+    def set_start_chars(self,startChars,startGuards=None):
+        '''
+        Compiles the pattern which skips over characters
+        no token can start with.
+        '''
+        self.startChars=set(startChars)
+        self.startGuards=startGuards if startGuards is not None else []
+        self.skipPattern=regexBackends.compile('[^%s]+' %(''.join([re.escape(c) for c in sorted(self.startChars)])))
+
+    def next_start(self,inputString,idx):
+        '''
+        Returns the first index from "idx" where a token
+        could start.
+        '''
+        if self.skipPattern is None:
+            return(idx)
+        for guard in self.startGuards:
+            if guard(inputString,pos=idx):
+                return(idx)
+        skip=self.skipPattern.match(inputString,idx)
+        return(idx if skip is None else skip.end())
+
+    def reset_dispatch_stats(self):
+        self.dispatchStats={'dispatched':0,'fallback':0}
+
     def search_cur_pos(self,inputString,idx):
         '''
         Finds matches at current position of inputString
         using token library
         '''
-        #Start reading rule string from current index:
-        inputString_frag=inputString[idx:]
-        #Search the current token libraries:
+        if self.dispatch is None:
+            return(self.probe(self.lexicon,inputString,idx))
+        #Try the classes which can start with the
+        # current character first:
+        first,rest=self.dispatch.get(inputString[idx],self.dispatchDefault)
+        for guard,(guardFirst,_) in self.dispatchGuards:
+            if any([c not in first for c in guardFirst]) and guard(inputString,pos=idx+1):
+                first=[c for c in self.lexicon if c in first or c in guardFirst]
+                rest=[c for c in rest if c not in first]
+        goodTokens=self.probe(first,inputString,idx)
+        if len(goodTokens)>0:
+            self.dispatchStats['dispatched']+=1
+            return(goodTokens)
+        #Fall back to the rest of the token library:
+        self.dispatchStats['fallback']+=1
+        return(self.probe(rest,inputString,idx))
+
+    def probe(self,tokenClasses,inputString,idx):
+        '''
+        Builds each of "tokenClasses" at the current
+        position and returns those that detect a token.
+        '''
         goodTokens=[]
-        for tok_c in self.lexicon:
+        for tok_c in tokenClasses:
             try:
-                tok_i=tok_c(inputString_frag)
+                if self.positional:
+                    tok_i=tok_c(inputString,idx)
+                else:
+                    #Start reading rule string from current index:
+                    tok_i=tok_c(inputString[idx:])
             except:
                 continue
             if tok_i.detectFun():
                 goodTokens.append(tok_i)
         return(goodTokens)
 
-    def parseMain(self,inputString):
+    def iter_tokens(self,inputString,start=0):
         '''
-        Main method to parse rule string into a list of 
-        tokens.
+        Generator which lexes a rule string, yielding
+        each token as soon as it is recognized.  Lexing
+        begins at index "start".
 
         Uses ruleString input and increments along the
         ruleString to identify tokens.
 
         If no tokens are identified, the current index
-        is incremented by 1 until a match is found.
+        moves to the next position a token could start
+        at until a match is found.
 
         Portions of the rule string that aren't recognized
-        are returned as "unknownTokens".  Warnings are 
-        returned if this is the case.
-        '''
-        #Current index initialized to 0
-        idx=0
-        #Resolution flag: are we recognizing the string 
-        # currently?
-        resolved=True
-        #Unknown location lists for error logging:
-        m_start=[]
-        m_end=[]
-        #Output Token List:
-        tokens=[]
+        are yielded as "unknownTokens".  If the lexer has
+        no "ukToken" a ruleStringParsingError is raised
+        instead.
+
+        Callers can stop early, e.g. after checking the
+        first token, without lexing the rest of the rule.
+        '''
+        #Current index initialized to "start"
+        idx=start
+        #Start of the current unknown region, None
+        # while the string is being recognized:
+        uk_start=None
         while idx<len(inputString):
             #Call the token search function:
             tokList=self.search_cur_pos(inputString,idx)
@@ -70,80 +180,224 @@ class LexerClass:
             # element.
             # - Cases where two tokens are matched
             #   will result in an error.
-            # - An empty list will trigger an 
-            #   increment of +1 to the current index:
+            # - An empty list moves the current index
+            #   to the next possible token start:
             if len(tokList)>1:
                 raise MultipleTokensError(idx,tokList)
             elif len(tokList)==0:
                 #Catalog the position where no
-                # match was found:
-                # Increment by 1, then search again
-                if resolved==True:
-                    m_start.append(idx)
-                resolved=False
-                idx+=1
+                # match was found, then search again
+                if uk_start is None:
+                    uk_start=idx
+                idx=self.next_start(inputString,idx+1)
             else:
                 # If a match was found after
-                # not being resolved, set
-                # resolved to True and append
-                # the current index to the uk_end 
-                # list.
-                if resolved is False:
-                    resolved=True
-                    m_end.append(idx)
-                    if self.ukToken is not None:
-                        tok=self.ukToken(inputString[m_start[-1]:m_end[-1]])
-                        tokens.append(tok)
-                    else:
-                        tokens.append(None)
+                # not being resolved, the unknown
+                # region ends at the current index.
+                if uk_start is not None:
+                    yield(self.unknown_token(inputString,uk_start,idx))
+                    uk_start=None
                 #Get matched token:
                 tok=tokList[0]
-                #Mark the match start:
-                m_start.append(idx)
-                #Get matched position using token matchFun method:
-                sch=tok.matchFun()
-                sch_end=sch.end()
-                ### Branching check for 2nd stub:
-                #  If the last added mono has left square bracket
-                #  and current mono has right bracket, set the mono
-                #  "isextendbranch" to "True"
-                #if len(tokens)>0:
-                #    if tokens[-1].__name__=='reactionToken':
-                #        if tok.token.__name__=='monoToken':
-                #            if tokens[-1].token.ligand_token[0].token.branching['leftBracket'] and tok.token.branching['rightBracket']:
-                #                tok.token.isextendbranch=True
-                #Append the found token to the token list:
-                tokens.append(tok)
-                #Mark the match end:
-                m_end.append(idx+sch_end)
-                #Increment starting position by
-                # distnace to the end of match
-                idx+=sch_end
-            
-        #If uk_start has an index and uk_end
-        # is missing a paired index, means the 
-        # end of the string was reached.  End 
-        # index is also unknown:
-        if len(m_start)>len(m_end):
-            m_end.append(idx)
-            tok=self.ukToken(inputString[m_start[-1]:m_end[-1]])
-            tokens.append(tok)
-        #If there were any unknown regions 
-        # in the ruleString, raise a
-        # ruleStringParsingError.
-        #Otherwise, return the list of tokens
-        if None in tokens:
-            #Find where the None token is
-            # then report error:
-            missingLocs=[i for x,i in enumerate(tokens) if x is None]
-            uk_start,uk_end=[[m_start[i],m_end[i]] for i in missingLocs]
-            raise ruleStringParsingError(self.ruleString,uk_start,uk_end)
-        else:
-            return(tokens)
+                #Move the starting position to the end
+                # of match, positional tokens report 
+                # absolute spans:
+                idx=tok.end if self.positional else idx+tok.end
+                yield(tok)
+        #The end of the string was reached in an
+        # unknown region:
+        if uk_start is not None:
+            yield(self.unknown_token(inputString,uk_start,idx))
+
+    def unknown_token(self,inputString,uk_start,uk_end):
+        '''
+        Builds the token for an unrecognized region, or
+        raises a ruleStringParsingError if the lexer has
+        no "ukToken".
+        '''
+        if self.ukToken is None:
+            raise ruleStringParsingError(inputString,[uk_start],[uk_end])
+        return(self.ukToken(inputString,uk_start,uk_end))
+
+    def parseMain(self,inputString):
+        '''
+        Main method to parse rule string into a list of 
+        tokens, see "iter_tokens".
+        '''
+        return(list(self.iter_tokens(inputString)))
 
     def __call__(self,inputString):
         return(self.parseMain(inputString))
 
+class CachedLexer:
+
+    def __init__(self,lexer,maxsize=4096,freeze=None):
+        '''
+        Bounded least-recently-used cache in front of a
+        lexer, keyed on the string being lexed and the
+        index lexing starts at.
+
+        Used for the fragments that reaction and
+        multi-entity tokens lex again (ligands, "from"/"to"
+        entities, options), which repeat across rules. 
+        Token lists are returned as tuples, and every
+        token is passed to "freeze" before it is cached,
+        so that the shared results can't be altered by
+        callers.
+
+        Lookups are thread-safe.  Hit/miss statistics are
+        returned by "cache_info".
+        '''
+        self.lexer=lexer
+        self.maxsize=maxsize
+        self.freeze=freeze
+        self.cachedLex=functools.lru_cache(maxsize=maxsize)(self.lex)
+
+    def lex(self,inputString,start=0):
+        tokens=tuple(self.lexer.iter_tokens(inputString,start))
+        if self.freeze is not None:
+            for tok in tokens:
+                self.freeze(tok)
+        return(tokens)
+
+    def cache_info(self):
+        return(self.cachedLex.cache_info())
+
+    def cache_clear(self):
+        self.cachedLex.cache_clear()
+
+    def iter_tokens(self,inputString,start=0):
+        return(iter(self.cachedLex(inputString,start)))
+
+    def __call__(self,inputString):
+        return(self.cachedLex(inputString,0))
+
+class TokenInterner:
+
+    def __init__(self,freeze=None):
+        '''
+        Table of shared token instances, keyed on the
+        token class and the rule text the token is
+        built from.
+
+        Tokens which only depend on their text (such as
+        "GlcNAc(b1-4)" or "Man(a1-3)") are built once and
+        the same instance is returned for every other
+        occurrence.  Every token is passed to "freeze"
+        when it is built, so shared tokens can't be
+        altered by callers.
+
+        Interning is turned off by setting "enabled" to
+        False.  Hit/miss counts are returned by "info".
+        '''
+        self.tokens=dict()
+        self.enabled=True
+        self.freeze=freeze
+        self.hits=0
+        self.misses=0
+
+    def info(self):
+        return({'hits':self.hits,'misses':self.misses,'size':len(self.tokens)})
+
+    def clear(self):
+        self.tokens.clear()
+        self.hits=0
+        self.misses=0
+
+    def __call__(self,tokenClass,text,build):
+        '''
+        Returns the shared "tokenClass" token for "text",
+        calling "build()" to create it the first time.
+        '''
+        if not self.enabled:
+            return(build())
+        key=(tokenClass,text)
+        tok=self.tokens.get(key)
+        if tok is None:
+            self.misses+=1
+            tok=build()
+            if self.freeze is not None:
+                self.freeze(tok)
+            self.tokens[key]=tok
+        else:
+            self.hits+=1
+        return(tok)
+
+class IncrementalLexer:
+
+    def __init__(self,lexer,restart,guards=None):
+        '''
+        Re-lexes edited rule strings from a previous
+        token stream, see "relex".  "lexer" must be a 
+        positional LexerClass.
+
+        "restart(inputString,editStart)" returns the 
+        earliest index from which tokens may read text at
+        or after "editStart" when they are matched.  Tokens
+        ending before it are kept.
+
+        "guards" are matchers for tokens which can read 
+        the whole rest of the rule.  If one of them finds
+        its pattern in the old or new rule string, the 
+        new rule string is lexed in full.
+        '''
+        if not lexer.positional:
+            raise Exception('Incremental lexing needs a positional lexer')
+        self.lexer=lexer
+        self.restart=restart
+        self.guards=guards if guards is not None else []
+        self.stats={'incremental':0,'full':0,'relexed':0,'reused':0}
+
+    def relex(self,inputString,tokens,editStart,editEnd,newText):
+        '''
+        Replaces "inputString[editStart:editEnd]" with
+        "newText" and returns the new rule string and its
+        tokens.  "tokens" are the tokens of "inputString".
+
+        Tokens before the edit are kept as they are, 
+        their text is unchanged.  Lexing starts
+        again before the edit and stops as soon as a token
+        ends where one of the old tokens after the edit
+        started: matching only reads forward, so the rest
+        of the old tokens are kept, moved by the change 
+        in length.  The tokens returned are the same as
+        lexing the new rule string in full.
+        '''
+        newString=''.join([inputString[:editStart],newText,inputString[editEnd:]])
+        offset=len(newText)-(editEnd-editStart)
+        if any([guard(inputString) or guard(newString) for guard in self.guards]):
+            self.stats['full']+=1
+            return(newString,list(self.lexer.iter_tokens(newString)))
+        self.stats['incremental']+=1
+        #Keep the tokens which end before the restart 
+        # position.  A trailing unknown region is lexed 
+        # again, it may continue into the edit:
+        restart=self.restart(inputString,editStart)
+        head=[]
+        for tok in tokens:
+            if tok.end>restart:
+                break
+            head.append(tok)
+        while len(head)>0 and isinstance(head[-1],self.lexer.ukToken):
+            head.pop()
+        start=head[-1].end if len(head)>0 else 0
+        #Old tokens after the edit, keyed on their 
+        # start in the new rule string:
+        resync={tok.start+offset:i for i,tok in enumerate(tokens) if tok.start>=editEnd}
+        relexed=[]
+        tail=[]
+        for tok in self.lexer.iter_tokens(newString,start):
+            relexed.append(tok)
+            if tok.end in resync:
+                tail=tokens[resync[tok.end]:]
+                break
+        self.stats['relexed']+=len(relexed)
+        self.stats['reused']+=len(head)+len(tail)
+        #Spans after the edit move by "offset":
+        if offset!=0:
+            tail=[tok.rebase(newString,offset) for tok in tail]
+        return(newString,head+relexed+tail)
+
 class MultipleTokensError(Exception):
 
     def __init__(self,idx,toks):
@@ -0,0 +1,116 @@
+import os
+import sys
+import time
+import argparse
+import tempfile
+import subprocess
+import importlib.util
+from glycogeneCompiler import *
+from benchmark_editScripts import polymer_glycan
+from benchmark_ruleIR import probe_glycans
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Compiled Library Check:
+#  Compiles the glycoenzyme library to
+#  a module, checks its glycoenzymes
+#  predict what the built library does,
+#  and times starting a worker on each.
+####################################
+
+def import_library(path):
+    '''
+    Imports the compiled library at "path".
+    '''
+    name=os.path.splitext(os.path.basename(path))[0]
+    spec=importlib.util.spec_from_file_location(name,path)
+    module=importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return(module)
+
+def outcome(fun,glycan):
+    '''
+    Result of fun(glycan), or the name of the
+    exception it raised.
+    '''
+    try:
+        return(fun(glycan))
+    except Exception as e:
+        return(type(e).__name__)
+
+def all_predictions(ggenes,glycans):
+    '''
+    Checked and unchecked forward predictions, reverse
+    predictions and constraint checks of every
+    glycoenzyme for every glycan.
+    '''
+    return({gg:{g:tuple([outcome(getattr(gg_obj,m),g) for m in ('forward','forward_','reverse_','constraint')]) for g in glycans} for gg,gg_obj in ggenes.items()})
+
+def time_predictions(ggenes,glycans,repeats=5):
+    '''
+    Best wall time (seconds) of all_predictions.
+    '''
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        all_predictions(ggenes,glycans)
+        timings.append(time.perf_counter()-start)
+    return(min(timings))
+
+def cold_start(code,path,repeats=3):
+    '''
+    Best wall time (seconds) of a fresh interpreter
+    running "code" with "path" on sys.path.  Returns
+    (seconds,modules it imported from this directory).
+    Bytecode is cached, as it is for a deployed worker,
+    so the first run is not counted.
+    '''
+    probe=code+'\nimport sys\nprint(",".join(sorted([m for m in sys.modules if m in %r])))' %(localModules)
+    env={k:v for k,v in os.environ.items() if k!='PYTHONDONTWRITEBYTECODE'}
+    timings=[]
+    for _ in range(repeats+1):
+        start=time.perf_counter()
+        run=subprocess.run([sys.executable,'-c',probe],cwd=path,env=env,capture_output=True,text=True,check=True)
+        timings.append(time.perf_counter()-start)
+    return(min(timings[1:]),run.stdout.strip())
+
+#Modules of this directory reported by cold_start:
+localModules=['tokenClasses_lex','LexerClass','tokenMatchers','ruleInterpreter','ruleIR','regexBackends','glycogeneObjs','compiledRuntime']
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks a compiled glycoenzyme library against the built library, and times starting a worker on each.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    args=parser.parse_args()
+
+    here=os.path.dirname(os.path.abspath(__file__))
+    corpus=os.path.abspath(args.corpus)
+    with tempfile.TemporaryDirectory() as tmp:
+        libraries=dict()
+        for lazy in (False,True):
+            path=os.path.join(tmp,'compiledGlycogenes_%s.py' %('lazy' if lazy else 'eager'))
+            start=time.perf_counter()
+            ggenes,source=compile_library(corpus,path,lazy)
+            print('Compiled %d glycoenzymes to %s in %.2f s (%d KB)' %(len(ggenes),os.path.basename(path),time.perf_counter()-start,len(source)//1024))
+            libraries[lazy]=(path,import_library(path))
+        compiled,_,_=libraries[False][1].load_glycoenzymes()
+        lazyCompiled,_,_=libraries[True][1].load_glycoenzymes()
+        print('Same glycoenzymes: %s' %(sorted(compiled)==sorted(ggenes)))
+
+        glycans=list(glycan_substrates)+[polymer_glycan(n) for n in (5,20)]+probe_glycans(ggenes)
+        expected=all_predictions(ggenes,glycans)
+        for label,library in [('compiled',compiled),('lazy compiled',lazyCompiled)]:
+            found=all_predictions(library,glycans)
+            diffs=[(gg,g) for gg in expected for g in glycans if expected[gg][g]!=found[gg][g]]
+            print('%-13s %d glycoenzymes, %d glycans: %d glycoenzyme/glycan pairs differ' %(label+':',len(expected),len(glycans),len(diffs)))
+            for gg,g in diffs[:10]:
+                print('  %s %s\n    built: %s\n    compiled: %s' %(gg,g,expected[gg][g],found[gg][g]))
+
+        print('Worker cold start:')
+        starts=[('build the library','from glycogeneObjs import load_glycoenzymes\nload_glycoenzymes(%r)' %(corpus),here)]
+        starts+=[('import %s' %(os.path.basename(path)),'import sys\nsys.path.append(%r)\nimport %s' %(here,os.path.splitext(os.path.basename(path))[0]),tmp) for path,_ in libraries.values()]
+        for label,code,cwd in starts:
+            seconds,modules=cold_start(code,cwd)
+            print('  %-38s %8.1f ms  modules: %s' %(label+':',seconds*1e3,modules))
+        for label,gl in [('N-linked glycans',glycan_substrates),('GAG chains',[polymer_glycan(n) for n in (5,20,50)])]:
+            print('%-17s built: %8.2f ms  compiled: %8.2f ms  lazy compiled: %8.2f ms' %(label,time_predictions(ggenes,gl,args.repeats)*1e3,time_predictions(compiled,gl,args.repeats)*1e3,time_predictions(lazyCompiled,gl,args.repeats)*1e3))
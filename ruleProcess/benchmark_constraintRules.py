@@ -0,0 +1,80 @@
+import time
+import argparse
+from glycogeneObjs import *
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Constraint Rule Check:
+#  Evaluates numeric constraints and
+#  "&"/"|" chains of constraints on
+#  glycans with known answers, and
+#  times the constraints of the
+#  glycoenzyme library.
+####################################
+
+#Two, one and no terminal sialic acids:
+disialylated='Neu5Ac(a2-3)Gal(b1-4)GlcNAc(b1-2)Man(a1-3)[Neu5Ac(a2-6)Gal(b1-4)GlcNAc(b1-2)Man(a1-6)]Man(b1-4)GlcNAc(b1-4)GlcNAc(b1-1)'
+monosialylated='Gal(b1-4)GlcNAc(b1-2)Man(a1-3)[Neu5Ac(a2-6)Gal(b1-4)GlcNAc(b1-2)Man(a1-6)]Man(b1-4)GlcNAc(b1-4)GlcNAc(b1-1)'
+agalactosylated='GlcNAc(b1-2)Man(a1-3)[Man(a1-6)]Man(b1-4)GlcNAc(b1-4)GlcNAc(b1-1)'
+caseGlycans=(disialylated,monosialylated,agalactosylated)
+
+#Constraint string and its result for each of "caseGlycans".
+# Chains are evaluated left to right:
+constraintCases=[
+    ('nNeu5Ac(a2-?)=1',(False,True,False)),
+    ('nNeu5Ac(a2-?)>=2',(True,False,False)),
+    ('nNeu5Ac(a2-?)>1',(True,False,False)),
+    ('nNeu5Ac(a2-?)<=1',(False,True,True)),
+    ('nNeu5Ac(a2-?)<2',(False,True,True)),
+    ('nNeu5Ac(a2-?)<1',(False,False,True)),
+    ('!Neu5Ac&!Gal&GlcNAc',(False,False,True)),
+    ('Neu5Ac&GlcNAc&Man',(False,False,False)),
+    ('Fuc|Gal|Neu5Ac',(True,True,False)),
+    ('Fuc|Xyl|GlcNAc',(False,False,True)),
+    ('Neu5Ac|Fuc&Gal',(False,True,False)),
+    ('Fuc&Neu5Ac|GlcNAc',(False,False,True)),
+    ('nNeu5Ac(a2-?)>=1&!Fuc|Xyl',(True,True,False)),
+    ('nNeu5Ac(a2-?)<2&Gal|Fuc&!Xyl',(False,True,False)),
+]
+
+def check_cases(cases=constraintCases,glycans=caseGlycans):
+    '''
+    Returns (constraint string,expected,found) for
+    every case the constraintRule gets wrong.
+    '''
+    failures=[]
+    for constraintString,expected in cases:
+        cr=constraintRule(lexer(constraintString))
+        found=tuple([cr(g) for g in glycans])
+        if found!=expected:
+            failures.append((constraintString,expected,found))
+    return(failures)
+
+def time_constraints(ggenes,glycans,repeats=5):
+    '''
+    Best wall time (seconds) of checking the
+    constraint of every glycoenzyme on every glycan.
+    '''
+    constraints=[gg_obj.constraint for gg_obj in ggenes.values() if hasattr(gg_obj,'constraintRule')]
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        for c in constraints:
+            for g in glycans:
+                c(g)
+        timings.append(time.perf_counter()-start)
+    return(len(constraints),min(timings))
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks numeric constraints and chains of constraints, and times the constraints of the glycoenzyme library.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    args=parser.parse_args()
+
+    failures=check_cases()
+    print('Constraint cases: %d, failures: %d' %(len(constraintCases),len(failures)))
+    for constraintString,expected,found in failures:
+        print('  %s\n    expected: %s\n    found:    %s' %(constraintString,expected,found))
+    ggenes,_,_=load_glycoenzymes(args.corpus)
+    n,seconds=time_constraints(ggenes,glycan_substrates,args.repeats)
+    print('%d constraints, %d N-linked glycans: %.2f ms' %(n,len(glycan_substrates),seconds*1e3))
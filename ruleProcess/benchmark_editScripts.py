@@ -0,0 +1,99 @@
+import time
+import argparse
+from glycogeneObjs import *
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Edit Script Differential Check:
+#  Builds every "to" string with the
+#  precomputed edit scripts and with
+#  ndiff, and checks they agree.
+####################################
+
+def processors(ggenes):
+    '''
+    Yields every forward and reverse glycan processor
+    of the glycoenzymes.
+    '''
+    for gg_obj in ggenes.values():
+        for procs in gg_obj.reactionRule.processors.values():
+            yield from procs
+
+def to_strings(gpg,glycan,construct):
+    '''
+    Returns the "to" string built by "construct" for
+    each match of the processor, or the name of the
+    exception raised.
+    '''
+    res=[]
+    for m in gpg.getGlycanMatch(gpg.fromPattern,glycan):
+        try:
+            res.append(construct(m))
+        except Exception as e:
+            res.append(type(e).__name__)
+    return(res)
+
+def differential(ggenes,glycans):
+    '''
+    Returns (matches,matches with an edit script,
+    differing to strings) over every processor and
+    glycan.
+    '''
+    matches,scripted,diffs=0,0,[]
+    for gpg in processors(ggenes):
+        for glycan in glycans:
+            for m in gpg.getGlycanMatch(gpg.fromPattern,glycan):
+                matches+=1
+                scripted+=gpg.applyEditScript(m) is not None
+            new=to_strings(gpg,glycan,gpg.constructToString)
+            old=to_strings(gpg,glycan,gpg.constructToString_ndiff)
+            if new!=old:
+                diffs.append((gpg.fromString,gpg.toString,glycan,old,new))
+    return(matches,scripted,diffs)
+
+def time_construct(ggenes,glycans,construct,repeats=3):
+    '''
+    Returns the best wall time (seconds) to build the
+    "to" string of every match with "construct"
+    ("constructToString" or "constructToString_ndiff").
+    '''
+    work=[(gpg,[m for g in glycans for m in gpg.getGlycanMatch(gpg.fromPattern,g)]) for gpg in processors(ggenes)]
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        for gpg,mtchs in work:
+            for m in mtchs:
+                try:
+                    getattr(gpg,construct)(m)
+                except Exception:
+                    continue
+        timings.append(time.perf_counter()-start)
+    return(min(timings))
+
+def polymer_glycan(n):
+    '''
+    A polymerized GAG chain of "n" disaccharide repeats.
+    '''
+    return('GlcA(b1-3)GalNAc(b1-4)'*n+'GlcA(b1-3)Gal(b1-3)Gal(b1-4)Xyl(b1-0)Ser')
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks edit-script "to" strings against ndiff and times both.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=3)
+    args=parser.parse_args()
+
+    ggenes,_,_=load_glycoenzymes(args.corpus)
+    glycans=list(dict.fromkeys(glycan_substrates))
+    matches,scripted,diffs=differential(ggenes,glycans)
+    print('N-linked use case: %d matches, %d with an edit script, %d processor/glycan pairs differ' %(matches,scripted,len(diffs)))
+    for frm,to,glycan,old,new in diffs:
+        print('  %s -> %s on %s\n    ndiff: %s\n    edit script: %s' %(frm,to,glycan,old,new))
+
+    before=time_construct(ggenes,glycans,'constructToString_ndiff',args.repeats)
+    after=time_construct(ggenes,glycans,'constructToString',args.repeats)
+    print('%-28s before: %8.2f ms  after: %8.2f ms  speedup: %5.2fx' %('N-linked to strings:',before*1e3,after*1e3,before/after))
+    for n in (5,20,50):
+        long=[polymer_glycan(n)]
+        before=time_construct(ggenes,long,'constructToString_ndiff',args.repeats)
+        after=time_construct(ggenes,long,'constructToString',args.repeats)
+        print('%-28s before: %8.2f ms  after: %8.2f ms  speedup: %5.2fx' %('  GAG chain, %d repeats:' %(n),before*1e3,after*1e3,before/after))
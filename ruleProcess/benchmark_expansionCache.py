@@ -0,0 +1,52 @@
+import re
+import contextlib
+import tokenClasses_lex
+from tokenClasses_lex import lexer,monoToken
+from ruleInterpreter import reactionRule
+from benchmark_ruleCorpus import *
+
+####################################
+# Expansion Cache Benchmark:
+#  Times building reaction rules with
+#  and without caching substrate and
+#  product permutations on tokens.
+####################################
+
+#GAG sulfotransferases, the rules with the most
+# modification permutations:
+gagSulfotransferases=re.compile('^(NDST\d|HS2ST1|HS3ST.+|HS6ST\d|UST|CHST(3|7|11|12|13|14|15))$')
+
+@contextlib.contextmanager
+def expansion_cache(enabled):
+    '''
+    Temporarily turns caching of monosaccharide
+    substrate/product permutations on or off.
+    '''
+    wasEnabled=monoToken.cacheExpansions
+    try:
+        monoToken.cacheExpansions=enabled
+        yield
+    finally:
+        monoToken.cacheExpansions=wasEnabled
+
+def time_rule_construction(strings,repeats=5):
+    '''
+    Returns the best wall time (seconds) to lex and
+    build a reactionRule for each of "strings".  The
+    lexer caches are cleared before each repeat, so
+    cached expansions are only reused within one repeat.
+    '''
+    return(best_time(lambda: try_each(lambda s: reactionRule(lexer(s)),strings),repeats,setup=tokenClasses_lex.clear_lexer_caches))
+
+if __name__=='__main__':
+    args=corpus_parser('Times cached substrate/product expansions.').parse_args()
+    corpus=load_rule_corpus(args.corpus)
+
+    gagRules=[s for geneName,col,s in corpus if col=='Rules' and gagSulfotransferases.match(geneName)]
+    with expansion_cache(False):
+        gag_before=time_rule_construction(gagRules,args.repeats)
+        build_before=time_library_build(corpus,args.repeats)
+    gag_after=time_rule_construction(gagRules,args.repeats)
+    build_after=time_library_build(corpus,args.repeats)
+    compare('GAG sulfotransferase rules:',gag_before,gag_after)
+    compare('Library build, expansions:',build_before,build_after)
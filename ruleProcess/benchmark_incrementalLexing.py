@@ -0,0 +1,55 @@
+import re
+from tokenClasses_lex import lexer,incrementalLexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Incremental Lexing Benchmark:
+#  Times lexing edited rules in full
+#  and from the tokens of the rule
+#  before the edit.
+####################################
+
+def linkage_edits(strings):
+    '''
+    Returns (rule,start,end,newText) edits changing the
+    position of each linkage in "strings", the way rules
+    are curated one linkage at a time.
+    '''
+    edits=[]
+    for s in strings:
+        for m in re.finditer('\(([ab\?])([12\?])\-([\d\?])\)',s):
+            newPos='3' if m.group(3)!='3' else '4'
+            edits.append((s,m.start(3),m.end(3),newPos))
+    return(edits)
+
+def time_edits(edits,incremental=True,repeats=5):
+    '''
+    Returns the best wall time (seconds) to lex every
+    edited rule, either in full or from the tokens of
+    the rule before the edit.
+    '''
+    previous=dict()
+    for s,_,_,_ in edits:
+        if s not in previous:
+            try:
+                previous[s]=lexer(s)
+            except Exception:
+                previous[s]=None
+    edits=[e for e in edits if previous[e[0]] is not None]
+    def relex(edit):
+        s,editStart,editEnd,newText=edit
+        if incremental:
+            incrementalLexer.relex(s,previous[s],editStart,editEnd,newText)
+        else:
+            lexer(s[:editStart]+newText+s[editEnd:])
+    return(best_time(lambda: try_each(relex,edits),repeats))
+
+if __name__=='__main__':
+    args=corpus_parser('Times incremental re-lexing of edited rules.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+
+    edits=linkage_edits(sorted(set(strings)))
+    compare('Linkage edits, incremental:',time_edits(edits,False,args.repeats),time_edits(edits,True,args.repeats))
+    longEdits=linkage_edits(['...'+'GlcA(b1-3)GalNAc{4S}(b1-4)'*n+'GlcA(b1-3)Gal(b1-3)Gal(b1-4)Xyl(b1-0)Ser' for n in (10,25,50)])
+    compare('  long GAG rule edits:',time_edits(longEdits,False,args.repeats),time_edits(longEdits,True,args.repeats))
+    print('  incremental lexer: %s' %(incrementalLexer.stats))
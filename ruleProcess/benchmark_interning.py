@@ -0,0 +1,41 @@
+import contextlib
+import tokenClasses_lex
+from benchmark_ruleCorpus import *
+
+####################################
+# Entity Interning Benchmark:
+#  Time and memory to build the rule
+#  library with and without sharing
+#  identical entity tokens.
+####################################
+
+@contextlib.contextmanager
+def interning(enabled):
+    '''
+    Temporarily turns entity token interning on or
+    off, starting from an empty intern table.
+    '''
+    interner=tokenClasses_lex.entityInterner
+    wasEnabled=interner.enabled
+    try:
+        interner.clear()
+        interner.enabled=enabled
+        yield interner
+    finally:
+        interner.clear()
+        interner.enabled=wasEnabled
+
+if __name__=='__main__':
+    args=corpus_parser('Times and measures entity token interning.').parse_args()
+    corpus=load_rule_corpus(args.corpus)
+
+    with interning(False):
+        build_before=time_library_build(corpus,args.repeats)
+        mem_before=library_memory(corpus)
+    with interning(True) as interner:
+        build_after=time_library_build(corpus,args.repeats)
+        mem_after=library_memory(corpus)
+        info=interner.info()
+    compare('Library build, interning:',build_before,build_after)
+    print('%-28s before: %8.1f KiB  after: %8.1f KiB  ratio: %5.2fx' %('Library memory, interning:',mem_before/1024,mem_after/1024,mem_before/mem_after))
+    print('  shared entity tokens: %d (%d reused)' %(info['size'],info['hits']))
@@ -0,0 +1,36 @@
+import contextlib
+import tokenMatchers
+from tokenMatchers import LexMatcher
+from benchmark_ruleCorpus import *
+
+####################################
+# Lexicon Engine Benchmark:
+#  Times the lexicon matchers and the
+#  lexer with the default lexicon
+#  alternation and the opt-in trie.
+####################################
+
+@contextlib.contextmanager
+def lexicon_engine(engine):
+    '''
+    Temporarily rebuilds the lexicon matchers with
+    another lexicon engine.
+    '''
+    try:
+        tokenMatchers.set_lexicon_engine(engine)
+        yield
+    finally:
+        tokenMatchers.set_lexicon_engine('alternation')
+
+if __name__=='__main__':
+    args=corpus_parser('Times the alternation and trie lexicon engines.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+    lexMatchers=[m for m in tokenMatchers.matcherRegistry.values() if isinstance(m,LexMatcher)]
+
+    probe_before=time_probes(strings,args.repeats,lexMatchers)
+    lex_before=time_lexer(strings,args.repeats)
+    with lexicon_engine('trie'):
+        probe_after=time_probes(strings,args.repeats,lexMatchers)
+        lex_after=time_lexer(strings,args.repeats)
+    compare('Lexicon probes, trie:',probe_before,probe_after)
+    compare('Full corpus lexing, trie:',lex_before,lex_after)
@@ -0,0 +1,26 @@
+import re
+import time
+import tokenMatchers
+from benchmark_ruleCorpus import compare
+
+####################################
+# Lexicon Registry Benchmark:
+#  Times registering a word against
+#  rebuilding every lexicon matcher.
+####################################
+
+def time_rebuild(fun):
+    '''
+    Wall time (seconds) of "fun()", with patterns
+    compiled from scratch.
+    '''
+    re.purge()
+    start=time.perf_counter()
+    fun()
+    return(time.perf_counter()-start)
+
+if __name__=='__main__':
+    rebuild_all=time_rebuild(lambda: tokenMatchers.set_lexicon_engine('alternation'))
+    rebuild_dependents=time_rebuild(lambda: tokenMatchers.lexiconRegistry.register('monosaccharides','Kdn9Ac'))
+    compare('Rebuild all vs dependents:',rebuild_all,rebuild_dependents)
+    print('  lexicon version: %d' %(tokenMatchers.lexiconRegistry.version))
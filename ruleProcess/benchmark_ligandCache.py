@@ -0,0 +1,64 @@
+import copy
+import pickle
+import contextlib
+import tokenClasses_lex
+from LexerClass import CachedLexer
+from tokenClasses_lex import lexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Ligand Cache Benchmark:
+#  Times building the rule library
+#  with and without the cache of
+#  lexed ligand fragments, and checks
+#  the cached tokens can be shared.
+####################################
+
+@contextlib.contextmanager
+def ligand_cache(maxsize):
+    '''
+    Temporarily replaces the cached ligand lexer with
+    one of size "maxsize" (0 disables caching).
+    '''
+    cachedLexer=tokenClasses_lex.ligandLexer
+    try:
+        tokenClasses_lex.ligandLexer=CachedLexer(lexer,maxsize=maxsize,freeze=cachedLexer.freeze)
+        yield tokenClasses_lex.ligandLexer
+    finally:
+        tokenClasses_lex.ligandLexer=cachedLexer
+
+def roundtrip_failures(strings):
+    '''
+    Rule strings whose tokens, shared cached and
+    interned tokens included, change or fail when
+    pickled or deep-copied.
+    '''
+    failures=[]
+    for s in strings:
+        try:
+            tokens=lexer(s)
+        except Exception:
+            continue
+        for roundtrip in [lambda x: pickle.loads(pickle.dumps(x)),copy.deepcopy]:
+            try:
+                ok=repr(roundtrip(tokens))==repr(tokens)
+            except Exception:
+                ok=False
+            if not ok:
+                failures.append(s)
+                break
+    return(failures)
+
+if __name__=='__main__':
+    args=corpus_parser('Times the ligand fragment cache and checks cached tokens.').parse_args()
+    corpus=load_rule_corpus(args.corpus)
+    strings=[s for _,_,s in corpus]
+
+    with ligand_cache(0):
+        build_before=time_library_build(corpus,args.repeats)
+    with ligand_cache(tokenClasses_lex.ligandLexer.maxsize) as cachedLexer:
+        build_after=time_library_build(corpus,args.repeats)
+        compare('Library build, ligand cache:',build_before,build_after)
+        print('  ligand cache: %s' %(str(cachedLexer.cache_info())))
+        print('  cached tokens read-only: %s' %(all([tok.frozen and tok.token.frozen for tok in cachedLexer('Gal(b1-4)GlcNAc(b1-2)')])))
+        print('  rules failing a pickle/deepcopy round trip: %d' %(len(roundtrip_failures(sorted(set(strings))))))
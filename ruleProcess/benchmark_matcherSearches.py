@@ -0,0 +1,80 @@
+import io
+import os
+import sys
+import json
+import tarfile
+import tempfile
+import subprocess
+from benchmark_ruleCorpus import *
+
+####################################
+# Matcher Search Count:
+#  Counts the matcher searches run to
+#  lex the rule corpus and print its
+#  tokens, now and at an earlier git
+#  revision.
+####################################
+
+#Lexes the rule strings read from stdin and the repr of
+# each token, and prints the number of matcher searches:
+searchCountScript='''
+import sys,json
+import tokenMatchers
+calls=[0]
+def counted(search):
+    def _search(self,*args,**kwargs):
+        calls[0]+=1
+        return(search(self,*args,**kwargs))
+    return(_search)
+for cls in (tokenMatchers.matcherClass,tokenMatchers.LexMatcher):
+    cls.search=counted(cls.search)
+from tokenClasses_lex import lexer
+for s in json.load(sys.stdin):
+    try:
+        [repr(tok) for tok in lexer(s)]
+    except Exception:
+        continue
+print(calls[0])
+'''
+
+def search_count(strings,path):
+    '''
+    Number of matcher searches run to lex "strings"
+    and print their tokens with the modules in "path",
+    counted in a fresh interpreter by wrapping the
+    matchers' search methods.
+    '''
+    run=subprocess.run([sys.executable,'-c',searchCountScript],cwd=path,input=json.dumps(strings),capture_output=True,text=True,check=True)
+    return(int(run.stdout.split()[-1]))
+
+def revision_sources(rev,dest):
+    '''
+    Writes the modules of this directory at git
+    revision "rev" (the first commit by default) to
+    "dest" and returns their path.
+    '''
+    here=os.path.dirname(os.path.abspath(__file__))
+    git=lambda *args: subprocess.run(['git']+list(args),cwd=here,capture_output=True,check=True).stdout
+    if rev is None:
+        rev=git('rev-list','--max-parents=0','HEAD').decode().split()[0]
+    #Run from this directory, the archive holds its files only:
+    with tarfile.open(fileobj=io.BytesIO(git('archive','--format=tar',rev,'.'))) as tar:
+        tar.extractall(dest)
+    return(dest)
+
+if __name__=='__main__':
+    parser=corpus_parser('Counts the matcher searches run to lex the rule corpus.')
+    parser.add_argument('--before-rev',default=None,help='git revision whose matcher searches are counted as "before" (the first commit by default).')
+    args=parser.parse_args()
+    uniqueStrings=sorted(set([s for _,_,s in load_rule_corpus(args.corpus)]))
+
+    searches_after=search_count(uniqueStrings,os.path.dirname(os.path.abspath(__file__)))
+    with tempfile.TemporaryDirectory() as tmp:
+        try:
+            searches_before=search_count(uniqueStrings,revision_sources(args.before_rev,tmp))
+        except (subprocess.CalledProcessError,OSError):
+            searches_before=None
+    if searches_before is None:
+        print('Matcher searches:            before: unavailable (no git checkout)  after: %d (%.1f per rule)' %(searches_after,searches_after/len(uniqueStrings)))
+    else:
+        print('Matcher searches:            before: %d (%.1f per rule)  after: %d (%.1f per rule)' %(searches_before,searches_before/len(uniqueStrings),searches_after,searches_after/len(uniqueStrings)))
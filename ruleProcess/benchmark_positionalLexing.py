@@ -0,0 +1,23 @@
+from LexerClass import LexerClass
+from tokenClasses_lex import lexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Positional Lexing Benchmark:
+#  Times lexing rules by copying the
+#  rest of the string at each step,
+#  and by stepping through it with a
+#  position.
+####################################
+
+if __name__=='__main__':
+    args=corpus_parser('Times suffix-copy and positional lexing.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+
+    suffixLexer=LexerClass(lexicon=lexer.lexicon,ukToken=lexer.ukToken,positional=False)
+    compare('Suffix vs positional:',time_lexer_with(suffixLexer,strings,args.repeats),time_lexer_with(lexer,strings,args.repeats))
+    longBefore=time_long_rules(suffixLexer)
+    longAfter=time_long_rules(lexer)
+    for n in longBefore:
+        compare('  wildcard/branch x%d:' %(n),longBefore[n][0],longAfter[n][0])
+        compare('  unknown region x%d:' %(n),longBefore[n][1],longAfter[n][1])
@@ -0,0 +1,48 @@
+import re
+import contextlib
+import tokenMatchers
+from tokenMatchers import matcherClass,LexMatcher
+from benchmark_ruleCorpus import *
+
+####################################
+# Precompiled Matcher Benchmark:
+#  Times the matchers and the lexer
+#  with patterns compiled once, and
+#  looked up in the "re" pattern
+#  cache on every probe.
+####################################
+
+@contextlib.contextmanager
+def legacy_matching():
+    '''
+    Temporarily routes every matcher through the "re"
+    module's pattern cache on each probe, the way
+    matchers worked before they were precompiled.
+    '''
+    searchFuns={cls:cls.search for cls in [matcherClass,LexMatcher]}
+    def _search(self,string,pos=0):
+        if self.front:
+            return(re.compile(self.pattern.pattern).match(string,pos))
+        else:
+            return(re.compile(self.pattern.pattern).search(string,pos))
+    try:
+        for cls in searchFuns:
+            cls.search=_search
+        yield
+    finally:
+        for cls,fun in searchFuns.items():
+            cls.search=fun
+
+if __name__=='__main__':
+    args=corpus_parser('Times precompiled matchers against the re pattern cache.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+    print('Rule corpus: %d strings (%d unique)' %(len(strings),len(set(strings))))
+    print('Registered matchers: %d' %(len(tokenMatchers.matcherRegistry)))
+
+    with legacy_matching():
+        lex_before=time_lexer(strings,args.repeats)
+        probe_before=time_probes(strings,args.repeats)
+    lex_after=time_lexer(strings,args.repeats)
+    probe_after=time_probes(strings,args.repeats)
+    compare('Matcher probes:',probe_before,probe_after)
+    compare('Full corpus lexing:',lex_before,lex_after)
@@ -0,0 +1,76 @@
+import time
+import argparse
+import tokenMatchers
+import regexBackends
+from glycogeneObjs import *
+from useCase_Nlinked_pathway import nlinked_reactions,glycan_substrates
+
+####################################
+# Regex Backend Harness:
+#  Runs the N-linked use case with
+#  every available regex backend and
+#  checks the predictions agree.
+####################################
+
+def use_backend(name):
+    '''
+    Switches the matchers and lexers to the "name"
+    backend, dropping the tokens lexed with the
+    previous one.
+    '''
+    tokenMatchers.set_regex_backend(name)
+
+def predict(gg_obj,glycan):
+    '''
+    Products of "glycan", or the name of the
+    exception raised predicting them.
+    '''
+    try:
+        return(gg_obj.forward(glycan))
+    except Exception as e:
+        return(type(e).__name__)
+
+def all_reactions(ggenes):
+    '''
+    Predicts the products of every glycogene for
+    every N-linked glycan substrate.
+    '''
+    return({gg:{g:predict(gg_obj,g) for g in glycan_substrates} for gg,gg_obj in ggenes.items()})
+
+def run_backend(name,path,repeats=5):
+    '''
+    Builds the glycoenzyme library and runs the
+    N-linked use case with backend "name".  Returns
+    (build seconds,use case seconds,all glycogenes
+    seconds,use case predictions,all predictions).
+    '''
+    use_backend(name)
+    start=time.perf_counter()
+    ggenes,_,_=load_glycoenzymes(path)
+    build=time.perf_counter()-start
+    timings=[[],[]]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        useCase=nlinked_reactions(ggenes)
+        timings[0].append(time.perf_counter()-start)
+        start=time.perf_counter()
+        allPredictions=all_reactions(ggenes)
+        timings[1].append(time.perf_counter()-start)
+    return(build,min(timings[0]),min(timings[1]),useCase,allPredictions)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Runs the N-linked use case with each regex backend and checks the outputs are identical.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    args=parser.parse_args()
+
+    print('Available backends: %s' %(', '.join(regexBackends.backends)))
+    results=dict()
+    for name in regexBackends.backends:
+        results[name]=run_backend(name,args.corpus,args.repeats)
+    use_backend('re')
+
+    _,_,_,refUseCase,refAll=results['re']
+    for name,(build,useCase,allGenes,predictions,allPredictions) in results.items():
+        print('%-6s library build: %8.2f ms  N-linked use case: %8.2f ms  all glycogenes: %8.2f ms  identical: %s' %(name,build*1e3,useCase*1e3,allGenes*1e3,predictions==refUseCase and allPredictions==refAll))
+    print('rule backend patterns: %s' %(regexBackends.backends['rule'].stats))
@@ -0,0 +1,157 @@
+import gc
+import time
+import argparse
+import tracemalloc
+import pandas as pd
+import tokenMatchers
+import tokenClasses_lex
+from tokenClasses_lex import lexer
+from ruleInterpreter import reactionRule,constraintRule
+
+####################################
+# Rule Corpus Benchmark Helpers:
+#  Loads every rule and constraint
+#  string in finishedGlycogenes.xlsx
+#  and times the lexer and the rule
+#  library over them.  Used by the
+#  benchmark_*.py scripts.
+####################################
+
+def load_rule_corpus(path='../finishedGlycogenes.xlsx'):
+    '''
+    Returns a list of (geneName,column,string) tuples
+    for every reaction rule and constraint string
+    in the glycogene table.
+    '''
+    finishedGlycogenes=pd.read_excel(path)
+    corpus=[]
+    for i,r in finishedGlycogenes.iterrows():
+        for col in ['Rules','Constraints']:
+            string=r[col]
+            if not isinstance(string,str) or string in ['no reaction','None']:
+                continue
+            corpus.append((r['geneName'],col,string))
+    return(corpus)
+
+def corpus_parser(description):
+    '''
+    Argument parser with the "--corpus" and "--repeats"
+    options shared by the rule corpus benchmarks.
+    '''
+    parser=argparse.ArgumentParser(description=description)
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    return(parser)
+
+def best_time(fun,repeats=5,setup=None):
+    '''
+    Returns the best wall time (seconds) of "fun()"
+    over several repeats, calling "setup()" untimed
+    before each repeat.
+    '''
+    timings=[]
+    for _ in range(repeats):
+        if setup is not None:
+            setup()
+        start=time.perf_counter()
+        fun()
+        timings.append(time.perf_counter()-start)
+    return(min(timings))
+
+def try_each(fun,items):
+    '''
+    Calls "fun" on every item, skipping the ones
+    it raises on.
+    '''
+    for x in items:
+        try:
+            fun(x)
+        except Exception:
+            continue
+
+def time_lexer_with(lex,strings,repeats=5):
+    '''
+    Returns the best wall time (seconds) for "lex" to
+    lex every string in "strings" over several repeats.
+    '''
+    return(best_time(lambda: try_each(lex,strings),repeats))
+
+def time_lexer(strings,repeats=5):
+    return(time_lexer_with(lexer,strings,repeats))
+
+def time_probes(strings,repeats=5,matchers=None):
+    '''
+    Probes "matchers" (every registered matcher by
+    default) at every position of every rule string.
+    Returns the best wall time (seconds) over several
+    repeats.
+    '''
+    if matchers is None:
+        matchers=list(tokenMatchers.matcherRegistry.values())
+    def probe():
+        for s in strings:
+            for idx in range(len(s)):
+                for m in matchers:
+                    m.search(s,idx)
+    return(best_time(probe,repeats))
+
+def time_long_rules(lex,sizes=(25,50,100,200),repeats=3):
+    '''
+    Lexes synthetic rules built from "sizes" repeats of
+    wildcard/branch runs, and rules with long unknown
+    stretches.  Returns {size:(seconds,seconds)}.
+    '''
+    res=dict()
+    for n in sizes:
+        longRule='{Gal(b1-4)}'+'GlcNAc(b1-3)[...]...'*n+'Asn'
+        unknownRule='GlcNAc(b1-4)'+'~'*(20*n)+'Asn'
+        res[n]=tuple([best_time(lambda: lex(rl),repeats) for rl in [longRule,unknownRule]])
+    return(res)
+
+def build_library(corpus,lex=lexer):
+    '''
+    Builds the reaction and constraint rule objects
+    for every glycogene in the corpus, lexing rule
+    strings with "lex".
+    '''
+    rules=dict()
+    for geneName,col,string in corpus:
+        try:
+            if col=='Rules':
+                rules[geneName]=reactionRule(lex(string))
+            elif geneName in rules:
+                constraintRule(lex(string),rules[geneName])
+        except Exception:
+            continue
+    return(rules)
+
+def time_library_build(corpus,repeats=5):
+    '''
+    Returns the best wall time (seconds) to build
+    the glycoenzyme rule library.
+    '''
+    return(best_time(lambda: build_library(corpus),repeats))
+
+def library_memory(corpus,lex=lexer):
+    '''
+    Returns the memory (bytes) still held by the rule
+    library once it is built with "lex", measured with
+    tracemalloc.  The lexer caches are emptied first,
+    and the ligand cache last, so that only memory held
+    by the library counts.
+    '''
+    tokenClasses_lex.clear_lexer_caches()
+    gc.collect()
+    tracemalloc.start()
+    try:
+        base=tracemalloc.get_traced_memory()[0]
+        rules=build_library(corpus,lex)
+        tokenClasses_lex.ligandLexer.cache_clear()
+        gc.collect()
+        held=tracemalloc.get_traced_memory()[0]-base
+    finally:
+        tracemalloc.stop()
+    return(held)
+
+def compare(label,before,after):
+    print('%-28s before: %8.2f ms  after: %8.2f ms  speedup: %5.2fx' %(label,before*1e3,after*1e3,before/after))
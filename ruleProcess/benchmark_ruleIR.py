@@ -0,0 +1,185 @@
+import time
+import argparse
+from ruleIR import *
+from glycogeneObjs import *
+from benchmark_editScripts import polymer_glycan
+from benchmark_regexBackends import predict
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Rule IR Check:
+#  Builds the glycoenzyme library with
+#  matchers generated from the optimized
+#  rule IR and with a matcher per
+#  permutation, checks the IR writes the
+#  patterns rule2regex does, that it
+#  survives serialization, and that the
+#  predictions agree.
+####################################
+
+gen=generatorSet()
+
+def load_library(path,matcherMode):
+    '''
+    Builds the glycoenzyme library with the rule
+    matchers of "matcherMode".
+    '''
+    ggenes,_,_=load_glycoenzymes(path,matcherMode)
+    return(ggenes)
+
+def constraint_methods(ggenes):
+    for gg_obj in ggenes.values():
+        if hasattr(gg_obj,'constraintRule'):
+            yield from gg_obj.constraintRule.constraintMethods
+
+def regex_mismatches(ggenes):
+    '''
+    Returns the processor and constraint patterns the
+    IR writes differently from rule2regex, as
+    (rule string,IR regex).
+    '''
+    procs=[gpg for gg_obj in ggenes.values() for procs in gg_obj.reactionRule.processors.values() for gpg in procs]
+    mismatches=[(gpg.fromString,gpg.fromRegex) for gpg in procs if gpg.fromRegex!=gen.rule2regex(gpg.fromString)]
+    for cm in constraint_methods(ggenes):
+        if cm.searchPattern.pattern!=gen.rule2regex(cm.createSeq()):
+            mismatches.append((cm.createSeq(),cm.searchPattern.pattern))
+    return(mismatches)
+
+def directions(ggenes):
+    for gg_obj in ggenes.values():
+        yield from gg_obj.reactionRule.ir.values()
+
+def ir_stats(ggenes):
+    '''
+    Counts what the optimizer passes did over every
+    rule direction.
+    '''
+    dirs=list(directions(ggenes))
+    patterns=[p for d in dirs for p in d.permutations]
+    return({'directions':len(dirs),
+            'permutations':sum([d.size for d in dirs]),
+            'unreachable':sum([len(d.dropped) for d in dirs]),
+            'patterns':len(patterns),
+            'products written':sum([len(p.targets) for p in patterns]),
+            'patterns with an anchor':len([p for p in patterns if p.anchor is not None]),
+            'directions with an anchor':len([d for d in dirs if d.anchor is not None]),
+            'screens':len([d for d in dirs if d.screen is not None])})
+
+def roundtrip_failures(ggenes):
+    '''
+    Directions and constraints whose IR changes when
+    written to JSON and read back.
+    '''
+    failures=[d for d in directions(ggenes) if ruleDirection.from_json(d.to_json()).to_dict()!=d.to_dict()]
+    failures+=[cm.ir for cm in constraint_methods(ggenes) if ruleConstraint.from_dict(json.loads(json.dumps(cm.ir.to_dict()))).to_dict()!=cm.ir.to_dict()]
+    return(failures)
+
+def probe_glycans(ggenes):
+    '''
+    The substrate and product of every permutation,
+    with every "..." filled in with a short chain.
+    '''
+    fill=lambda s: s.replace('...','Gal(b1-4)GlcNAc(b1-2)').replace('-?','-3').replace('$','')
+    return(sorted(set([fill(s) for gg_obj in ggenes.values() for frm,to in gg_obj.reactionRule.pairListGenerator() for s in (frm,to)])))
+
+def reverse(gg_obj,glycan):
+    '''
+    Substrates inferred for "glycan", or the name of
+    the exception raised inferring them.
+    '''
+    try:
+        return(gg_obj.reverse_(glycan))
+    except Exception as e:
+        return(type(e).__name__)
+
+def constraint(gg_obj,glycan):
+    try:
+        return(gg_obj.constraint(glycan))
+    except Exception as e:
+        return(type(e).__name__)
+
+def all_predictions(ggenes,glycans):
+    '''
+    Forward and reverse predictions, and constraint
+    checks, of every glycoenzyme for every glycan.
+    '''
+    return({gg:{g:(predict(gg_obj,g),reverse(gg_obj,g),constraint(gg_obj,g)) for g in glycans} for gg,gg_obj in ggenes.items()})
+
+def time_predictions(ggenes,glycans,repeats=5):
+    '''
+    Best wall time (seconds) of all_predictions.
+    '''
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        all_predictions(ggenes,glycans)
+        timings.append(time.perf_counter()-start)
+    return(min(timings))
+
+def screened_directions(ggenes):
+    '''
+    (gene name,direction name,IRProcessorGenerator) of
+    every direction the "factor_affixes" pass wrote a
+    screen for.
+    '''
+    for gg,gg_obj in ggenes.items():
+        for name in ('forward_','reverse_'):
+            fun=getattr(gg_obj,name)
+            if isinstance(fun,IRProcessorGenerator) and fun.screen is not None:
+                yield(gg,name,fun)
+
+def time_screen(fun,glycans,repeats=5):
+    '''
+    Best wall time (seconds) of running the direction
+    "fun" on every glycan, with and without its screen,
+    and the number of glycans the screen rejects.
+    '''
+    screen=fun.screen
+    timings=dict()
+    try:
+        for label in ('with','without'):
+            fun.screen=screen if label=='with' else None
+            timings[label]=min([time_direction(fun,glycans) for _ in range(repeats)])
+    finally:
+        fun.screen=screen
+    rejected=len([g for g in glycans if screen.search(g) is None])
+    return(timings['with'],timings['without'],rejected)
+
+def time_direction(fun,glycans):
+    start=time.perf_counter()
+    for g in glycans:
+        try:
+            fun(g)
+        except Exception:
+            pass
+    return(time.perf_counter()-start)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks the matchers generated from the optimized rule IR against a matcher per permutation, and times both.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    args=parser.parse_args()
+
+    before=load_library(args.corpus,'permutation')
+    after=load_library(args.corpus,'ir')
+    mismatches=regex_mismatches(after)
+    print('Patterns written differently from rule2regex: %d' %(len(mismatches)))
+    for string,regex in mismatches[:10]:
+        print('  %s\n    IR: %s' %(string,regex))
+    print('Directions or constraints changed by a JSON round trip: %d' %(len(roundtrip_failures(after))))
+    for k,v in ir_stats(after).items():
+        print('  %-26s %d' %(k+':',v))
+
+    glycans=list(glycan_substrates)+[polymer_glycan(n) for n in (5,20)]+probe_glycans(after)
+    expected=all_predictions(before,glycans)
+    found=all_predictions(after,glycans)
+    diffs=[(gg,g) for gg in expected for g in glycans if expected[gg][g]!=found[gg][g]]
+    print('%d glycoenzymes, %d glycans: %d glycoenzyme/glycan pairs differ' %(len(expected),len(glycans),len(diffs)))
+    for gg,g in diffs[:10]:
+        print('  %s %s\n    per permutation: %s\n    rule IR: %s' %(gg,g,expected[gg][g],found[gg][g]))
+    for label,gl in [('N-linked glycans',glycan_substrates),('GAG chains',[polymer_glycan(n) for n in (5,20,50)]),('probe glycans',glycans)]:
+        print('%-17s per permutation: %8.2f ms  rule IR: %8.2f ms' %(label,time_predictions(before,gl,args.repeats)*1e3,time_predictions(after,gl,args.repeats)*1e3))
+    print('Screens written by factor_affixes, over the %d glycans:' %(len(glycans)))
+    for gg,name,fun in screened_directions(after):
+        withScreen,withoutScreen,rejected=time_screen(fun,glycans,args.repeats)
+        print('  %-8s %-9s screened: %6.2f ms  unscreened: %6.2f ms  rejected: %d' %(gg,name,withScreen*1e3,withoutScreen*1e3,rejected))
@@ -0,0 +1,151 @@
+import re
+import sys
+import json
+import time
+import platform
+import argparse
+import datetime
+import tokenClasses_lex
+from tokenClasses_lex import *
+from ruleInterpreter import *
+from benchmark_ruleCorpus import load_rule_corpus
+
+####################################
+# Rule Construction Benchmark Suite:
+#  Times each stage of building the
+#  reaction and constraint rules in
+#  finishedGlycogenes.xlsx and writes
+#  the results as JSON.
+####################################
+
+stages=['lex','validate','pairList','regexCompile']
+
+def validate_stage(col,tokens):
+    '''
+    Runs the validation checks done when a reactionRule
+    or constraintRule is constructed, without building
+    its generator methods.  Returns the bare rule object.
+    '''
+    if col=='Rules':
+        rl=reactionRule.__new__(reactionRule)
+        Rule.__init__(rl,tokens)
+        valid=rl.basicValidationWrapper(rl.ruleSets) and rl.noConstraints(rl.ruleSets)
+    else:
+        rl=constraintRule.__new__(constraintRule)
+        Rule.__init__(rl,tokens)
+        valid=rl.basicValidationWrapper(rl.ruleSets) and rl.noReactions(rl.ruleSets)
+        valid=valid and (rl.validNegation(rl.ruleSets) or rl.validNumeric(rl.ruleSets))
+    if not valid:
+        raise basicValidationError()
+    return(rl)
+
+def regex_strings(col,rl,pairList,reaction):
+    '''
+    Returns the regex strings compiled when the rule
+    is applied to glycans: both sides of every
+    substrate/product pair for reaction rules, and
+    the search sequence of every constraint rule set.
+    '''
+    if col=='Rules':
+        gen=generatorSet()
+        return([gen.rule2regex(s) for s in set(chain(*pairList))])
+    gens=[ConstraintMethodGenerator(r,reaction) for r in rl.ruleSets]
+    return([g.rule2regex(g.createSeq()) for g in gens])
+
+def time_rule(col,string,reaction=None,repeats=5):
+    '''
+    Returns {stage:seconds} with the best wall time of
+    each construction stage of one rule string.  Stages
+    not run for a rule (pairList for constraints) are
+    None.  The lexer caches (ligand fragments and
+    interned entity tokens) are cleared before each
+    repeat, so every repeat starts cold.
+    '''
+    timings={s:[] for s in stages}
+    for _ in range(repeats):
+        tokenClasses_lex.clear_lexer_caches()
+        start=time.perf_counter()
+        tokens=lexer(string)
+        timings['lex'].append(time.perf_counter()-start)
+        start=time.perf_counter()
+        rl=validate_stage(col,tokens)
+        timings['validate'].append(time.perf_counter()-start)
+        pairList=None
+        if col=='Rules':
+            start=time.perf_counter()
+            pairList=rl.pairListGenerator()
+            timings['pairList'].append(time.perf_counter()-start)
+        rgx=regex_strings(col,rl,pairList,reaction)
+        re.purge()
+        start=time.perf_counter()
+        for r in rgx:
+            re.compile(r)
+        timings['regexCompile'].append(time.perf_counter()-start)
+    return({s:(min(t) if t else None) for s,t in timings.items()})
+
+def run_suite(corpus,repeats=5,slowest=10):
+    '''
+    Times every rule in "corpus" and returns the
+    benchmark results as a JSON-serialisable dict.
+    Constraints are built against their glycogene's
+    reaction rule, the way glycoenzymes are.
+    '''
+    reactions=dict()
+    results=[]
+    failures=[]
+    for geneName,col,string in corpus:
+        try:
+            if col=='Rules':
+                reactions[geneName]=reactionRule(lexer(string))
+            timing=time_rule(col,string,reactions.get(geneName),repeats)
+        except Exception as e:
+            failures.append({'geneName':geneName,'column':col,'string':string,'error':type(e).__name__})
+            continue
+        total=sum(t for t in timing.values() if t is not None)
+        results.append({'geneName':geneName,'column':col,'string':string,'total':total,'stages':timing})
+    summary=dict()
+    for s in stages:
+        times=[r['stages'][s] for r in results if r['stages'][s] is not None]
+        summary[s]={'total':sum(times),'mean':sum(times)/len(times) if times else None,'max':max(times,default=None),'rules':len(times)}
+    summary['total']={'total':sum(r['total'] for r in results),'rules':len(results)}
+    return({
+        'meta':{
+            'date':datetime.datetime.now().isoformat(timespec='seconds'),
+            'python':platform.python_version(),
+            'platform':platform.platform(),
+            'repeats':repeats,
+            'strings':len(corpus),
+            },
+        'stages':summary,
+        'slowest':sorted(results,key=lambda r:r['total'],reverse=True)[:slowest],
+        'failures':failures,
+        })
+
+def compare_results(before,after):
+    '''
+    Prints the per-stage change between two benchmark
+    result dicts, e.g. from two versions of the lexer.
+    '''
+    for s in stages+['total']:
+        b,a=before['stages'][s]['total'],after['stages'][s]['total']
+        print('%-14s before: %8.2f ms  after: %8.2f ms  ratio: %5.2fx' %(s,b*1e3,a*1e3,b/a if a else float('nan')),file=sys.stderr)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Times each stage of building the glycogene rule library and writes JSON results.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=5)
+    parser.add_argument('--slowest',type=int,default=10,help='Number of slowest rules to report.')
+    parser.add_argument('--output',default=None,help='JSON output file (default: stdout).')
+    parser.add_argument('--compare',default=None,help='Earlier JSON results to compare against.')
+    args=parser.parse_args()
+
+    res=run_suite(load_rule_corpus(args.corpus),args.repeats,args.slowest)
+    if args.output is None:
+        json.dump(res,sys.stdout,indent=2)
+        print()
+    else:
+        with open(args.output,'w') as f:
+            json.dump(res,f,indent=2)
+    if args.compare is not None:
+        with open(args.compare) as f:
+            compare_results(json.load(f),res)
@@ -0,0 +1,119 @@
+import time
+import argparse
+import warnings
+import threading
+import contextlib
+import tokenMatchers
+from tokenMatchers import *
+from tokenClasses_lex import *
+from ruleInterpreter import *
+
+####################################
+# Safe Matching Stress Test:
+#  Times the matchers on the inputs
+#  that make them backtrack the most,
+#  with backtracking and safe patterns.
+####################################
+
+@contextlib.contextmanager
+def safe_matching(enabled):
+    '''
+    Temporarily switches every matcher to its safe
+    (or backtracking) pattern.
+    '''
+    try:
+        tokenMatchers.set_safe_matching(enabled)
+        yield
+    finally:
+        tokenMatchers.set_safe_matching(False)
+
+@contextlib.contextmanager
+def match_budget(seconds):
+    '''
+    Temporarily sets the match time budget.
+    '''
+    budget=tokenMatchers.matchBudget
+    try:
+        tokenMatchers.set_match_budget(seconds)
+        yield tokenMatchers.budgetViolations
+    finally:
+        tokenMatchers.set_match_budget(budget)
+
+def worst_cases(n):
+    '''
+    Returns (label,input,function) for the inputs that
+    make each matcher backtrack the most.  None of the
+    inputs match, so every matcher has to exhaust its
+    alternatives before giving up.
+    '''
+    return([
+        ('transport arrow search','{[a'*n,lambda s: transportArrowMatcher.search(s)),
+        ('transport, no closing ]}','GlcNAc'+'{[a]->[b'*n,lambda s: transportMatcher.search(s)),
+        ('transport, ]} out of order','GlcNAc]}'+'{[a]->[b'*n,lambda s: transportMatcher.search(s)),
+        ('substitution, no closing }','{'+'Gal->'*n,lambda s: substitutionMatcher.search(s)),
+        ('reversible, no closing }','{'+'Gal<->'*n,lambda s: reversibleMatcher.search(s)),
+        ('monosaccharide reaction','Gal{S->'+'S->'*n,lambda s: monoMatcher.search(s)),
+        ('lexer, open transports','GlcNAc(b1-4)'+'{[ER]->'*(n//10)+'Asn',lambda s: lexer(s)),
+        ])
+
+def time_call(fun,string,repeats=3):
+    '''
+    Returns the best wall time (seconds) of fun(string).
+    '''
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        try:
+            fun(string)
+        except Exception:
+            pass
+        timings.append(time.perf_counter()-start)
+    return(min(timings))
+
+def polymer_glycan(n):
+    '''
+    A polymerized GAG chain of "n" disaccharide repeats.
+    '''
+    return('GlcA(b1-3)GalNAc(b1-4)'*n+'GlcA(b1-3)Gal(b1-3)Gal(b1-4)Xyl(b1-0)Ser')
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Times backtracking and safe matchers on worst-case inputs.')
+    parser.add_argument('--sizes',type=int,nargs='+',default=[100,200,400])
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--budget',type=float,default=0.05,help='Match time budget (seconds).')
+    args=parser.parse_args()
+
+    ##################################
+    # Backtracking vs safe patterns:
+    ##################################
+    for n in args.sizes:
+        cases=worst_cases(n)
+        before=[time_call(f,s,args.repeats) for _,s,f in cases]
+        with safe_matching(True):
+            after=[time_call(f,s,args.repeats) for _,s,f in cases]
+        for (label,s,_),b,a in zip(cases,before,after):
+            print('%-30s len %6d  backtracking: %9.2f ms  safe: %8.3f ms  speedup: %8.1fx' %(label,len(s),b*1e3,a*1e3,b/a))
+
+    ##################################
+    # Rule wildcards under a budget:
+    ##################################
+    #Each "..." in a rule is a greedy "(.+)", the search
+    # below backtracks through every split of the chain:
+    gpg=GlycanProcessorGenerator('GlcA(b1-3)...GalNAc(b1-4)...GlcA(b1-3)...Xyl(b1-0)Asn','GlcA(b1-3)...GalNAc(b1-4)...GlcA(b1-3)...Xyl(b1-0)Asn',None)
+    for n in args.sizes:
+        glycan=polymer_glycan(n)
+        unguarded=time_call(gpg,glycan,1)
+        with match_budget(args.budget) as violations:
+            guarded=time_call(gpg,glycan,1)
+            aborted=len(violations)>0
+            violations.clear()
+        print('%-30s len %6d  unguarded: %9.2f ms  budget %4.0f ms: %8.2f ms  aborted: %s' %('rule wildcards, GAG chain',len(glycan),unguarded*1e3,args.budget*1e3,guarded*1e3,aborted))
+    #Matches in worker threads can't be timed, they
+    # are counted as bypasses:
+    bypasses=tokenMatchers.budgetBypasses
+    with match_budget(args.budget), warnings.catch_warnings():
+        warnings.simplefilter('ignore')
+        worker=threading.Thread(target=gpg,args=(polymer_glycan(5),))
+        worker.start()
+        worker.join()
+    print('%-30s budget bypassed by %d match(es) in a worker thread' %('rule wildcards, worker thread',tokenMatchers.budgetBypasses-bypasses))
@@ -0,0 +1,86 @@
+import time
+import argparse
+import tokenMatchers
+from glycogeneObjs import *
+from benchmark_editScripts import polymer_glycan
+from benchmark_ruleIR import probe_glycans
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Site Scan Check:
+#  Matches the patterns of every rule
+#  direction with several patterns in
+#  one scan of the sites of their leads,
+#  checks it finds the matches of one
+#  finditer per pattern, and times both
+#  over glycans of growing length.
+####################################
+
+def scanned_directions(ggenes):
+    '''
+    The IRProcessorGenerators with a site scan.
+    '''
+    for gg_obj in ggenes.values():
+        for fun in [gg_obj.reactionRule.forward,gg_obj.reactionRule.reverse]:
+            if isinstance(fun,IRProcessorGenerator) and fun.sites is not None:
+                yield(fun)
+
+def live_patterns(fun,glycan):
+    return([k for k,(anchorText,_,_) in enumerate(fun.patterns) if anchorText is None or anchorText in glycan])
+
+def scan_mismatches(funs,glycans):
+    '''
+    (direction,glycan) pairs where the site scan and
+    one finditer per pattern find different matches.
+    '''
+    mismatches=[]
+    for fun in funs:
+        for glycan in glycans:
+            live=live_patterns(fun,glycan)
+            scanned=fun.scanMatches(glycan,live)
+            found={k:list(fun.patterns[k][1].finditer(glycan)) for k in live}
+            if {k:[m.span() for m in v] for k,v in scanned.items()}!={k:[m.span() for m in v] for k,v in found.items()}:
+                mismatches.append((fun,glycan))
+    return(mismatches)
+
+def time_matching(funs,glycan,scan,repeats=20):
+    '''
+    Returns the best wall time (seconds) to match the
+    live patterns of every direction holding several
+    of them in "glycan", in one scan or one finditer
+    per pattern.
+    '''
+    cases=[(fun,live) for fun in funs for live in [live_patterns(fun,glycan)] if len(live)>1]
+    timings=[]
+    for _ in range(repeats):
+        start=time.perf_counter()
+        for fun,live in cases:
+            if scan:
+                fun.scanMatches(glycan,live)
+            else:
+                {k:list(fun.patterns[k][1].finditer(glycan)) for k in live}
+        timings.append(time.perf_counter()-start)
+    return(min(timings),len(cases))
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks the site scan of rule directions against a finditer per pattern, and times both.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=20)
+    args=parser.parse_args()
+
+    results=dict()
+    for backend in ['re','rule']:
+        tokenMatchers.set_regex_backend(backend)
+        ggenes,_,_=load_glycoenzymes(args.corpus)
+        funs=list(scanned_directions(ggenes))
+        glycans=list(dict.fromkeys(list(glycan_substrates)+[polymer_glycan(n) for n in (5,20)]+probe_glycans(ggenes)))
+        print('%s backend: %d directions, %d glycans: %d direction/glycan pairs differ' %(backend,len(funs),len(glycans),len(scan_mismatches(funs,glycans))))
+    tokenMatchers.set_regex_backend('re')
+    ggenes,_,_=load_glycoenzymes(args.corpus)
+    funs=list(scanned_directions(ggenes))
+
+    print('Scanned from %d characters' %(IRProcessorGenerator.minScanLength))
+    for label,glycan in [('N-glycan, longest',max(glycan_substrates,key=len))]+[('GAG chain x%d' %(n),polymer_glycan(n)) for n in (1,3,5,8,20,50,200)]:
+        before,cases=time_matching(funs,glycan,False,args.repeats)
+        after,_=time_matching(funs,glycan,True,args.repeats)
+        print('%-18s len %5d  directions: %2d  per pattern: %8.1f us  scan: %8.1f us  speedup: %5.2fx' %(label,len(glycan),cases,before*1e6,after*1e6,before/after if after else float('nan')))
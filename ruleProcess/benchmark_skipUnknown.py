@@ -0,0 +1,21 @@
+from LexerClass import LexerClass
+from tokenClasses_lex import lexer,tokenDispatch,tokenDispatchGuards,entityToken
+from benchmark_ruleCorpus import *
+
+####################################
+# Unknown Region Benchmark:
+#  Times lexing long unknown regions
+#  one character at a time, and by
+#  skipping to the next character a
+#  token can start with.
+####################################
+
+if __name__=='__main__':
+    args=corpus_parser('Times stepping and skipping over unknown regions.').parse_args()
+
+    stepLexer=LexerClass(lexicon=lexer.lexicon,ukToken=lexer.ukToken,positional=True,
+        dispatch=tokenDispatch,dispatchDefault=[entityToken],dispatchGuards=tokenDispatchGuards)
+    longBefore=time_long_rules(stepLexer)
+    longAfter=time_long_rules(lexer)
+    for n in longBefore:
+        compare('  unknown region skip x%d:' %(n),longBefore[n][1],longAfter[n][1])
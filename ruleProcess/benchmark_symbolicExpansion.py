@@ -0,0 +1,100 @@
+import time
+import argparse
+import tokenMatchers
+from math import prod as product
+from tokenClasses_lex import lexer
+from ruleInterpreter import reactionRule,SymbolicProcessorGenerator
+from benchmark_ruleIR import load_library,probe_glycans,all_predictions
+from benchmark_editScripts import polymer_glycan
+from useCase_Nlinked_pathway import glycan_substrates
+
+####################################
+# Symbolic Expansion Check:
+#  Builds the glycoenzyme library with
+#  a pattern per permutation and with
+#  the options of each token kept in one
+#  symbolic pattern, checks the
+#  predictions agree, and counts the
+#  compiled patterns of the library and
+#  of rules with growing option counts.
+####################################
+
+def processors(rules):
+    for rule in rules:
+        for procs in rule.processors.values():
+            yield from procs
+
+def pattern_count(rules):
+    '''
+    Returns the compiled "from" patterns of the rule
+    processors, one each, and the permutations the
+    symbolic ones match.
+    '''
+    procs=list(processors(rules))
+    symbolic=[p for p in procs if isinstance(p,SymbolicProcessorGenerator)]
+    return(len(procs),len(symbolic),sum([product([len(opts) for opts in p.frm_options]) for p in symbolic]))
+
+def library_rules(ggenes):
+    return([gg_obj.reactionRule for gg_obj in ggenes.values()])
+
+def prediction_mismatches(before,after,glycans):
+    '''
+    (glycoenzyme,glycan) pairs predicted differently
+    by the two libraries.
+    '''
+    predBefore=all_predictions(before,glycans)
+    predAfter=all_predictions(after,glycans)
+    return([(gg,g) for gg in predBefore for g in glycans if predBefore[gg][g]!=predAfter[gg][g]])
+
+def option_rule(n):
+    '''
+    A galactosyltransferase rule acting on "n"
+    sulfated GlcNAc, each with four options.
+    '''
+    return('{Gal(b1-4)}'+'GlcNAc<,3S><,6S>(b1-3)'*n+'...')
+
+def option_glycan(n):
+    return('GlcNAc3S(b1-3)GlcNAc6S(b1-3)'*(n//2)+'GlcNAc3S(b1-3)'*(n%2)+'Asn')
+
+def time_option_rule(n,matcherMode,repeats=3):
+    '''
+    Returns the best wall times (seconds) to build the
+    rule of "n" option tokens and predict its products,
+    its pattern count, and its products.
+    '''
+    tokens=lexer(option_rule(n))
+    rule=reactionRule(tokens,matcherMode)
+    glycan=option_glycan(n)
+    timings=[]
+    for fun in [lambda: reactionRule(tokens,matcherMode),lambda: rule.forward(glycan)]:
+        runs=[]
+        for _ in range(repeats):
+            start=time.perf_counter()
+            fun()
+            runs.append(time.perf_counter()-start)
+        timings.append(min(runs))
+    return(timings[0],timings[1],pattern_count([rule])[0],rule.forward(glycan))
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Checks symbolic token options against a pattern per permutation, and counts and times both.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--repeats',type=int,default=3)
+    parser.add_argument('--options',type=int,default=5,help='Largest number of option tokens in the synthetic rules.')
+    args=parser.parse_args()
+
+    for backend in ['re','rule']:
+        tokenMatchers.set_regex_backend(backend)
+        before=load_library(args.corpus,'permutation')
+        after=load_library(args.corpus,'symbolic')
+        glycans=list(dict.fromkeys(list(glycan_substrates)+[polymer_glycan(n) for n in (5,20)]+probe_glycans(before)))
+        print('%s backend: %d glycoenzymes, %d glycans: %d glycoenzyme/glycan pairs differ' %(backend,len(before),len(glycans),len(prediction_mismatches(before,after,glycans))))
+    tokenMatchers.set_regex_backend('re')
+
+    patternsBefore,_,_=pattern_count(library_rules(before))
+    patternsAfter,symbolic,permutations=pattern_count(library_rules(after))
+    print('Library patterns  permutation: %d  symbolic: %d  (%d symbolic patterns for %d permutations)' %(patternsBefore,patternsAfter,symbolic,permutations))
+
+    for n in range(1,args.options+1):
+        buildBefore,predictBefore,countBefore,productsBefore=time_option_rule(n,'permutation',args.repeats)
+        buildAfter,predictAfter,countAfter,productsAfter=time_option_rule(n,'symbolic',args.repeats)
+        print('%d option tokens  patterns: %5d -> %d  build: %8.2f -> %6.2f ms  predict: %8.2f -> %6.2f ms  products agree: %s' %(n,countBefore,countAfter,buildBefore*1e3,buildAfter*1e3,predictBefore*1e3,predictAfter*1e3,productsBefore==productsAfter))
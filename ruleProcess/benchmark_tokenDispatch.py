@@ -0,0 +1,19 @@
+from LexerClass import LexerClass
+from tokenClasses_lex import lexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Token Dispatch Benchmark:
+#  Times probing every token class
+#  at each position against picking
+#  them by first character.
+####################################
+
+if __name__=='__main__':
+    args=corpus_parser('Times full token probing against first-character dispatch.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+
+    fullLexer=LexerClass(lexicon=lexer.lexicon,ukToken=lexer.ukToken,positional=True)
+    lexer.reset_dispatch_stats()
+    compare('Full probing vs dispatch:',time_lexer_with(fullLexer,strings,args.repeats),time_lexer_with(lexer,strings,args.repeats))
+    print('  dispatch counters: %s' %(lexer.dispatchStats))
@@ -0,0 +1,20 @@
+from LexerClass import LexerClass
+from tokenClasses_lex import lexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Token Span Memory:
+#  Memory held by the rule library
+#  when tokens keep copies of their
+#  text, and when they keep offsets
+#  into the rule string.
+####################################
+
+if __name__=='__main__':
+    args=corpus_parser('Measures the memory held by the rule library tokens.').parse_args()
+    corpus=load_rule_corpus(args.corpus)
+
+    suffixLexer=LexerClass(lexicon=lexer.lexicon,ukToken=lexer.ukToken,positional=False)
+    mem_before=library_memory(corpus,suffixLexer)
+    mem_after=library_memory(corpus,lexer)
+    print('%-28s suffix: %8.1f KiB  spans: %8.1f KiB  ratio: %5.2fx' %('Library memory:',mem_before/1024,mem_after/1024,mem_before/mem_after))
@@ -0,0 +1,30 @@
+from tokenClasses_lex import lexer
+from benchmark_ruleCorpus import *
+
+####################################
+# Token Stream Benchmark:
+#  Times finding the first token of
+#  each rule from the token stream
+#  and from the full token list.
+####################################
+
+def first_token(s,streaming=True):
+    '''
+    Whether the rule string "s" starts with a reaction
+    token, read from the token stream or from the full
+    token list.
+    '''
+    if streaming:
+        first=next(lexer.iter_tokens(s),None)
+    else:
+        first=(lexer(s) or [None])[0]
+    return(first is not None and first.kind=='reactionToken')
+
+def time_first_token(strings,streaming=True,repeats=5):
+    return(best_time(lambda: try_each(lambda s: first_token(s,streaming),strings),repeats))
+
+if __name__=='__main__':
+    args=corpus_parser('Times the first token from the token stream and list.').parse_args()
+    strings=[s for _,_,s in load_rule_corpus(args.corpus)]
+
+    compare('First token, list vs stream:',time_first_token(strings,False,args.repeats),time_first_token(strings,True,args.repeats))
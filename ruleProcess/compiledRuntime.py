@@ -0,0 +1,178 @@
+import re
+from difflib import ndiff
+
+####################################
+# Compiled Rule Runtime:
+#  Builds products from the matches of
+#  a rule pattern, and evaluates
+#  constraint quantities, without the
+#  lexer or token classes.  Used by
+#  ruleInterpreter and by the modules
+#  glycogeneCompiler.py writes.
+####################################
+
+def edit_to_string(editScripts,mtch):
+    '''
+    Builds the new "to" string of a match from the
+    edit scripts of its processor, in one pass over
+    the script.  Returns None if no script covers the
+    match.
+    '''
+    if editScripts is None:
+        return(None)
+    glycan=mtch.string
+    ngroups=len(mtch.groups())
+    #Wildcard text is substituted with re.sub:
+    if ngroups>0 and '\\' in mtch.group(1):
+        return(None)
+    groupLen=sum([mtch.end(k)-mtch.start(k) for k in range(1,ngroups+1)])
+    for prefix,(segments,script) in editScripts.items():
+        if ngroups==len(segments)-1 and mtch.end()-mtch.start()==prefix+sum([len(x) for x in segments])+groupLen:
+            break
+    else:
+        return(None)
+    #Start of each "from" segment in the glycan:
+    starts=[mtch.start()+prefix]+[mtch.end(k) for k in range(1,ngroups+1)]
+    res=[]
+    for edit in script:
+        if edit[0]=='lit':
+            res.append(edit[1])
+        elif edit[0]=='pos':
+            res.append(glycan[starts[edit[1]]+edit[2]])
+        else:
+            text=mtch.group(edit[1])
+            if edit[2]=='noq':
+                text=text.replace('?','')
+            elif edit[2]=='digits':
+                text=''.join([c for c in text if c.isdigit()])
+            res.append(text)
+    return(''.join(res))
+
+def ndiff_to_string(toString,reactionKind,mtch):
+    '''
+    Builds the new "to" string of a match with the
+    difflib "ndiff" routine.  "reactionKind" is
+    "addition" or "subtraction".
+    '''
+    toString_clean=toString
+    if len(mtch.groups())>0:
+        toString_clean=re.sub('\.\.\.',mtch.groups()[0],toString_clean)
+    else:
+        #Assume the dots are at the front, indicating a
+        # wild card group:
+        toString_clean=re.sub('^\.{3}','',toString_clean)
+    toString_clean=re.sub('\$$','',toString_clean)
+    resList=[]
+    #Get Differential Symbol:
+    if reactionKind=='addition':
+        dsym='-'
+    elif reactionKind=='subtraction':
+        dsym='+'
+    for i,elt in enumerate(ndiff(toString_clean,mtch.group())):
+        df,elt=re.search('(.)\ (.)',elt).groups()
+        #Handles replacing ambiguous links here:
+        if (df=='-' and elt=='?'):
+            continue
+        elif (df in [' ',dsym]) or (df=='+' and elt.isdigit()):
+            resList.append(elt)
+    toString_clean=''.join(resList)
+    return(fix_to_string(toString_clean,mtch))
+
+def fix_to_string(toString_clean,mtch):
+    '''
+    Fixes the branching of a new "to" string.
+    '''
+    #Internal branching error:
+    if re.search('^\[.+?\].+?\]$',toString_clean) is not None:
+        toString_clean=re.sub('^(\[.+?)\](.+?\])$','\g<1>\g<2>',toString_clean)
+    #Beginning branch error:
+    elif re.search('^\]',toString_clean) is not None:
+        toString_clean=re.sub('^\]','',toString_clean)
+    #Fix front branch:
+    if mtch.group()[0]=='[' and toString_clean[0]!='[':
+        toString_clean=''.join(['[',toString_clean])
+    return(toString_clean)
+
+def construct_to_string(target,mtch):
+    '''
+    The new "to" string of a match for "target", a
+    (to string,reaction kind,edit scripts) tuple.
+    Matches the edit scripts do not cover are diffed
+    with "ndiff".
+    '''
+    toString,reactionKind,editScripts=target
+    toString_clean=edit_to_string(editScripts,mtch)
+    if toString_clean is None:
+        return(ndiff_to_string(toString,reactionKind,mtch))
+    return(fix_to_string(toString_clean,mtch))
+
+def splice_products(mtchs,glycan,target):
+    '''
+    Replaces the text of each match with its new "to"
+    string.
+    '''
+    return([''.join([glycan[:m.start()],construct_to_string(target,m),glycan[m.end():]]) for m in mtchs])
+
+def quantity_check(qt,val,mtchs):
+    '''
+    Evaluates the number of matches of a constraint
+    pattern against a quantifier "qt" and quantity
+    "val".  "mtchs" may be an iterator.
+    '''
+    n=len(list(mtchs))
+    if qt=="=":
+        return(n==val)
+    elif qt==">=":
+        return(n>=val)
+    elif qt=="<=":
+        return(n<=val)
+    elif qt==">":
+        return(n>val)
+    elif qt=="<":
+        return(n<val)
+    else:
+        raise Exception('Unknown quantifier: %s' %(qt))
+
+class lazyPattern:
+    '''
+    A regex compiled the first time it is searched,
+    for compiled libraries whose patterns are not all
+    compiled on import.
+    '''
+    __slots__=('regex','pattern')
+
+    def __init__(self,regex):
+        self.regex=regex
+        self.pattern=None
+
+    def compiled(self):
+        if self.pattern is None:
+            self.pattern=re.compile(self.regex)
+        return(self.pattern)
+
+    def finditer(self,string):
+        return(self.compiled().finditer(string))
+
+    def search(self,string):
+        return(self.compiled().search(string))
+
+class compiledGlycoenzyme:
+    '''
+    A glycoenzyme read from a compiled library, with
+    the methods of glycogeneObjs.glycoenzyme:
+    "forward" checks the constraint before calling
+    "forward_".
+    '''
+    __slots__=('name','forward_','reverse_','constraint')
+
+    def __init__(self,name,forward_,reverse_,constraint):
+        self.name=name
+        self.forward_=forward_
+        self.reverse_=reverse_
+        self.constraint=constraint
+
+    def forward(self,glycan):
+        if self.constraint(glycan):
+            return(self.forward_(glycan))
+        else:
+            return(None)
@@ -0,0 +1,201 @@
+import re
+import time
+import hashlib
+import argparse
+from glycogeneObjs import *
+
+####################################
+# Glycoenzyme Library Compiler:
+#  Writes the glycoenzyme library as a
+#  plain Python module: the pattern of
+#  every rule as a regex literal, and a
+#  straight-line forward, reverse and
+#  constraint function for every gene,
+#  generated from the optimized rule IR.
+#  The module imports compiledRuntime
+#  and re only, so prediction workers
+#  load the library without lexing or
+#  compiling any rule.
+####################################
+
+defaultOutput='compiledGlycogenes.py'
+
+class unsupportedRuleError(Exception):
+    def __init__(self,name,reason):
+        self.name=name
+        self.reason=reason
+        super().__init__('Cannot compile %s: %s' %(name,reason))
+
+class libraryWriter:
+    '''
+    Writes the source of a compiled library.  Patterns
+    and "to" targets shared by several genes are
+    written once, as module constants.  With
+    "lazy", patterns are compiled the first time they
+    are searched rather than on import.
+    '''
+    def __init__(self,lazy=False):
+        self.lazy=lazy
+        self.patterns=dict()
+        self.targets=dict()
+        self.functions=[]
+
+    def pattern(self,regex):
+        '''
+        Name of the module constant holding the compiled
+        "regex".
+        '''
+        return(self.patterns.setdefault(regex,'_P%d' %(len(self.patterns))))
+
+    def target(self,gpg):
+        '''
+        Name of the module constant holding the
+        (to string,reaction kind,edit scripts) of a
+        GlycanProcessorGenerator.
+        '''
+        target=repr((gpg.toString,gpg.reactionKind,gpg.editScripts))
+        return(self.targets.setdefault(target,'_T%d' %(len(self.targets))))
+
+    def direction(self,name,geneName,fun):
+        '''
+        Writes the function "name" running the
+        IRProcessorGenerator "fun": the anchor and screen
+        of its direction, then each pattern and the
+        products of each of its "to" strings, in the
+        order IRProcessorGenerator runs them.
+        '''
+        if not isinstance(fun,IRProcessorGenerator):
+            raise unsupportedRuleError(geneName,'%s is not generated from the rule IR' %(type(fun).__name__))
+        direction=fun.direction
+        lines=['def %s(glycan):' %(name)]
+        if direction.anchor is not None:
+            lines+=['    if %r not in glycan:' %(direction.anchor),'        return([])']
+        if direction.screen is not None:
+            lines+=['    if %s.search(glycan) is None:' %(self.pattern(direction.screen.regex(capture=False))),'        return([])']
+        results=dict()
+        for k,p in enumerate(direction.permutations):
+            gpg=fun.processors[p.targets[0][1][0]]
+            search='%s.finditer(glycan)' %(self.pattern(gpg.fromRegex))
+            if len(p.targets)>1:
+                search='list(%s)' %(search)
+            if p.anchor is not None and p.anchor!=direction.anchor:
+                search='%s if %r in glycan else ()' %(search,p.anchor)
+            lines.append('    m%d=%s' %(k,search))
+            for t,(_,idx) in enumerate(p.targets):
+                lines.append('    p%d_%d=_splice(m%d,glycan,%s)' %(k,t,k,self.target(fun.processors[idx[0]])))
+                results.update({i:'p%d_%d' %(k,t) for i in idx})
+        products=[results[i] for i in range(direction.size) if i in results]
+        lines.append('    return(%s)' %('+'.join(products) if products else '[]'))
+        self.functions.append('\n'.join(lines))
+
+    def constraintMethod(self,name,cm):
+        '''
+        Writes the function "name" evaluating the
+        ConstraintMethodGenerator "cm".
+        '''
+        ir=cm.ir
+        if cm.numeric is not None:
+            qt,val=cm.numeric.get_quantifier_quantity()
+            search='%s.finditer(glycan)' %(self.pattern(ir.pattern.regex())) if ir.reachable else 'iter(())'
+            if ir.reachable and ir.anchor is not None:
+                search='%s if %r in glycan else iter(())' %(search,ir.anchor)
+            body='_quantity(%r,%d,%s)' %(qt,val,search)
+        elif not ir.reachable:
+            body=repr(cm.negation)
+        elif cm.negation:
+            body='%s.search(glycan) is None' %(self.pattern(ir.pattern.regex()))
+            if ir.anchor is not None:
+                body='%r not in glycan or %s' %(ir.anchor,body)
+        else:
+            body='%s.search(glycan) is not None' %(self.pattern(ir.pattern.regex()))
+            if ir.anchor is not None:
+                body='%r in glycan and %s' %(ir.anchor,body)
+        self.functions.append('def %s(glycan):\n    return(%s)' %(name,body))
+
+    def constraint(self,name,gg_obj):
+        '''
+        Writes the function "name" checking the constraint
+        of a glycoenzyme.  The constraint methods are
+        merged left to right, as constraintRule merges
+        them: separator k joins method k+1.
+        '''
+        if not hasattr(gg_obj,'constraintRule'):
+            self.functions.append('def %s(glycan):\n    return(True)' %(name))
+            return
+        cr=gg_obj.constraintRule
+        methods=cr.constraintMethods
+        for k,cm in enumerate(methods):
+            if cm.ir is None:
+                raise unsupportedRuleError(gg_obj.name,'constraint is not generated from the rule IR')
+            self.constraintMethod('%s_%d' %(name,k),cm)
+        operators=cr.logicalOperators()
+        if len(operators)!=len(methods)-1:
+            raise unsupportedRuleError(gg_obj.name,'%d constraint methods joined by %d separators' %(len(methods),len(operators)))
+        expr='%s_0(glycan)' %(name)
+        for k,op in enumerate(operators):
+            expr='(%s %s %s_%d(glycan))' %(expr,'and' if op=='&' else 'or',name,k+1)
+        self.functions.append('def %s(glycan):\n    return(%s)' %(name,expr))
+
+    def source(self,ggenes,noRuleGlycogenes,notProcessed,corpusDigest):
+        '''
+        Writes every glycoenzyme of "ggenes" and returns
+        the source of the module.
+        '''
+        entries=[]
+        for k,(geneName,gg_obj) in enumerate(ggenes.items()):
+            self.functions.append('# %s' %(geneName))
+            self.direction('_forward_%d' %(k),geneName,gg_obj.forward_)
+            self.direction('_reverse_%d' %(k),geneName,gg_obj.reverse_)
+            self.constraint('_constraint_%d' %(k),gg_obj)
+            entries.append('    %r:compiledGlycoenzyme(%r,_forward_%d,_reverse_%d,_constraint_%d),' %(geneName,geneName,k,k,k))
+        lexiconVersion=next(iter(ggenes.values())).reactionRule.lexiconVersion if ggenes else None
+        header=['# Glycoenzyme library written by glycogeneCompiler.py.  Do not edit:',
+                '# rebuild it from the glycogene table instead.',
+                'import re',
+                'from compiledRuntime import splice_products as _splice,quantity_check as _quantity,lazyPattern as _lazyPattern,compiledGlycoenzyme',
+                '',
+                'corpusDigest=%r' %(corpusDigest),
+                'lexiconVersion=%r' %(lexiconVersion),
+                'noRuleGlycogenes=%r' %(noRuleGlycogenes),
+                'notProcessed=%r' %(notProcessed),
+                '']
+        compiler='_lazyPattern' if self.lazy else 're.compile'
+        constants=['%s=%s(%r)' %(name,compiler,regex) for regex,name in self.patterns.items()]
+        constants+=['%s=%s' %(name,target) for target,name in self.targets.items()]
+        footer=['glycoenzymes={']+entries+['}','',
+                'def load_glycoenzymes():',
+                "    '''",
+                '    The compiled library, as glycogeneObjs.load_glycoenzymes',
+                '    returns the library it builds.',
+                "    '''",
+                '    return(dict(glycoenzymes),list(noRuleGlycogenes),list(notProcessed))','']
+        return('\n'.join(header+constants+['']+['\n'.join(['',f]) for f in self.functions]+['','']+footer))
+
+def file_digest(path):
+    with open(path,'rb') as f:
+        return(hashlib.sha256(f.read()).hexdigest())
+
+def compile_library(path='../finishedGlycogenes.xlsx',output=defaultOutput,lazy=False):
+    '''
+    Builds the glycoenzyme library of the glycogene
+    table at "path", with matchers generated from the
+    rule IR, and writes it to "output" (see
+    libraryWriter for "lazy").  Returns
+    (glycoenzymes,source).
+    '''
+    ggenes,noRuleGlycogenes,notProcessed=load_glycoenzymes(path,'ir')
+    source=libraryWriter(lazy).source(ggenes,noRuleGlycogenes,notProcessed,file_digest(path))
+    with open(output,'w') as f:
+        f.write(source)
+    return(ggenes,source)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Compiles the glycoenzyme library to a Python module that loads without the lexer or token classes.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--output',default=defaultOutput)
+    parser.add_argument('--lazy',action='store_true',help='Compile each pattern the first time it is searched, rather than on import.')
+    args=parser.parse_args()
+
+    start=time.perf_counter()
+    ggenes,source=compile_library(args.corpus,args.output,args.lazy)
+    print('%d glycoenzymes written to %s (%d lines, %d KB) in %.2f s' %(len(ggenes),args.output,source.count('\n'),len(source)//1024,time.perf_counter()-start))
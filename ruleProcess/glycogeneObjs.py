@@ -10,7 +10,7 @@ import traceback
 
 class glycoenzyme:
 
-    def __init__(self,name,ruleString,constraintString):
+    def __init__(self,name,ruleString,constraintString,matcherMode='ir'):
         '''
         Glycogene Class:
             Takes reaction rule strings and constraint
@@ -22,11 +22,13 @@ class glycoenzyme:
                    it was derived, returned as a list.
         - constraint: Internal method which checks reactant and product
                       strings to validate the reaction takes place
+        "matcherMode" selects how the rules build their
+        matchers, see ruleInterpreter.matcherModes.
         '''
         #Glycogene Name:
         self.name=name
         try:
-            self.reactionRule=reactionRule(lexer(ruleString))
+            self.reactionRule=reactionRule(lexer(ruleString),matcherMode)
             #Define the "forward" and "reverse" methods:
             self.forward_,self.reverse_=self.reactionRule.forward,self.reactionRule.reverse
         except:
@@ -36,7 +38,7 @@ class glycoenzyme:
                 self.constraint=lambda x:True
             else:
                 #Define "constraint" method:
-                self.constraintRule=constraintRule(lexer(constraintString),self.reactionRule)
+                self.constraintRule=constraintRule(lexer(constraintString),self.reactionRule,matcherMode)
                 self.constraint=self.constraintRule.constraint
         except:
             raise Exception(f"Could not create constraint rule method for {self.name}")
@@ -48,33 +50,45 @@ class glycoenzyme:
             return(None)
 
 
-if __name__=='__main__':
-
-    ###########################
-    # Create Glycogene Objects:
-    ###########################
-
-    #finisehdGlycogenes.tsv:
-    finishedGlycogenes=pd.read_csv('../finishedGlycogenes.tsv',sep='\t',index_col=None)
+def load_glycoenzymes(path='../finishedGlycogenes.xlsx',matcherMode='ir'):
+    '''
+    Creates glycoenzyme objects for every glycogene in
+    the glycogene table, their rules built with
+    "matcherMode".  Returns a dictionary of the
+    glycoenzymes keyed on gene name, and lists of the
+    glycogenes with no reactions and those that could
+    not be processed.
+    '''
+    finishedGlycogenes=pd.read_excel(path)
     #Keep track of unprocessed glycogenes:
     # No reactions:
     noRuleGlycogenes=[]
     # Unprocessed:
     notProcessed=[]
-    # Processed: 
-    processed=[]
 
     ggenes=dict()
     for i,r in finishedGlycogenes.iterrows():
         ruleString=r['Rules']
-        constraintString=r['Constraints']
+        #Empty constraint cells are read as NaN:
+        constraintString=r['Constraints'] if isinstance(r['Constraints'],str) else 'None'
         geneName=r['geneName']
         if r['Rules']=='no reaction':
             noRuleGlycogenes.append(geneName)
             continue
         try:
-            ggenes[geneName]=glycogene(geneName,ruleString,constraintString)
-            #ggene=glycogene(geneName,ruleString,constraintString)
-            processed.append(geneName)
+            ggenes[geneName]=glycoenzyme(geneName,ruleString,constraintString,matcherMode)
         except :
             notProcessed.append(geneName)
+    return(ggenes,noRuleGlycogenes,notProcessed)
+
+
+if __name__=='__main__':
+
+    ###########################
+    # Create Glycogene Objects:
+    ###########################
+
+    ggenes,noRuleGlycogenes,notProcessed=load_glycoenzymes('../finishedGlycogenes.xlsx')
+    processed=list(ggenes)
+
+    print(f"Processed: {len(processed)}  Not processed: {len(notProcessed)}  No reaction: {len(noRuleGlycogenes)}")
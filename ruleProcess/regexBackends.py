@@ -0,0 +1,306 @@
+import re
+import bisect
+import functools
+
+#########################
+# Regular Expression Backends
+#########################
+#Every pattern used to lex rules and to match
+# glycans is compiled by the active backend.  A
+# backend's compiled patterns provide the match,
+# search and finditer methods of "re" patterns.
+
+class reBackend:
+
+    def __init__(self,module=re,name='re'):
+        '''
+        Compiles patterns with the "re" module, or any
+        module with the same API.
+        '''
+        self.module=module
+        self.name=name
+
+    def compile(self,pattern):
+        return(self.module.compile(pattern))
+
+    def __repr__(self):
+        return('%s regex backend' %(self.name))
+
+#######################
+# Restricted Rule Grammar
+#######################
+
+class unsupportedPatternError(Exception):
+    def __init__(self,pattern):
+        self.pattern=pattern
+        super().__init__('Pattern is not in the rule grammar: %s' %(pattern))
+
+class ruleMatch:
+
+    __slots__=('string','spans')
+
+    def __init__(self,string,spans):
+        '''
+        Match returned by a rulePattern.  "spans" holds
+        the span of the whole match followed by the span
+        of each wildcard group.
+        '''
+        self.string=string
+        self.spans=spans
+
+    def group(self,idx=0):
+        start,end=self.spans[idx]
+        return(self.string[start:end])
+
+    def groups(self):
+        return(tuple(self.group(i) for i in range(1,len(self.spans))))
+
+    def start(self,idx=0):
+        return(self.spans[idx][0])
+
+    def end(self,idx=0):
+        return(self.spans[idx][1])
+
+    def span(self,idx=0):
+        return(self.spans[idx])
+
+class rulePattern:
+
+    #Branch head written by rule2regex:
+    branchPrefix='(?:^|\\[)'
+    wildcard='(.+)'
+    metaChars=set('.^$*+?{}[]|()\\')
+
+    def __init__(self,pattern):
+        '''
+        Linear-time matcher for the patterns rule2regex
+        writes: runs of literal characters and character
+        classes ("segments") joined by greedy "(.+)"
+        wildcards, with an optional "(?:^|\[)" head.
+
+        Example:
+        INPUT
+        Pattern: (?:^|\[)Gal\(b1\-[0-9]\)(.+)GlcNAc
+        OUTPUT
+        branch=True
+        segments=[[G,a,l,(,b,1,-,{0..9},)],[G,l,c,N,A,c]]
+        trailingWildcard=False
+
+        Greedy wildcards always leave each later segment
+        at its last possible occurrence, so a match is
+        found from the occurrences of each segment
+        without backtracking.  Patterns outside this
+        grammar raise unsupportedPatternError.
+        '''
+        self.pattern=pattern
+        self.branch=pattern.startswith(self.branchPrefix)
+        rest=pattern[len(self.branchPrefix):] if self.branch else pattern
+        self.segments=[]
+        self.trailingWildcard=False
+        segment=[]
+        i=0
+        while i<len(rest):
+            if rest.startswith(self.wildcard,i):
+                if len(segment)==0:
+                    raise unsupportedPatternError(pattern)
+                self.segments.append(segment)
+                segment=[]
+                i+=len(self.wildcard)
+                continue
+            charSet,i=self.parse_char(rest,i)
+            #Quantified characters are not in the grammar:
+            if i<len(rest) and rest[i] in '?*+{':
+                raise unsupportedPatternError(pattern)
+            segment.append(charSet)
+        if len(segment)>0:
+            self.segments.append(segment)
+        elif len(self.segments)>0:
+            self.trailingWildcard=True
+        else:
+            raise unsupportedPatternError(pattern)
+
+    def parse_char(self,rest,i):
+        '''
+        Reads one literal character, escape or character
+        class at "i".  Returns (characters,next index),
+        where characters is a one-character string for
+        literals and a frozenset for classes.
+        '''
+        ch=rest[i]
+        if ch=='\\':
+            if i+1>=len(rest) or rest[i+1].isalnum():
+                raise unsupportedPatternError(self.pattern)
+            return(rest[i+1],i+2)
+        if ch=='[':
+            #Plain classes such as [0-9]:
+            end=rest.find(']',i+2)
+            body=rest[i+1:end]
+            if end<0 or body.startswith('^') or '\\' in body or '[' in body:
+                raise unsupportedPatternError(self.pattern)
+            chars=set()
+            j=0
+            while j<len(body):
+                if j+2<len(body) and body[j+1]=='-':
+                    chars.update(chr(c) for c in range(ord(body[j]),ord(body[j+2])+1))
+                    j+=3
+                else:
+                    chars.add(body[j])
+                    j+=1
+            return(frozenset(chars),end+1)
+        if ch in self.metaChars:
+            raise unsupportedPatternError(self.pattern)
+        return(ch,i+1)
+
+    @staticmethod
+    def occurrences(segment,string):
+        '''
+        Returns every (overlapping) start position of
+        "segment" in "string".
+        '''
+        #Find candidates from the longest literal run:
+        runs=[]
+        start=None
+        for k,c in enumerate(segment+[None]):
+            if isinstance(c,str):
+                start=k if start is None else start
+            elif start is not None:
+                runs.append((k-start,start,k))
+                start=None
+        if len(runs)==0:
+            candidates=range(len(string)-len(segment)+1)
+        else:
+            _,runStart,runEnd=max(runs)
+            literal=''.join(segment[runStart:runEnd])
+            candidates=[]
+            idx=string.find(literal)
+            while idx>=0:
+                if idx-runStart>=0:
+                    candidates.append(idx-runStart)
+                idx=string.find(literal,idx+1)
+        res=[]
+        for p in candidates:
+            if p+len(segment)>len(string):
+                break
+            if all((string[p+k]==c) if isinstance(c,str) else (string[p+k] in c) for k,c in enumerate(segment)):
+                res.append(p)
+        return(res)
+
+    def heads(self,string,pos):
+        '''
+        Yields (start,segment start) for each place the
+        first segment may begin, from "pos" on.
+        '''
+        if not self.branch:
+            for p in self.occurrences(self.segments[0],string):
+                if p>=pos:
+                    yield(p,p)
+            return
+        firstOcc=set(self.occurrences(self.segments[0],string))
+        if pos==0 and 0 in firstOcc:
+            yield(0,0)
+        idx=string.find('[',pos)
+        while idx>=0:
+            if idx+1 in firstOcc:
+                yield(idx,idx+1)
+            idx=string.find('[',idx+1)
+
+    def finditer(self,string,pos=0):
+        if '\n' in string:
+            #"." does not match newlines:
+            yield from re.compile(self.pattern).finditer(string,pos)
+            return
+        if len(self.segments)==1 and not self.trailingWildcard:
+            #No wildcards, non-overlapping occurrences:
+            segLen=len(self.segments[0])
+            end=pos
+            for start,segStart in self.heads(string,pos):
+                if start>=end:
+                    end=segStart+segLen
+                    yield(ruleMatch(string,[(start,end)]))
+            return
+        #Each later segment at its last occurrence that
+        # leaves at least one character for the wildcard
+        # before the next segment:
+        limit=len(string)-1 if self.trailingWildcard else len(string)
+        positions=[]
+        for seg in reversed(self.segments[1:]):
+            occ=self.occurrences(seg,string)
+            k=bisect.bisect_right(occ,limit-len(seg))-1
+            if k<0:
+                return
+            positions.append(occ[k])
+            limit=occ[k]-1
+        positions.reverse()
+        firstLen=len(self.segments[0])
+        for start,segStart in self.heads(string,pos):
+            if segStart+firstLen>limit:
+                break
+            #Wildcard groups run from the end of one segment
+            # to the start of the next:
+            segEnds=[segStart+firstLen]+[p+len(seg) for p,seg in zip(positions,self.segments[1:])]
+            if self.trailingWildcard:
+                spans=[(start,len(string))]+list(zip(segEnds,positions+[len(string)]))
+            else:
+                spans=[(start,segEnds[-1])]+list(zip(segEnds,positions))
+            yield(ruleMatch(string,spans))
+            #Later segments are at their last occurrence,
+            # no further match can follow this one:
+            return
+
+    def match(self,string,pos=0):
+        for m in self.finditer(string,pos):
+            return(m if m.start()==pos else None)
+        return(None)
+
+    def search(self,string,pos=0):
+        for m in self.finditer(string,pos):
+            return(m)
+        return(None)
+
+class ruleBackend(reBackend):
+
+    def __init__(self):
+        '''
+        Compiles rule2regex patterns into rulePatterns,
+        and every other pattern with the "re" module.
+        "stats" counts the patterns compiled each way.
+        '''
+        super().__init__(re,'rule')
+        self.stats={'rule':0,'re':0}
+
+    @functools.lru_cache(maxsize=4096)
+    def compile(self,pattern):
+        try:
+            compiled=rulePattern(pattern)
+            self.stats['rule']+=1
+        except unsupportedPatternError:
+            compiled=re.compile(pattern)
+            self.stats['re']+=1
+        return(compiled)
+
+##################
+# Backend Registry
+##################
+backends={'re':reBackend(),'rule':ruleBackend()}
+#The third-party "regex" module is optional:
+try:
+    import regex
+    backends['regex']=reBackend(regex,'regex')
+except ImportError:
+    pass
+
+activeBackend=backends['re']
+
+def set_backend(name):
+    '''
+    Makes "name" the backend that compiles every new
+    pattern.  Patterns compiled earlier are kept.
+    '''
+    global activeBackend
+    if name not in backends:
+        raise Exception('Unknown or unavailable regex backend: %s' %(name))
+    activeBackend=backends[name]
+
+def compile(pattern):
+    return(activeBackend.compile(pattern))
+
@@ -0,0 +1,244 @@
+import sys
+import time
+import argparse
+import functools
+import pandas as pd
+from tokenClasses_lex import *
+from ruleInterpreter import *
+
+####################################
+# Rule Expansion Cardinality:
+#  Computes how many substrate/product
+#  permutations, and how much regex text,
+#  pairListBuilder would produce for a
+#  reaction rule, from the options of
+#  each token rather than their product.
+####################################
+
+#Rule sets with more permutations are flagged:
+defaultThreshold=64
+
+class expansionStats:
+
+    __slots__=('permutations','substratePermutations','productPermutations','forwardChars','reverseChars','longestPattern')
+
+    def __init__(self,permutations=0,substratePermutations=0,productPermutations=0,forwardChars=0,reverseChars=0,longestPattern=0):
+        '''
+        Expansion of a rule set, or a sum over the rule
+        sets of a rule:
+        - permutations: substrate/product pairs, one
+          forward and one reverse processor each.
+        - substratePermutations/productPermutations:
+          permutations of each side, before pairing.
+        - forwardChars/reverseChars: characters of regex
+          compiled for the forward/reverse processors.
+        - longestPattern: upper bound on the characters
+          of a single pattern.
+        '''
+        self.permutations=permutations
+        self.substratePermutations=substratePermutations
+        self.productPermutations=productPermutations
+        self.forwardChars=forwardChars
+        self.reverseChars=reverseChars
+        self.longestPattern=longestPattern
+
+    def __add__(self,other):
+        return(expansionStats(*[getattr(self,a)+getattr(other,a) for a in self.__slots__[:-1]],max(self.longestPattern,other.longestPattern)))
+
+    def asdict(self):
+        return({a:getattr(self,a) for a in self.__slots__})
+
+class unexpandableRuleError(Exception):
+    def __init__(self,reason):
+        self.reason=reason
+        super().__init__('Rule set cannot be expanded: %s' %(reason))
+
+gen=generatorSet()
+#Written by rule2regex at the start of rules with no
+# leading wild card:
+branchPrefix='(?:^|\\[)'
+
+def token_options(token):
+    '''
+    Returns the substrate and product options of a
+    token as itertools.product iterates them: a string
+    is iterated one character at a time.
+    '''
+    substrates,products=token.substrate(),token.product()
+    if substrates is None or products is None:
+        raise unexpandableRuleError('%s has no substrate/product' %(token.kind))
+    substrates,products=list(substrates),list(products)
+    if not all([isinstance(o,str) for o in substrates+products]):
+        raise unexpandableRuleError('%s options are not strings' %(token.kind))
+    return(substrates,products)
+
+def product_size(optionLists):
+    return(functools.reduce(lambda n,o: n*len(o),optionLists,1))
+
+def prefix_counts(optionLists,count):
+    '''
+    Number of times each option of each token appears
+    in the first "count" permutations, in the order
+    itertools.product lists them.  Token k's option j
+    fills "stride" consecutive permutations in every
+    cycle of len(options)*stride, where stride is the
+    number of permutations of the later tokens.
+    '''
+    counts=[]
+    for k,opts in enumerate(optionLists):
+        stride=product_size(optionLists[k+1:])
+        cycles,rest=divmod(count,stride*len(opts))
+        counts.append([cycles*stride+min(stride,max(0,rest-j*stride)) for j in range(len(opts))])
+    return(counts)
+
+def front_wild_permutations(optionLists,count):
+    '''
+    Number of the first "count" permutations starting
+    with "...": the options before a "..." option are
+    all empty.  Exact for every permutation, scaled
+    for fewer.
+    '''
+    permutations=product_size(optionLists)
+    frontWild=0
+    empty=1
+    for k,opts in enumerate(optionLists):
+        frontWild+=empty*len([o for o in opts if o.startswith('...')])*product_size(optionLists[k+1:])
+        empty*=len([o for o in opts if o==''])
+    return(frontWild if count==permutations else round(frontWild*count/permutations))
+
+def regex_chars(optionLists,count):
+    '''
+    Total regex length of the first "count"
+    permutations of the options, as rule2regex writes
+    them, computed from the number of permutations
+    each option appears in rather than by listing
+    them.  rule2regex drops a leading "..." and
+    writes the branch prefix on every other
+    permutation.
+    '''
+    if count==0:
+        return(0)
+    total=sum([sum([len(gen.fragment2regex(o))*n for o,n in zip(opts,counts)]) for opts,counts in zip(optionLists,prefix_counts(optionLists,count))])
+    frontWild=front_wild_permutations(optionLists,count)
+    return(total+len(branchPrefix)*(count-frontWild)-len(gen.wildcard)*frontWild)
+
+def longest_regex(optionLists):
+    '''
+    Upper bound on the regex length of one
+    permutation: the longest option of every token
+    and the branch prefix.
+    '''
+    return(len(branchPrefix)+sum([max([len(gen.fragment2regex(o)) for o in opts],default=0) for opts in optionLists]))
+
+def ruleset_cardinality(ruleSet):
+    '''
+    Returns the expansionStats of a rule set.
+    pairListBuilder zips the substrate and product
+    permutations, so the shorter side sets the
+    number of pairs.
+    '''
+    options=[token_options(t) for t in ruleSet]
+    substrates=[s for s,_ in options]
+    products=[p for _,p in options]
+    nSubstrates,nProducts=product_size(substrates),product_size(products)
+    pairs=min(nSubstrates,nProducts)
+    longest=max(longest_regex(substrates),longest_regex(products)) if pairs>0 else 0
+    return(expansionStats(pairs,nSubstrates,nProducts,regex_chars(substrates,pairs),regex_chars(products,pairs),longest))
+
+def rule_cardinality(string):
+    '''
+    Lexes a reaction rule string and returns
+    (expansionStats of the rule,expansionStats of
+    each rule set), without building the rule.
+    '''
+    ruleSets,_=Rule.getRuleSets(lexer(string))
+    stats=[ruleset_cardinality(rs) for rs in ruleSets]
+    return(functools.reduce(lambda x,y: x+y,stats,expansionStats()),stats)
+
+def expanded_cardinality(string):
+    '''
+    The expansionStats of a rule, counted by expanding
+    every rule set with pairListBuilder.
+    '''
+    rl=reactionRule.__new__(reactionRule)
+    Rule.__init__(rl,lexer(string))
+    stats=expansionStats()
+    for rs in rl.ruleSets:
+        pairs=rl.pairListBuilder(rs)
+        forward=[len(gen.rule2regex(s)) for s,_ in pairs]
+        reverse=[len(gen.rule2regex(p)) for _,p in pairs]
+        subs=product_size([list(t.substrate()) for t in rs])
+        prds=product_size([list(t.product()) for t in rs])
+        stats=stats+expansionStats(len(pairs),subs,prds,sum(forward),sum(reverse),max(forward+reverse,default=0))
+    return(stats)
+
+def load_reaction_rules(path='../finishedGlycogenes.xlsx'):
+    '''
+    Returns (geneName,rule string) for every reaction
+    rule in the glycogene table.
+    '''
+    finishedGlycogenes=pd.read_excel(path)
+    return([(r['geneName'],r['Rules']) for i,r in finishedGlycogenes.iterrows() if isinstance(r['Rules'],str) and r['Rules']!='no reaction'])
+
+def scan_rules(rules,threshold=defaultThreshold):
+    '''
+    Estimates every rule in "rules".  Returns
+    (results,flagged,errors): results holds
+    (geneName,string,expansionStats) for every rule,
+    flagged the results with a rule set over
+    "threshold" permutations, and errors
+    (geneName,string,reason) for rules that cannot be
+    estimated.
+    '''
+    results,flagged,errors=[],[],[]
+    for geneName,string in rules:
+        try:
+            stats,setStats=rule_cardinality(string)
+        except Exception as e:
+            errors.append((geneName,string,str(e) if isinstance(e,unexpandableRuleError) else type(e).__name__))
+            continue
+        results.append((geneName,string,stats))
+        if any([s.permutations>threshold for s in setStats]):
+            flagged.append((geneName,string,stats))
+    return(results,flagged,errors)
+
+if __name__=='__main__':
+    parser=argparse.ArgumentParser(description='Estimates the substrate/product permutations and regex size of every reaction rule without expanding them, and flags rules over a threshold.')
+    parser.add_argument('--corpus',default='../finishedGlycogenes.xlsx')
+    parser.add_argument('--threshold',type=int,default=defaultThreshold,help='Permutations allowed in one rule set.')
+    parser.add_argument('--rule',action='append',default=[],help='Estimate this rule string instead of the corpus (repeatable).')
+    parser.add_argument('--verify',action='store_true',help='Check the estimates by expanding every rule under the threshold.')
+    parser.add_argument('--top',type=int,default=10,help='Number of largest rules to list.')
+    args=parser.parse_args()
+
+    rules=[('rule %d' %(i),s) for i,s in enumerate(args.rule)] if args.rule else load_reaction_rules(args.corpus)
+    start=time.perf_counter()
+    results,flagged,errors=scan_rules(rules,args.threshold)
+    elapsed=time.perf_counter()-start
+    total=functools.reduce(lambda x,y: x+y,[s for _,_,s in results],expansionStats())
+    print('%d rules estimated in %.2f s: %d permutations, %d forward and %d reverse regex characters, longest pattern %d' %(len(results),elapsed,total.permutations,total.forwardChars,total.reverseChars,total.longestPattern))
+    print('Largest rules:')
+    for geneName,string,stats in sorted(results,key=lambda r: r[2].permutations,reverse=True)[:args.top]:
+        print('  %-10s permutations: %8d  regex characters: %10d  %s' %(geneName,stats.permutations,stats.forwardChars+stats.reverseChars,string))
+    print('%d rules over %d permutations in a rule set:' %(len(flagged),args.threshold))
+    for geneName,string,stats in flagged:
+        print('  %-10s permutations: %8d  substrate: %8d  product: %8d  %s' %(geneName,stats.permutations,stats.substratePermutations,stats.productPermutations,string))
+    if errors:
+        print('%d rules could not be estimated:' %(len(errors)))
+        for geneName,string,reason in errors:
+            print('  %-10s %s  %s' %(geneName,reason,string))
+    if args.verify:
+        mismatches=0
+        flaggedNames=set([(g,s) for g,s,_ in flagged])
+        for geneName,string,stats in results:
+            if (geneName,string) in flaggedNames:
+                continue
+            try:
+                expected=expanded_cardinality(string)
+            except Exception as e:
+                expected=type(e).__name__
+            exact=['permutations','substratePermutations','productPermutations','forwardChars','reverseChars']
+            if not isinstance(expected,expansionStats) or any([getattr(expected,a)!=getattr(stats,a) for a in exact]) or expected.longestPattern>stats.longestPattern:
+                mismatches+=1
+                print('  %-10s estimate: %s  expanded: %s' %(geneName,stats.asdict(),expected if isinstance(expected,str) else expected.asdict()),file=sys.stderr)
+        print('Verified against expansion: %d mismatches' %(mismatches))
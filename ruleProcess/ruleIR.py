@@ -0,0 +1,565 @@
+import re
+import json
+
+####################################
+# Rule Intermediate Representation:
+#  The patterns of a compiled rule as a
+#  tree of nodes, between the substrate/
+#  product strings of its rule sets and
+#  the regex matched by its processors.
+#  Optimizer passes rewrite the tree of
+#  each rule direction before the
+#  matchers are generated from it.
+####################################
+
+#Text without characters rule2regex leaves to regex,
+# matched character for character:
+exactText=re.compile(r'[^\.\?\$\^\*\+\{\}\|\\]*$')
+
+class irNode:
+    '''
+    Base class of IR nodes.  Nodes compare equal when
+    they write the same regex, whatever sites they
+    mark, so duplicate patterns can be found with a
+    dict.
+    '''
+    __slots__=()
+
+    def __eq__(self,other):
+        return(isinstance(other,irNode) and self.regex()==other.regex())
+
+    def __hash__(self):
+        return(hash(self.regex()))
+
+    def __repr__(self):
+        return('%s(%s)' %(type(self).__name__,self.regex()))
+
+    def minLength(self):
+        '''
+        Fewest characters a match of the node consumes.
+        '''
+        return(0)
+
+    def to_json(self):
+        return(json.dumps(self.to_dict()))
+
+class literal(irNode):
+    '''
+    Rule text written as rule2regex writes it:
+    parentheses, brackets and dashes escaped.
+    '''
+    __slots__=('text','site')
+
+    def __init__(self,text,site=None):
+        self.text=text
+        self.site=site
+
+    def regex(self,capture=True):
+        return(re.sub(r'([\(\)\[\]\-])',r'\\\1',self.text))
+
+    def minLength(self):
+        return(len(self.text))
+
+    def to_dict(self):
+        return({'node':'literal','text':self.text,'site':self.site})
+
+class wildcard(irNode):
+    '''
+    A "..." within a rule: any text, captured for the
+    "to" string.
+    '''
+    __slots__=('site',)
+
+    def __init__(self,site=None):
+        self.site=site
+
+    def regex(self,capture=True):
+        return('(.+)' if capture else '.+')
+
+    def minLength(self):
+        return(1)
+
+    def to_dict(self):
+        return({'node':'wildcard','site':self.site})
+
+class anyLinkage(irNode):
+    '''
+    An uncertain linkage position, "-?".
+    '''
+    __slots__=('site',)
+
+    def __init__(self,site=None):
+        self.site=site
+
+    def regex(self,capture=True):
+        return('\\-[0-9]')
+
+    def minLength(self):
+        return(2)
+
+    def to_dict(self):
+        return({'node':'anyLinkage','site':self.site})
+
+class anchor(irNode):
+    '''
+    A position a match is tied to: "branch", the start
+    of the glycan or of a branch, written at the start
+    of rules with no leading wild card, or "end", a
+    "$" in the rule.
+    '''
+    __slots__=('at',)
+
+    def __init__(self,at):
+        self.at=at
+
+    def regex(self,capture=True):
+        return('(?:^|\\[)' if self.at=='branch' else '$')
+
+    def to_dict(self):
+        return({'node':'anchor','at':self.at})
+
+class sequence(irNode):
+    __slots__=('items',)
+
+    def __init__(self,items):
+        self.items=list(items)
+
+    def regex(self,capture=True):
+        return(''.join([n.regex(capture) for n in self.items]))
+
+    def minLength(self):
+        return(sum([n.minLength() for n in self.items]))
+
+    def to_dict(self):
+        return({'node':'sequence','items':[n.to_dict() for n in self.items]})
+
+class branch(irNode):
+    '''
+    A bracketed glycan branch.  Brackets left open or
+    closed within a rule stay literal text.
+    '''
+    __slots__=('body',)
+
+    def __init__(self,body):
+        self.body=body
+
+    def regex(self,capture=True):
+        return('\\[%s\\]' %(self.body.regex(capture)))
+
+    def minLength(self):
+        return(2+self.body.minLength())
+
+    def to_dict(self):
+        return({'node':'branch','body':self.body.to_dict()})
+
+class alternative(irNode):
+    __slots__=('options',)
+
+    def __init__(self,options):
+        self.options=list(options)
+
+    def regex(self,capture=True):
+        if len(self.options)==1:
+            return(self.options[0].regex(capture))
+        return('(?:%s)' %('|'.join([n.regex(capture) for n in self.options])))
+
+    def minLength(self):
+        return(min([n.minLength() for n in self.options]))
+
+    def to_dict(self):
+        return({'node':'alternative','options':[n.to_dict() for n in self.options]})
+
+class optional(irNode):
+    __slots__=('body',)
+
+    def __init__(self,body):
+        self.body=body
+
+    def regex(self,capture=True):
+        return('(?:%s)?' %(self.body.regex(capture)))
+
+    def to_dict(self):
+        return({'node':'optional','body':self.body.to_dict()})
+
+nodeKinds={'literal':literal,'wildcard':wildcard,'anyLinkage':anyLinkage,'anchor':anchor,
+           'sequence':sequence,'branch':branch,'alternative':alternative,'optional':optional}
+
+def node_from_dict(d):
+    kind=nodeKinds[d['node']]
+    if kind is literal:
+        return(literal(d['text'],d['site']))
+    if kind in (wildcard,anyLinkage):
+        return(kind(d['site']))
+    if kind is anchor:
+        return(anchor(d['at']))
+    if kind is sequence:
+        return(sequence([node_from_dict(n) for n in d['items']]))
+    if kind is alternative:
+        return(alternative([node_from_dict(n) for n in d['options']]))
+    return(kind(node_from_dict(d['body'])))
+
+###############
+# IR Builders:
+###############
+
+fragmentPieces=re.compile(r'\.\.\.|\-\?|\$|\[|\]|[^\.\-\$\[\]]+|.')
+
+def fragment_nodes(text,site=None):
+    '''
+    Splits the text of a token into leaf nodes.
+    Brackets are returned as ("[",site) or ("]",site)
+    to be paired by nest_branches.
+    '''
+    nodes=[]
+    for piece in fragmentPieces.findall(text):
+        if piece=='...':
+            nodes.append(wildcard(site))
+        elif piece=='-?':
+            nodes.append(anyLinkage(site))
+        elif piece=='$':
+            nodes.append(anchor('end'))
+        elif piece in ('[',']'):
+            nodes.append((piece,site))
+        else:
+            nodes.append(literal(piece,site))
+    return(nodes)
+
+def merge_literals(nodes):
+    '''
+    Joins adjacent literals marking the same site.
+    '''
+    merged=[]
+    for n in nodes:
+        if isinstance(n,literal) and merged and isinstance(merged[-1],literal) and merged[-1].site==n.site:
+            merged[-1]=literal(merged[-1].text+n.text,n.site)
+        else:
+            merged.append(n)
+    return(merged)
+
+def nest_branches(nodes):
+    '''
+    Pairs the brackets returned by fragment_nodes into
+    branch nodes.  Unpaired brackets become literals.
+    '''
+    levels=[[]]
+    opened=[]
+    for n in nodes:
+        if isinstance(n,tuple) and n[0]=='[':
+            levels.append([])
+            opened.append(n[1])
+        elif isinstance(n,tuple) and len(levels)>1:
+            body=levels.pop()
+            opened.pop()
+            levels[-1].append(branch(sequence(merge_literals(body))))
+        elif isinstance(n,tuple):
+            levels[-1].append(literal(']',n[1]))
+        else:
+            levels[-1].append(n)
+    #Brackets never closed:
+    while len(levels)>1:
+        body=levels.pop()
+        levels[-1].extend([literal('[',opened.pop())]+body)
+    return(sequence(merge_literals(levels[0])))
+
+def pattern_ir(fragments):
+    '''
+    IR of the pattern rule2regex writes for a rule
+    string, given as (text,site) fragments: the text
+    each token contributes and the site it marks.  A
+    leading "..." lets the pattern match anywhere, so
+    it is dropped rather than written as a group.
+    Other patterns start at the start of the glycan or
+    of a branch.
+    '''
+    leaves=[n for text,site in fragments for n in fragment_nodes(text,site)]
+    if leaves and isinstance(leaves[0],wildcard):
+        leaves=leaves[1:]
+    else:
+        leaves=[anchor('branch')]+leaves
+    return(nest_branches(leaves))
+
+class rulePermutation:
+    '''
+    A pattern of a rule direction, with the "to"
+    strings written for its matches.  "targets" holds
+    (to string, indices of the permutations with this
+    pattern and "to" string).  "anchor" is text every
+    match contains, or None.
+    '''
+    __slots__=('pattern','targets','anchor')
+
+    def __init__(self,pattern,targets,anchor=None):
+        self.pattern=pattern
+        self.targets=targets
+        self.anchor=anchor
+
+    def to_dict(self):
+        return({'pattern':self.pattern.to_dict(),'targets':[[to,list(idx)] for to,idx in self.targets],'anchor':self.anchor})
+
+    @classmethod
+    def from_dict(cls,d):
+        return(cls(node_from_dict(d['pattern']),[(to,idx) for to,idx in d['targets']],d['anchor']))
+
+class ruleDirection:
+    '''
+    The forward or reverse patterns of a reaction rule:
+    - permutations: rulePermutations, in the order of
+      their first permutation.
+    - size: number of substrate/product permutations.
+    - dropped: permutations that can never match.
+    - anchor: text every match of every pattern
+      contains, or None.
+    - screen: one pattern matching wherever a pattern
+      of the direction does, or None.
+    '''
+    __slots__=('permutations','size','dropped','anchor','screen')
+
+    def __init__(self,permutations,size,dropped=(),anchor=None,screen=None):
+        self.permutations=permutations
+        self.size=size
+        self.dropped=list(dropped)
+        self.anchor=anchor
+        self.screen=screen
+
+    def replace(self,**changes):
+        fields={f:getattr(self,f) for f in self.__slots__}
+        fields.update(changes)
+        return(ruleDirection(**fields))
+
+    def to_dict(self):
+        return({'permutations':[p.to_dict() for p in self.permutations],'size':self.size,'dropped':self.dropped,
+                'anchor':self.anchor,'screen':None if self.screen is None else self.screen.to_dict()})
+
+    @classmethod
+    def from_dict(cls,d):
+        return(cls([rulePermutation.from_dict(p) for p in d['permutations']],d['size'],d['dropped'],d['anchor'],
+                   None if d['screen'] is None else node_from_dict(d['screen'])))
+
+    def to_json(self):
+        return(json.dumps(self.to_dict()))
+
+    @classmethod
+    def from_json(cls,string):
+        return(cls.from_dict(json.loads(string)))
+
+def direction_ir(frm_list,to_list):
+    '''
+    The ruleDirection of (text,site) fragment lists
+    "frm_list", with one pattern per permutation, taken
+    to the strings of "to_list".
+    '''
+    return(ruleDirection([rulePermutation(pattern_ir(frm),[(to,[i])]) for i,(frm,to) in enumerate(zip(frm_list,to_list))],len(frm_list)))
+
+class ruleConstraint:
+    '''
+    The pattern of a constraint method, whether it is
+    negated or counted, whether anything can match it
+    and the text every match contains.
+    '''
+    __slots__=('pattern','negation','numeric','reachable','anchor')
+
+    def __init__(self,pattern,negation=False,numeric=False,reachable=True,anchor=None):
+        self.pattern=pattern
+        self.negation=negation
+        self.numeric=numeric
+        self.reachable=reachable
+        self.anchor=anchor
+
+    def to_dict(self):
+        return({f:getattr(self,f) for f in self.__slots__[1:]}|{'pattern':self.pattern.to_dict()})
+
+    @classmethod
+    def from_dict(cls,d):
+        return(cls(node_from_dict(d['pattern']),d['negation'],d['numeric'],d['reachable'],d['anchor']))
+
+###################
+# Optimizer Passes:
+###################
+
+def end_state(node,ended=False):
+    '''
+    Whether a match of "node" must stop at the end of
+    the glycan, given whether the text before it did,
+    or None if nothing can match.  A "$" followed by
+    text cannot match, as glycans hold no newlines.
+    '''
+    if ended and node.minLength()>0:
+        return(None)
+    if isinstance(node,anchor):
+        return(ended or node.at=='end')
+    if isinstance(node,sequence):
+        for n in node.items:
+            ended=end_state(n,ended)
+            if ended is None:
+                return(None)
+        return(ended)
+    if isinstance(node,branch):
+        #The closing bracket follows the body:
+        return(None if end_state(node.body) is not False else False)
+    if isinstance(node,alternative):
+        states=[s for s in [end_state(n,ended) for n in node.options] if s is not None]
+        return(all(states) if states else None)
+    if isinstance(node,optional):
+        state=end_state(node.body,ended)
+        return(ended if state is None else ended and state)
+    return(ended)
+
+def drop_unreachable(direction):
+    '''
+    Drops the patterns nothing can match, such as
+    "$[Cad]" in rules written for the end of a chain.
+    '''
+    kept=[p for p in direction.permutations if end_state(p.pattern) is not None]
+    dropped=[i for p in direction.permutations if end_state(p.pattern) is None for _,idx in p.targets for i in idx]
+    return(direction.replace(permutations=kept,dropped=sorted(direction.dropped+dropped)))
+
+def merge_duplicates(direction):
+    '''
+    Merges permutations with the same pattern, so each
+    pattern is matched once, and their targets with
+    the same "to" string, so each product is written
+    once.
+    '''
+    merged=dict()
+    for p in direction.permutations:
+        targets=merged.setdefault(p.pattern,[])
+        for to,idx in p.targets:
+            same=[t for t in targets if t[0]==to]
+            if same:
+                same[0][1].extend(idx)
+            else:
+                targets.append((to,list(idx)))
+    return(direction.replace(permutations=[rulePermutation(pattern,targets) for pattern,targets in merged.items()]))
+
+def text_pieces(node):
+    '''
+    Text matched by "node" as a list of strings, with
+    None where the text is not known.
+    '''
+    if isinstance(node,literal):
+        return([node.text] if exactText.match(node.text) else [None])
+    if isinstance(node,sequence):
+        return([t for n in node.items for t in text_pieces(n)])
+    if isinstance(node,branch):
+        return(['[']+text_pieces(node.body)+[']'])
+    if isinstance(node,anyLinkage):
+        return(['-',None])
+    return([None])
+
+def text_runs(node):
+    '''
+    Runs of text every match of "node" contains.
+    '''
+    runs=['']
+    for t in text_pieces(node):
+        if t is None:
+            runs.append('')
+        else:
+            runs[-1]+=t
+    return([r for r in runs if r])
+
+def lead_text(node):
+    '''
+    Text every match of the pattern "node" starts
+    with, or None if it is not known.  Patterns
+    starting at a branch start with its "[", except
+    at the start of the glycan.
+    '''
+    items=node.items if isinstance(node,sequence) else [node]
+    prefix=''
+    if items and isinstance(items[0],anchor) and items[0].at=='branch':
+        prefix,items=('[',items[1:])
+    run=''
+    for t in text_pieces(sequence(items)):
+        if t is None:
+            break
+        run+=t
+    return(prefix+run if prefix+run else None)
+
+def hoist_anchors(direction):
+    '''
+    Hoists the longest run of text of each pattern out
+    as its anchor: glycans without it are not
+    searched.  The longest run contained in a run of
+    every pattern becomes the anchor of the direction.
+    '''
+    runs=[text_runs(p.pattern) for p in direction.permutations]
+    permutations=[rulePermutation(p.pattern,p.targets,max(r,key=len,default=None)) for p,r in zip(direction.permutations,runs)]
+    common=[c for c in sorted(set([c for r in runs for c in r]),key=len,reverse=True) if all([any([c in x for x in r]) for r in runs])]
+    return(direction.replace(permutations=permutations,anchor=common[0] if common and runs else None))
+
+def atoms(node):
+    '''
+    The leaves of a pattern, with literals split into
+    characters and brackets written as literals, for
+    factoring.  Sites are dropped.
+    '''
+    if isinstance(node,literal):
+        return([literal(c) for c in node.text])
+    if isinstance(node,sequence):
+        return([a for n in node.items for a in atoms(n)])
+    if isinstance(node,branch):
+        return([literal('[')]+atoms(node.body)+[literal(']')])
+    return([node])
+
+def common_length(seqs):
+    n=0
+    while all([len(s)>n for s in seqs]) and len(set([s[n] for s in seqs]))==1:
+        n+=1
+    return(n)
+
+def factor(options):
+    '''
+    Writes alternative atom sequences as one node: the
+    common prefix and suffix are factored out, and the
+    rest is factored again by first atom.
+    '''
+    if len(options)==1:
+        return(sequence(merge_literals(options[0])))
+    prefix=common_length(options)
+    rest=[o[prefix:] for o in options]
+    suffix=common_length([o[::-1] for o in rest])
+    middle=[o[:len(o)-suffix] for o in rest]
+    groups=dict()
+    for m in middle:
+        groups.setdefault(m[0] if m else None,[]).append(m)
+    body=[factor(g) for first,g in groups.items() if first is not None]
+    body=body[0] if len(body)==1 else alternative(body)
+    if None in groups:
+        body=optional(body)
+    return(sequence(merge_literals(options[0][:prefix]+[body]+options[0][len(options[0])-suffix:])))
+
+def factor_affixes(direction):
+    '''
+    Writes the patterns of a direction as a single
+    screen, their common prefixes and suffixes
+    factored out.  Wild cards are not captured.  The
+    screen matches a glycan if and only if one of the
+    patterns does.  Patterns with an anchor are mostly
+    skipped without a search, so a screen is only
+    written for directions with two or more patterns
+    without one.
+    '''
+    if len([p for p in direction.permutations if p.anchor is None])<2:
+        return(direction.replace(screen=None))
+    options=list(dict.fromkeys([tuple(atoms(p.pattern)) for p in direction.permutations]))
+    return(direction.replace(screen=factor([list(o) for o in options])))
+
+passes=[drop_unreachable,merge_duplicates,hoist_anchors,factor_affixes]
+
+def optimize(direction,passes=passes):
+    '''
+    Runs the optimizer passes over a ruleDirection.
+    '''
+    for p in passes:
+        direction=p(direction)
+    return(direction)
+
+def constraint_ir(fragments,negation=False,numeric=False):
+    '''
+    The optimized ruleConstraint of a constraint
+    pattern given as (text,site) fragments.
+    '''
+    pattern=pattern_ir(fragments)
+    reachable=end_state(pattern) is not None
+    return(ruleConstraint(pattern,negation,numeric,reachable,max(text_runs(pattern),key=len,default=None)))
@@ -1,4 +1,7 @@
 import re
+import regexBackends
+import ruleIR
+import compiledRuntime
 from tokenClasses_lex import *
 from LexerClass import *
 from itertools import product as prod,chain,tee
@@ -15,12 +18,6 @@ def pairwise(iterable):
     next(b, None)
     return zip(a, b)
 
-#######################
-# Default Lexer:
-#######################
-
-lexer=LexerClass(lexicon=[reactionToken,constraintToken,entityToken,multiToken,logicalToken],ukToken=unknownToken)
-
 ##########################
 # Rule String Exceptions
 ##########################
@@ -69,6 +66,9 @@ class malformedConstraintError(Exception):
 
 class generatorSet:
 
+    #Wild card group written for "..." by rule2regex:
+    wildcard='(.+)'
+
     def rule2regex(self,rl):
         '''
         Converts reaction rules into regex string.  Makes
@@ -99,6 +99,15 @@ class generatorSet:
             rl=re.sub(r'(\([ab][12]\-$)','\g<1>$')
         return(rl)
 
+    def fragment2regex(self,fragment):
+        '''
+        rule2regex for part of a rule string, without the
+        branch prefix written at the start of a rule.
+        '''
+        fragment=re.sub(r'([\(\)\[\]\-])',r'\\\1',fragment)
+        fragment=fragment.replace('...',self.wildcard)
+        return(re.sub(r'\-\?','-[0-9]',fragment))
+
 ##########################
 # Rule Superclass
 ##########################
@@ -112,6 +121,8 @@ class Rule:
         '''
         self.ruleComponents=ruleComponents
         self.ruleSets,self.logicalSeps=self.getRuleSets(self.ruleComponents)
+        #Lexicon version the rule was built with:
+        self.lexiconVersion=lexiconRegistry.version
 
     #######################
     #Rule Splitter Utility:
@@ -127,7 +138,7 @@ class Rule:
         separators=[]
         c_set=[]
         for e in ruleComponents:
-            if e.__name__=='logicalToken':
+            if e.kind=='logicalToken':
                 ruleSets.append(c_set)
                 c_set=[]
                 separators.append(e)
@@ -177,8 +188,8 @@ class Rule:
             Otherwise, returns "True" if all conditions
             in "fun" are satisfied.
             '''
-            validQuantityRuleToken=True if ruleSet[0].__name__=='quantityRule_token' else False
-            validQuantityToken=True if ruleSet[-1].__name__=='quantifierToken' else False
+            validQuantityRuleToken=True if ruleSet[0].kind=='quantityRule_token' else False
+            validQuantityToken=True if ruleSet[-1].kind=='quantifierToken' else False
             #Statements is a list of booleans returned by
             # the "fun":
             statements=fun(ruleSet)
@@ -208,7 +219,7 @@ class Rule:
     @checkWrapper
     @allTrueWrap
     def noUnknownTokens(ruleSet):
-        return([x.__name__!='unknownToken' for x in ruleSet])
+        return([x.kind!='unknownToken' for x in ruleSet])
 
     def basicValidationWrapper(self,ruleSets):
         return(self.validTokens(ruleSets) and self.noUnknownTokens(ruleSets))
@@ -223,64 +234,155 @@ class GlycanProcessorGenerator(generatorSet):
     Class which returns from/to strings for 
     processing substrates/products
     '''
-    def __init__(self,fromString,toString,reactionType):
+    def __init__(self,fromString,toString,reactionType,fromRegex=None,fromPattern=None):
         self.fromString=fromString
         self.toString=toString
         self.reactionType=reactionType
+        #Reaction type as the compiled rule runtime reads it:
+        self.reactionKind={additionToken:'addition',subtractionToken:'subtraction'}.get(reactionType)
+        #Compile the "from" pattern once, rather than for
+        # every glycan processed.  Rules built from the
+        # rule IR pass the pattern it writes, symbolic
+        # rules the pattern of their rule set:
+        self.fromRegex=self.rule2regex(self.fromString) if fromRegex is None else fromRegex
+        self.fromPattern=regexBackends.compile(self.fromRegex) if fromPattern is None else fromPattern
+        self.editScripts=self.makeEditScripts()
 
     #Call method for GlycanProcessorGenerator:
     def __call__(self,glycan):
         return(self.makeProducts(glycan))
      
     def constructToString(self,mtch):
+        '''
+        Constructs the new "to" string for a match with
+        the precomputed edit script.  Matches the script
+        does not cover are diffed with "ndiff".
+        '''
+        toString_clean=self.applyEditScript(mtch)
+        if toString_clean is None:
+            return(self.constructToString_ndiff(mtch))
+        return(self.fixToString(toString_clean,mtch))
+
+    def constructToString_ndiff(self,mtch):
         '''
         Calls the difflib "ndiff" routine to construct
         the new "to" string:
         '''
-        toString_clean=self.toString
-        if len(mtch.groups())>0:
-            toString_clean=re.sub('\.\.\.',mtch.groups()[0],toString_clean)
-        else:
-            #Assume the dots are at the front, indicating a
-            # wild card group:
-            toString_clean=re.sub('^\.{3}','',toString_clean)
-        toString_clean=re.sub('\$$','',toString_clean)
-        resList=[]
-        #Get Differential Symbol:
+        return(compiledRuntime.ndiff_to_string(self.toString,self.reactionKind,mtch))
+
+    def fixToString(self,toString_clean,mtch):
+        '''
+        Fixes the branching of a new "to" string.
+        '''
+        return(compiledRuntime.fix_to_string(toString_clean,mtch))
+
+    ##############
+    # Edit Scripts
+    ##############
+    #Template characters standing in for wildcard
+    # groups (one per group) and linkage positions:
+    groupChar=0xE000
+    digitChar='\uE0FF'
+
+    def makeEditScripts(self):
+        '''
+        Precomputes the edits that turn a match of the
+        "from" pattern into the new "to" string.
+
+        The "from" and "to" strings are diffed once, with
+        each wildcard group and each uncertain linkage
+        position ("-?") replaced by a template character
+        standing in for the text it matches:
+
+        INPUT
+        From: GlcNAc(b1-?)...Man(a1-3)
+        To:   GlcNAc(b1-?)...[GlcNAc(b1-4)]Man(a1-3)
+        OUTPUT
+        [('pos',0,0),...,('pos',0,10),('grp',1,'all'),('lit','[GlcNAc(b1-4)]',None),('pos',1,0),...]
+
+        Each edit either emits literal "to" text, the
+        match character at an offset in a "from" segment,
+        or a wildcard group's text.  Returns the scripts
+        keyed on the number of "[" characters the pattern
+        may read in front of the match, or None when the
+        matches cannot be laid out this way, and have to
+        be diffed with "ndiff".
+        '''
+        #Only addition and subtraction rules keep diff lines:
         if self.reactionType==additionToken:
             dsym='-'
         elif self.reactionType==subtractionToken:
             dsym='+'
-        for i,elt in enumerate(ndiff(toString_clean,mtch.group())):
-            df,elt=re.search('(.)\ (.)',elt).groups()
-            #Handles replacing ambiguous links here:
-            if (df=='-' and elt=='?'):
-                continue
-            elif (df in [' ',dsym]) or (df=='+' and elt.isdigit()):
-                resList.append(elt)
-        toString_clean=''.join(resList)
-        #Remove do
-        #Internal branching error:
-        if re.search('^\[.+?\].+?\]$',toString_clean) is not None:
-            toString_clean=re.sub('^(\[.+?)\](.+?\])$','\g<1>\g<2>',toString_clean)
-        #Beginning branch error:
-        elif re.search('^\]',toString_clean) is not None:
-            toString_clean=re.sub('^\]','',toString_clean)
-        #Fix front branch:
-        if mtch.group()[0]=='[' and toString_clean[0]!='[':
-            toString_clean=''.join(['[',toString_clean])
-        return(toString_clean)
+        else:
+            return(None)
+        frm=self.fromString
+        frontwild=frm.startswith('...')
+        if frontwild:
+            frm=frm[3:]
+        segments=frm.split('...')
+        for seg in segments:
+            #Only "(", ")", "[", "]", "-" and "-?" are
+            # read literally by rule2regex:
+            if any([c in seg for c in '.*+{}|^$\\']) or any([c=='?' and (i==0 or seg[i-1]!='-') for i,c in enumerate(seg)]):
+                return(None)
+        groupChars=[chr(self.groupChar+k) for k in range(len(segments))]
+        #The "to" string as constructToString_ndiff builds it:
+        to=self.toString
+        if len(segments)>1:
+            to=to.replace('...',groupChars[1])
+        elif to.startswith('...'):
+            to=to[3:]
+        if to.endswith('$'):
+            to=to[:-1]
+        toUnits=[(c,('lit',c)) for c in to]
+        scripts=dict()
+        for prefix in ([0] if frontwild else [0,1]):
+            #Match template and where each character is read:
+            matchUnits=[('[',('pos',0,-1))] if prefix else []
+            for k,seg in enumerate(segments):
+                if k>0:
+                    matchUnits.append((groupChars[k],('grp',k)))
+                matchUnits.extend([(self.digitChar if c=='?' else c,('pos',k,i)) for i,c in enumerate(seg)])
+            script=[]
+            toIdx,matchIdx=0,0
+            for line in ndiff(''.join([c for c,_ in toUnits]),''.join([c for c,_ in matchUnits])):
+                df,elt=line[0],line[2]
+                if df=='-':
+                    unit=toUnits[toIdx][1];toIdx+=1
+                    if elt=='?' or dsym!='-':
+                        continue
+                    #A "to" group is diffed as its characters:
+                    script.append(('grp',1,'noq') if len(segments)>1 and elt==groupChars[1] else unit)
+                elif df=='+':
+                    unit=matchUnits[matchIdx][1];matchIdx+=1
+                    if unit[0]=='grp':
+                        script.append((unit[0],unit[1],'all' if dsym=='+' else 'digits'))
+                    elif dsym=='+' or elt==self.digitChar or elt.isdigit():
+                        script.append(unit)
+                else:
+                    unit=matchUnits[matchIdx][1];toIdx+=1;matchIdx+=1
+                    script.append((unit[0],unit[1],'all') if unit[0]=='grp' else unit)
+            scripts[prefix]=(segments,script)
+        return(scripts)
+
+    def applyEditScript(self,mtch):
+        '''
+        Builds the new "to" string of a match from the
+        edit scripts, in one pass over the script.
+        Returns None if no script covers the match.
+        '''
+        return(compiledRuntime.edit_to_string(self.editScripts,mtch))
 
     def makeToRepString(self,fromWildGrp):
         toRepString=re.sub('(?!^)\.\.\.',fromWildGrp,self.toString)
         return(toRepString)
     
-    def getGlycanMatch(self,fromString_regex,glycan):
+    def getGlycanMatch(self,fromPattern,glycan):
         '''
         Performs the glycan matching procedure.
         Returns all possible matches
         '''
-        return(re.finditer(fromString_regex,glycan))
+        return(budget_finditer(fromPattern,glycan))
 
     def fixGlycanBranching(self,prd):
         '''
@@ -318,32 +420,266 @@ class GlycanProcessorGenerator(generatorSet):
         Method generates a list of strings that look
         like the "to" pattern.
         '''
-        fromString_regex=super().rule2regex(self.fromString)
         #self.toString=re.sub('^\.\.\.','',self.toString)
-        mtchs=self.getGlycanMatch(fromString_regex,glycan)
-        #Initialize a product list:
+        mtchs=self.getGlycanMatch(self.fromPattern,glycan)
+        return(self.productsFromMatches(mtchs,glycan))
+
+    def productsFromMatches(self,mtchs,glycan):
+        return([self.spliceProduct(m,glycan) for m in mtchs])
+
+    def spliceProduct(self,m,glycan):
+        '''
+        Replaces the text matched by "m" with its new
+        "to" string.
+        '''
+        to=self.constructToString(m)
+        #Re-add a "[" if processing the head of a branch:
+        #if re.search('^\[',m.group()) is not None:
+        #    to=''.join(['[',to])
+        #Replace text where "frm" was found with the "to" text:
+        return(''.join([glycan[:m.start()],to,glycan[m.end():]]))
+        #Fix broken branching here:
+        #products=[self.fixGlycanBranching(p) for p in products]
+
+#How reaction and constraint rules build their matchers,
+# passed to each rule as "matcherMode".  The products
+# are the same either way:
+# - "ir": generated from the optimized rule IR (ruleIR.py)
+# - "permutation": a matcher per substrate/product permutation
+# - "symbolic": a matcher per rule set, its token options
+#   written as alternations (SymbolicProcessorGenerator)
+matcherModes=('ir','permutation','symbolic')
+
+def check_matcher_mode(matcherMode):
+    '''
+    Raises an exception for an unknown "matcherMode".
+    '''
+    if matcherMode not in matcherModes:
+        raise Exception('Unknown matcher mode: %s' %(matcherMode))
+
+class IRProcessorGenerator(generatorSet):
+    '''
+    Runs the GlycanProcessorGenerators of a reaction
+    rule direction as its optimized ruleDirection lays
+    them out, and concatenates their products in
+    permutation order.
+    '''
+    #Shortest glycan matched in one scan of its sites,
+    # shorter glycans are searched once per pattern:
+    minScanLength=128
+
+    def __init__(self,direction,processors):
+        '''
+        "processors" holds a GlycanProcessorGenerator for
+        every permutation of "direction".  Each pattern
+        is matched once, by the processor of its first
+        permutation, and its matches handed to the
+        processor of each "to" string.
+        '''
+        self.direction=direction
+        self.processors=processors
+        #(anchor, pattern, [(processor, permutations)]) for each pattern:
+        self.patterns=[(p.anchor,processors[p.targets[0][1][0]].fromPattern,[(processors[idx[0]],idx) for _,idx in p.targets]) for p in direction.permutations]
+        self.screen=None if direction.screen is None else regexBackends.compile(direction.screen.regex(capture=False))
+        self.sites,self.leads=self.makeSites()
+
+    def makeSites(self):
+        '''
+        Directions with several patterns are matched in
+        one scan of the glycan: "sites" finds every
+        position where the text a pattern starts with
+        (its lead) occurs, and each pattern is only
+        matched at the sites of its lead.  "leads" holds
+        (lead, lead at the start of the glycan) of each
+        pattern.  Returns (None,None) where patterns are
+        searched one at a time.
+        '''
+        perms=self.direction.permutations
+        if len(perms)<2 or any([p.pattern.minLength()==0 for p in perms]):
+            return((None,None))
+        leads=[ruleIR.lead_text(p.pattern) for p in perms]
+        if None in leads:
+            return((None,None))
+        atStart=[l[1:] if isinstance(p.pattern.items[0],ruleIR.anchor) else l for l,p in zip(leads,perms)]
+        sites=regexBackends.compile('(?=%s)' %('|'.join([re.escape(l) for l in sorted(set(leads))])))
+        return((sites,list(zip(leads,atStart))))
+
+    def __call__(self,glycan):
+        return(self.makeProducts(glycan))
+
+    def scanMatches(self,glycan,live):
+        '''
+        The matches of each pattern in "live", found in
+        one scan of the glycan for the sites of their
+        leads.  Each pattern is matched at the sites of
+        its lead past the end of its last match, which
+        gives the matches "finditer" returns.
+        '''
+        mtchs={k:[] for k in live}
+        ends={k:0 for k in live}
+        #The start of the glycan is a site of every pattern:
+        sites=chain([0],[m.start() for m in self.sites.finditer(glycan,1)])
+        for site in sites:
+            for k in live:
+                lead,atStart=self.leads[k]
+                if site<ends[k] or not (glycan.startswith(lead,site) or (site==0 and glycan.startswith(atStart))):
+                    continue
+                m=self.patterns[k][1].match(glycan,site)
+                if m is not None:
+                    mtchs[k].append(m)
+                    ends[k]=m.end()
+        return(mtchs)
+
+    def makeProducts(self,glycan):
+        '''
+        Glycans without the anchor of the direction, or
+        that the screen does not match, have no products.
+        Patterns are only searched for in glycans
+        holding their anchor, in one scan of long
+        glycans holding several.
+        '''
+        if self.direction.anchor is not None and self.direction.anchor not in glycan:
+            return([])
+        if self.screen is not None and self.screen.search(glycan) is None:
+            return([])
+        live=[k for k,(anchorText,_,_) in enumerate(self.patterns) if anchorText is None or anchorText in glycan]
+        if self.sites is not None and len(live)>1 and len(glycan)>=self.minScanLength:
+            matches=budget_guard(self.sites.pattern,glycan,self.scanMatches,glycan,live)
+        else:
+            matches={k:list(budget_finditer(self.patterns[k][1],glycan)) for k in live}
+        results=[None]*self.direction.size
+        for k,mtchs in matches.items():
+            if not mtchs:
+                continue
+            for gpg,idx in self.patterns[k][2]:
+                products=gpg.productsFromMatches(mtchs,glycan)
+                for i in idx:
+                    results[i]=products
+        return([prd for products in results if products for prd in products])
+
+
+class SymbolicProcessorGenerator(generatorSet):
+    '''
+    Runs every substrate/product permutation of a rule
+    set with one pattern, each token's options written
+    as an alternation, and lists their products in
+    permutation order, as the processors of the
+    expanded permutations do.
+    '''
+    #Characters choosing the option of each token after
+    # the glycan, "anyChoice" lets every option match:
+    choiceChar=0x100
+    anyChoice='*'
+
+    def __init__(self,frm_options,to_options,reactionType):
+        '''
+        "frm_options" and "to_options" hold the "from"
+        and "to" text of each option of each token of
+        the rule set.
+
+        Each option of a token with several is tagged
+        with a lookahead reading the option chosen for
+        the token from a "choice" string written after
+        the glycan and a newline.  The wildcards, which
+        do not match the newline, stay in the glycan,
+        and a "$" is written as a lookahead for it.
+        Matching "glycan\\n<choices>" finds the matches
+        of the permutation the choices spell out, with
+        the choice characters written A, B, ... here:
+
+        INPUT
+        Options: [[Gal(b1-4)],[GlcNAc,GlcNAc6S],[...]]
+        OUTPUT
+        (?:^|\[)Gal\(b1\-4\)(?:(?=.*\\n[A*])GlcNAc|(?=.*\\n[B*])GlcNAc6S)(.+)
+        '''
+        self.frm_options=frm_options
+        self.to_options=to_options
+        self.reactionType=reactionType
+        #Tokens with several options:
+        self.choices=[k for k,opts in enumerate(frm_options) if len(opts)>1]
+        pieces=[[self.fragment2regex(o) for o in opts] for opts in frm_options]
+        #The first token with any text starts the pattern:
+        first=[k for k,opts in enumerate(frm_options) if any(opts)][0]
+        frontwild=frm_options[first][0].startswith('...')
+        if frontwild:
+            pieces[first]=[self.fragment2regex(o[3:]) for o in frm_options[first]]
+        #Wildcard groups of each option, numbered through
+        # the whole pattern:
+        self.groups=[]
+        regex=[] if frontwild else ['(?:^|\\[)']
+        ngroups=0
+        for k,opts in enumerate(pieces):
+            self.groups.append([])
+            alternatives=[]
+            for i,piece in enumerate(opts):
+                n=piece.count(self.wildcard)
+                self.groups[k].append(list(range(ngroups+1,ngroups+n+1)))
+                ngroups+=n
+                piece=piece.replace('$','(?=\\n)')
+                if len(opts)>1:
+                    piece='(?=.*\\n%s[%s%s])%s' %('.'*self.choices.index(k),chr(self.choiceChar+i),self.anyChoice,piece)
+                alternatives.append(piece)
+            regex.append(alternatives[0] if len(opts)==1 else '(?:%s)' %('|'.join(alternatives)))
+        self.fromRegex=''.join(regex)
+        self.fromPattern=regexBackends.compile(self.fromRegex)
+        #GlycanProcessorGenerators of the permutations
+        # matched so far, which build their "to" strings:
+        self.targets=dict()
+        #Text every match of each option contains:
+        self.runs=[[ruleIR.text_runs(ruleIR.nest_branches(ruleIR.fragment_nodes(o))) for o in opts] for opts in frm_options]
+
+    def __call__(self,glycan):
+        return(self.makeProducts(glycan))
+
+    def target(self,perm):
+        '''
+        GlycanProcessorGenerator of the permutation
+        "perm", a tuple of option indices.
+        '''
+        if perm not in self.targets:
+            frm=''.join([opts[i] for opts,i in zip(self.frm_options,perm)])
+            to=''.join([opts[i] for opts,i in zip(self.to_options,perm)])
+            self.targets[perm]=GlycanProcessorGenerator(frm,to,self.reactionType,fromPattern=self.fromPattern)
+        return(self.targets[perm])
+
+    def permutationMatches(self,glycan,perm):
+        '''
+        The matches of the permutation "perm" in the
+        glycan, with the wildcard groups of its options
+        numbered as in its own pattern.
+        '''
+        choice=''.join([chr(self.choiceChar+perm[k]) for k in self.choices])
+        groups=[g for opts,i in zip(self.groups,perm) for g in opts[i]]
+        return([regexBackends.ruleMatch(glycan,[m.span()]+[m.span(g) for g in groups]) for m in budget_finditer(self.fromPattern,glycan+'\n'+choice) if m.end()<=len(glycan)])
+
+    def makeProducts(self,glycan):
+        '''
+        Options with text the glycan does not hold are
+        not matched.  Glycans the pattern does not
+        match with any choice have no products.
+        '''
+        options=[[i for i,runs in enumerate(opts) if all([r in glycan for r in runs])] for opts in self.runs]
+        if not all(options):
+            return([])
+        mtch=self.fromPattern.search(glycan+'\n'+self.anyChoice*len(self.choices))
+        if mtch is None or mtch.start()>len(glycan):
+            return([])
         products=[]
-        for m in mtchs:
-            to=self.constructToString(m)
-            #Re-add a "[" if processing the head of a branch:
-            #if re.search('^\[',m.group()) is not None:
-            #    to=''.join(['[',to])
-            #Constant indicies:
-            front_start=0
-            front_end=m.start()
-            back_start=m.end()
-            back_end=len(glycan)
-            #Replace text where "frm" was found with the "to" text:
-            products.append(''.join([glycan[front_start:front_end],to,glycan[back_start:back_end]]))
-            #Fix broken branching here:
-            #products=[self.fixGlycanBranching(p) for p in products]
+        for perm in prod(*options):
+            mtchs=self.permutationMatches(glycan,perm)
+            if mtchs:
+                products.extend(self.target(perm).productsFromMatches(mtchs,glycan))
         return(products)
 
 
-
 class reactionRule(Rule):
 
-    def __init__(self,ruleComponents):
+    def __init__(self,ruleComponents,matcherMode='ir'):
+        '''
+        "matcherMode" is one of "matcherModes".
+        '''
+        check_matcher_mode(matcherMode)
+        self.matcherMode=matcherMode
         super().__init__(ruleComponents)
         #Check Conditions for each rule set:
         # Default constraints:
@@ -358,6 +694,8 @@ class reactionRule(Rule):
         self.reactionType=list(set(chain(*[[type(x.token) for x in rst if isinstance(x,reactionToken)] for rst in self.ruleSets])))[0]
         #If rule is valid, create generator terms:
         #Instantiate forward and referse inference methods:
+        self.processors=dict()
+        self.ir=dict()
         self.forward=self.forwardGeneratorMain()
         self.reverse=self.reverseGeneratorMain()
 
@@ -368,14 +706,14 @@ class reactionRule(Rule):
     @Rule.checkWrapper
     @Rule.allTrueWrap
     def noConstraints(ruleSet):
-        return([x.__name__!='constraintToken' for x in ruleSet])
+        return([x.kind!='constraintToken' for x in ruleSet])
 
     #######################
     # Class Factory Method:
     #######################
 
     @classmethod
-    def fromComponents(cls,ruleComponents):
+    def fromComponents(cls,ruleComponents,matcherMode='ir'):
         '''
         Main method for determining if passed reaction
         rule components are reaction rules.
@@ -384,7 +722,7 @@ class reactionRule(Rule):
         2. All tokens must not be unknown
         3. No tokens should be Constraints.
         '''
-        return(cls(ruleComponents))
+        return(cls(ruleComponents,matcherMode))
         
     ######################################
     # Substrate/Product Pair List Builder:
@@ -416,6 +754,61 @@ class reactionRule(Rule):
     def pairListGenerator(self):
         return(functools.reduce(lambda x,y: x+y,[self.pairListBuilder(x) for x in self.ruleSets]))
 
+    def sitePairListBuilder(self,ruleSet):
+        '''
+        pairListBuilder, with each substrate/product
+        kept as (text,site) fragments: the text of each
+        token and the site it marks, "reaction" for
+        reaction tokens.
+        '''
+        site=lambda t: 'reaction' if t.kind=='reactionToken' else None
+        substrates=list(prod(*[[(s,site(y)) for s in y.substrate()] for y in ruleSet]))
+        products=list(prod(*[[(p,site(y)) for p in y.product()] for y in ruleSet]))
+        return([(s,p) for s,p in zip(substrates,products)])
+
+    def sitePairListGenerator(self):
+        return(functools.reduce(lambda x,y: x+y,[self.sitePairListBuilder(x) for x in self.ruleSets]))
+
+    def symbolicOptions(self,ruleSet):
+        '''
+        The (substrate,product) options of each token of
+        a rule set, for a SymbolicProcessorGenerator, or
+        None where the rule set is expanded instead:
+        - it has a single permutation;
+        - a token's substrate and product option lists
+          differ in length, or are strings, which the
+          expansion splits into characters;
+        - an option of the first token with any text is
+          empty, or only some start with a "...";
+        - options could join a "..." or "-?" across
+          tokens.
+        '''
+        subs=[y.substrate() for y in ruleSet]
+        prods=[y.product() for y in ruleSet]
+        if any([not isinstance(x,(list,tuple)) for x in subs+prods]) or any([len(x)!=len(y) for x,y in zip(subs,prods)]):
+            return(None)
+        if all([len(x)==1 for x in subs]):
+            return(None)
+        for options in [subs,prods]:
+            first=[opts for opts in options if any(opts)]
+            if not first or not all(first[0]) or len(set([o.startswith('...') for o in first[0]]))>1:
+                return(None)
+            #Characters the text before each token can end with:
+            ends=set([None])
+            for opts in options:
+                if any([o[0] in '.?' for o in opts if o]) and ends&set('.-'):
+                    return(None)
+                ends=set([o[-1] if o else e for o in opts for e in ends])
+        return((subs,prods))
+
+    def compiledPatterns(self):
+        '''
+        Returns the compiled "from" pattern of every
+        forward and reverse glycan processor, keyed on
+        the processor's (from,to) strings.
+        '''
+        return({(gpg.fromString,gpg.toString):gpg.fromPattern for procs in self.processors.values() for gpg in procs})
+
     ###############################################
     # Reaction Search/Replace Generating Functions:
     ###############################################
@@ -425,8 +818,7 @@ class reactionRule(Rule):
         Wrapper to dynamically create instances
         of "proc_" with "frm" "to" pairs.
         '''
-        gpg=GlycanProcessorGenerator(frm,to,self.reactionType)
-        return(lambda glycan:gpg(glycan))
+        return(GlycanProcessorGenerator(frm,to,self.reactionType))
 
     def glycanProcAggregator(fun):
         def _wrap(self):
@@ -436,6 +828,10 @@ class reactionRule(Rule):
             "fun" reorders the pairList to perform
             "forward" or "reverse" inference.
             '''
+            if self.matcherMode=='ir':
+                return(self.irProcessor(fun))
+            if self.matcherMode=='symbolic':
+                return(self.symbolicProcessor(fun))
             #Generate the pairList:
             pairList=self.pairListGenerator()
             #Reordering the pairList to return either
@@ -443,11 +839,59 @@ class reactionRule(Rule):
             frm_list,to_list=fun(pairList)
             #Make a list of replacer functions:
             funList=[self.makeGlycanProcessor(frm,to) for frm,to in zip(frm_list,to_list)]
-            #Make conversion function:
-            convertMain=functools.reduce(lambda cur,pres: lambda string: cur(string)+pres(string),funList)
+            #Kept for inspecting the compiled patterns:
+            self.processors[fun.__name__]=funList
+            if len(funList)==1:
+                return(funList[0])
+            #Make conversion function, running the processors
+            # in order in one loop:
+            def convertMain(glycan):
+                products=[]
+                for gpg in funList:
+                    products.extend(gpg(glycan))
+                return(products)
             return(convertMain)
         return(_wrap)
 
+    def symbolicProcessor(self,fun):
+        '''
+        Builds a SymbolicProcessorGenerator for each rule
+        set with several permutations, and a
+        GlycanProcessorGenerator for each permutation of
+        the others, with "fun" reordering the pairs.
+        Their products are listed in rule set order.
+        '''
+        funList=[]
+        for ruleSet in self.ruleSets:
+            options=self.symbolicOptions(ruleSet)
+            if options is None:
+                frm_list,to_list=fun(self.pairListBuilder(ruleSet))
+                funList.extend([self.makeGlycanProcessor(frm,to) for frm,to in zip(frm_list,to_list)])
+            else:
+                frm_options,to_options=fun(list(zip(*options)))
+                funList.append(SymbolicProcessorGenerator(frm_options,to_options,self.reactionType))
+        self.processors[fun.__name__]=funList
+        def convertMain(glycan):
+            products=[]
+            for gen in funList:
+                products.extend(gen(glycan))
+            return(products)
+        return(convertMain)
+
+    def irProcessor(self,fun):
+        '''
+        Builds the ruleDirection of the rule sets, with
+        "fun" reordering the pairs, optimizes it and
+        returns its IRProcessorGenerator.
+        '''
+        frm_list,to_list=fun(self.sitePairListGenerator())
+        join=lambda fragments: ''.join([text for text,_ in fragments])
+        direction=ruleIR.direction_ir(frm_list,[join(to) for to in to_list])
+        funList=[GlycanProcessorGenerator(join(frm),p.targets[0][0],self.reactionType,p.pattern.regex()) for frm,p in zip(frm_list,direction.permutations)]
+        self.processors[fun.__name__]=funList
+        self.ir[fun.__name__]=ruleIR.optimize(direction)
+        return(IRProcessorGenerator(self.ir[fun.__name__],funList))
+
     ##############################
     # Inference Generator Wrapper:
     ##############################
@@ -498,15 +942,17 @@ class ConstraintMethodGenerator(generatorSet):
        constraint in the rule.  Will trigger methods to recognize
        the attachment constraint.
     '''
-    def __init__(self,ruleSet,reactionRule=None):
+    def __init__(self,ruleSet,reactionRule=None,matcherMode='ir'):
         '''
         Parses constraint rule components within a
         rule set and returns tags used for 
         the constraint constructor.
         Keeps variables tracking if the rule is a negation, attachment,
         or numeric constraint while parsing monosaccharide elements into
-        "seqSet"
+        "seqSet".  "matcherMode" is one of "matcherModes".
         '''
+        check_matcher_mode(matcherMode)
+        self.matcherMode=matcherMode
         self.negation=False
         self.numeric=None
         self.attachment=None
@@ -514,16 +960,17 @@ class ConstraintMethodGenerator(generatorSet):
         self.seqSet=[]
         self.addMono=None
         for i,t in enumerate(ruleSet):
-            if t.__name__=='constraintToken':
-                if t.constr.__name__=='negationRule_token':
+            if t.kind=='constraintToken':
+                if t.constr.kind=='negationRule_token':
                     self.negation=True
-                elif t.constr.__name__=='quantityRule_token':
+                elif t.constr.kind=='quantityRule_token':
                     self.numeric=True
-                    if ruleSet[-1].constr.__name__!='quantifierToken':
+                    if ruleSet[-1].constr.kind!='quantifierToken':
                         raise Exception("Quantity rule detected but no quantifier/quantity provided")
                     else:
-                        self.numeric=t.constr
-                elif t.constr.__name__=='attachRule_token':
+                        #The quantifier token evaluates the quantity:
+                        self.numeric=ruleSet[-1].constr
+                elif t.constr.kind=='attachRule_token':
                     self.attachment=True
                     if self.reactionRule is None:
                         raise Exception("Attachment constraint detected but no monosaccharide provided for attachment")
@@ -551,7 +998,7 @@ class ConstraintMethodGenerator(generatorSet):
         '''
         #Search for all addition possibilities in the 
         # reactionRule's ruleSets:
-        addMono=list(set(chain(*[[x.product()[0] for x in rst if x.token.__name__=='additionToken'] for rst in self.reactionRule.ruleSets])))[0]
+        addMono=list(set(chain(*[[x.product()[0] for x in rst if x.token.kind=='additionToken'] for rst in self.reactionRule.ruleSets])))[0]
         return(addMono)
 
     def createSeq(self):
@@ -571,6 +1018,16 @@ class ConstraintMethodGenerator(generatorSet):
                 seq=re.sub('\@',self.addMono,seq)
         return(seq)
     
+    def seqFragments(self):
+        '''
+        "seqSet" as (text,site) fragments for the rule
+        IR, the added monosaccharide of an attachment
+        constraint marking the "attachment" site.
+        '''
+        #Raises as createSeq does without an added monosaccharide:
+        self.createSeq()
+        return([(self.addMono,'attachment') if x=='@' and self.attachment else (x,None) for x in self.seqSet])
+
     def constraintGen(self):
         '''
         Generates a constraint method which evaluates if a 
@@ -578,8 +1035,21 @@ class ConstraintMethodGenerator(generatorSet):
         '''
         #Base search function:
         stringSearch=self.createSeq()
-        stringSearch_regex=super().rule2regex(stringSearch)
-        funOut_search=lambda glycan: re.finditer(stringSearch_regex,glycan)
+        if self.matcherMode=='ir':
+            self.ir=ruleIR.constraint_ir(self.seqFragments(),self.negation,self.numeric is not None)
+            stringSearch_regex=self.ir.pattern.regex()
+        else:
+            self.ir=None
+            stringSearch_regex=super().rule2regex(stringSearch)
+        #Compiled once, when the constraint is built:
+        self.searchPattern=regexBackends.compile(stringSearch_regex)
+        funOut_search=lambda glycan: budget_finditer(self.searchPattern,glycan)
+        #Glycans without the anchor of the pattern, or any
+        # glycan if nothing can match it, are not searched:
+        if self.ir is not None and not self.ir.reachable:
+            funOut_search=lambda glycan: iter(())
+        elif self.ir is not None and self.ir.anchor is not None:
+            funOut_search=lambda glycan: budget_finditer(self.searchPattern,glycan) if self.ir.anchor in glycan else iter(())
         #Negation:
         if self.negation:
             funOut=lambda glycan: len(list(funOut_search(glycan)))==0
@@ -598,7 +1068,9 @@ class ConstraintMethodGenerator(generatorSet):
 
 class constraintRule(Rule):
 
-    def __init__(self,ruleComponents,reactionRule=None):
+    def __init__(self,ruleComponents,reactionRule=None,matcherMode='ir'):
+        check_matcher_mode(matcherMode)
+        self.matcherMode=matcherMode
         #Creates ruleSets and logical seps:
         super().__init__(ruleComponents)
         #Check Conditions for each rule set:
@@ -626,7 +1098,7 @@ class constraintRule(Rule):
     @Rule.checkWrapper
     @Rule.allTrueWrap
     def noReactions(ruleSet):
-        return([x.__name__!='reactionToken' for x in ruleSet])
+        return([x.kind!='reactionToken' for x in ruleSet])
 
     @Rule.checkWrapper
     @Rule.possibleTrueWrap
@@ -635,8 +1107,8 @@ class constraintRule(Rule):
         Numeric constraints must have the quantity rule prefix "n"
         as well as the quantity constraint as the suffix.
         '''
-        validQuantityRuleToken=True if ruleSet[0].__name__=='quantityRule_token' else False
-        validQuantityToken=True if ruleSet[-1].__name__=='quantifierToken' else False
+        validQuantityRuleToken=True if ruleSet[0].kind=='quantityRule_token' else False
+        validQuantityToken=True if ruleSet[-1].kind=='quantifierToken' else False
         return([validQuantityRuleToken,validQuantityToken])
 
     @Rule.checkWrapper
@@ -682,6 +1154,22 @@ class constraintRule(Rule):
         else:
             return(None)
     
+    def logicalOperators(self):
+        '''
+        The operator ("&" or "|") of each logical
+        separator.  Separator k joins constraint methods
+        k and k+1.
+        '''
+        operators=[]
+        for sep in self.logicalSeps:
+            if sep.logicalToken.kind=='and_separator':
+                operators.append('&')
+            elif sep.logicalToken.kind=='or_separator':
+                operators.append('|')
+            else:
+                raise Exception('Unknown logical separator: %s' %(sep.logicalToken.kind))
+        return(operators)
+
     def ConstraintGenerator_Aggregator(self):
         '''
         Takes a set of ConstraintGenerator classes and 
@@ -690,22 +1178,22 @@ class constraintRule(Rule):
         with only one function
         '''
         #Make Constraint objects:
-        ConstraintFuns=[ConstraintMethodGenerator(r,self.reactionRule) for r in self.ruleSets]
+        ConstraintFuns=[ConstraintMethodGenerator(r,self.reactionRule,self.matcherMode) for r in self.ruleSets]
+        self.constraintMethods=ConstraintFuns
         #ConstraintFuns=[ConstraintMethodGenerator.fromComponents(r).constraintGen() for r in self.ruleSets]
         #Constraint_Classes=[ConstraintMethodGenerator.fromComponents(r) for r in self.ruleSets]
-        #Merge into one function:
+        #Merge into one function, left to right:
         def mergeWrapper(acc,_zipInfo):
-            sep,cur=_zipInfo
-            if sep=='&':
+            op,cur=_zipInfo
+            if op=='&':
                 res=lambda within: acc(within) and cur(within)
-            elif sep=='|':
-                res=lambda within: acc(within) or cur(within)
             else:
-                res=lambda within: acc(within)
+                res=lambda within: acc(within) or cur(within)
             return(res)
         #Merge the functions together
         # "initialFunction" is the first constraint in the "Constraint_Classes" list.
         initialFunction=lambda within:ConstraintFuns[0](within)
-        pairedIterator=zip(ConstraintFuns[1:],self.logicalSeps)
+        #Separator k joins method k+1 to the methods before it:
+        pairedIterator=zip(self.logicalOperators(),ConstraintFuns[1:])
         constraintMain=functools.reduce(lambda acc,x:mergeWrapper(acc,x),pairedIterator,initialFunction)
         return(constraintMain)
@@ -192,20 +192,20 @@ class glycoCTConvert:
         on the reaction rules:
         '''
         #Get kind of reaction:
-        if token.token.__name__ in ['additionToken','subtractionToken']:
-            if token.token.__name__=='additionToken':
+        if token.token.kind in ['additionToken','subtractionToken']:
+            if token.token.kind=='additionToken':
                 monoEntity=token.product()
                 opString='addition'
-            elif token.token.__name__=='subtractionToken':
+            elif token.token.kind=='subtractionToken':
                 monoEntity=token.substrate()
                 opString='subtraction'
             return(ReactionEntity.factory(entity_list=monoEntity,operation=opString))
-        elif token.token.__name__ in ['substitutionToken','reversibleToken']:
+        elif token.token.kind in ['substitutionToken','reversibleToken']:
             monoEntityFrom=token.substrate()
             monoEntityTo=token.product()
-            if token.token.__name__=='substitutionToken':
+            if token.token.kind=='substitutionToken':
                 opString='substitution'
-            elif token.token.__name__=='reversibleToken':
+            elif token.token.kind=='reversibleToken':
                 opString='reversible'
             return(SubstitutionEntity.factory(operation=opString,from_entity_list=monoEntityFrom,to_entity_list=monoEntityTo))
 
@@ -213,29 +213,29 @@ class glycoCTConvert:
         '''
         Processes monosaccharides which have reaction rules in them.
         '''
-        if token.token.reactionToken.token.__name__ in ['additionToken','subtractionToken']:
-            if token.token.reactionToken.token.__name__=='additionToken':
+        if token.token.reactionToken.token.kind in ['additionToken','subtractionToken']:
+            if token.token.reactionToken.token.kind=='additionToken':
                 monoEntity=token.substrate()
                 modToken=token.token.reactionToken.token.ligand_token[0].product()
                 opString='addition'
-            elif token.token.reactionToken.token.__name__=='subtractionToken':
+            elif token.token.reactionToken.token.kind=='subtractionToken':
                 monoEntity=token.product()
                 modToken=token.token.reactionToken.token.ligand_token[0].product()
                 opString='subtraction'
             return(monoReactionEntity.factory(operation=opString,mod_entity=modToken,entity_list=monoEntity))
-        elif token.token.reactionToken.token.__name__ in ['substitutionToken','reversibleToken']:
+        elif token.token.reactionToken.token.kind in ['substitutionToken','reversibleToken']:
             monoEntity=token.substrate()
             fromModEntity=token.token.reactionToken.token.from_ligand_token[0].product()
             toModEntity=token.token.reactionToken.token.to_ligand_token[0].product()
             monoEntity=re.sub(fromModEntity,'',monoEntity)
-            if token.token.reactionToken.token.__name__=='substitutionToken':
+            if token.token.reactionToken.token.kind=='substitutionToken':
                 opString='substitution'
-            elif token.token.reactionToken.token.__name__=='reversibleToken':
+            elif token.token.reactionToken.token.kind=='reversibleToken':
                 opString='reversible'
             return(monoSubstitutionEntity.factory(operation=opString,from_entity=fromModEntity,to_entity=toModEntity,mono_entity=monoEntity))
             
     def get_branching(self,elt):
-        if elt.__name__=='reactionToken':
+        if elt.kind=='reactionToken':
             eltToken=elt.token.ligand_token[0]
         else:
             eltToken=elt
@@ -253,9 +253,9 @@ class glycoCTConvert:
         monosaccharide entity.
         '''
         if elt.substrate()!=elt.product():
-            if elt.__name__=='reactionToken':
+            if elt.kind=='reactionToken':
                 obj=self.rctTokenProcess(elt)
-            elif elt.__name__=='entityToken':
+            elif elt.kind=='entityToken':
                 obj=self.mono_rctTokenProcess(elt)
         else:
             obj=Entity(entity_list=elt.substrate())
@@ -1,15 +1,184 @@
 import re
+import compiledRuntime
 from tokenMatchers import *
 from LexerClass import *
 from itertools import chain,product as prod
 
+#############
+# Token Spans
+#############
+
+class spanToken:
+
+    __slots__=('inputString','start','end','frozen')
+    #Kind of token, compared by the rule interpreter:
+    kind=None
+
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=()
+
+    def set_span(self,inputString,start=0,end=None):
+        '''
+        Stores a reference to the rule string the token
+        was read from, and the (start,end) offsets of the
+        token within it.  The matched text is not copied,
+        it is sliced from the rule string when needed
+        with "text".
+
+        If "end" is None the token spans the rest of
+        the string.
+        '''
+        self.inputString=inputString
+        self.start=start
+        self.end=len(inputString) if end is None else end
+
+    def set_match(self,mtch):
+        '''
+        Stores the span of a match object, or None
+        offsets if nothing was matched.
+        '''
+        if mtch is not None:
+            self.start,self.end=mtch.span()
+        else:
+            self.start,self.end=None,None
+
+    @property
+    def text(self):
+        '''
+        The rule text matched by the token.
+        '''
+        if self.end is None:
+            return(None)
+        return(self.inputString[self.start:self.end])
+
+    def span(self):
+        return((self.start,self.end))
+
+    def rebase(self,inputString,offset):
+        '''
+        Returns a copy of the token read from the edited
+        rule string "inputString", where its text has
+        moved by "offset".  Sub-tokens sharing the token's
+        rule string are moved too, the others are shared.
+        '''
+        tok=object.__new__(type(self))
+        for name,value in self.slot_items():
+            if isinstance(value,spanToken) and getattr(value,'inputString',None) is self.inputString:
+                value=value.rebase(inputString,offset)
+            object.__setattr__(tok,name,value)
+        tok.inputString=inputString
+        if getattr(self,'pos',None) is not None:
+            tok.pos=self.pos+offset
+        if self.end is not None:
+            tok.start=self.start+offset
+            tok.end=self.end+offset
+        return(tok)
+
+    def slot_items(self):
+        '''
+        (name,value) of every slot set on the token,
+        other than "frozen".
+        '''
+        for cls in type(self).__mro__:
+            for name in getattr(cls,'__slots__',()):
+                if name!='frozen' and hasattr(self,name):
+                    yield((name,getattr(self,name)))
+
+    def freeze(self):
+        '''
+        Makes the token read-only, along with the tokens
+        it holds: its lists become tuples and its dicts
+        frozenDicts.  Setting an attribute of a frozen
+        token raises a frozenTokenError.
+
+        Used for the tokens the lexer caches share 
+        between rules.
+        '''
+        if getattr(self,'frozen',False):
+            return(self)
+        for name,value in self.slot_items():
+            object.__setattr__(self,name,frozen_value(value))
+        object.__setattr__(self,'frozen',True)
+        return(self)
+
+    def __setattr__(self,name,value):
+        if getattr(self,'frozen',False):
+            raise frozenTokenError(self,name)
+        object.__setattr__(self,name,value)
+
+    def __getstate__(self):
+        return((dict(self.slot_items()),getattr(self,'frozen',False)))
+
+    def __setstate__(self,state):
+        '''
+        Restores a pickled or copied token, frozen 
+        tokens included.
+        '''
+        slots,frozen=state
+        for name,value in slots.items():
+            object.__setattr__(self,name,value)
+        if frozen:
+            object.__setattr__(self,'frozen',True)
+
+    def detectFun(self):
+        return(self.end is not None)
+
+    def matchFun(self):
+        '''
+        Returns the match object of the token, found
+        again from its span with the first of the
+        "detectMatchers" matching the same text.
+        '''
+        if self.end is None:
+            return(None)
+        for matcher in self.detectMatchers:
+            mtch=matcher(self.inputString,presence=False,pos=self.start)
+            if mtch is not None and mtch.end()==self.end:
+                return(mtch)
+        return(None)
+
+def frozen_value(value):
+    '''
+    Read-only version of a token attribute, see
+    "spanToken.freeze".
+    '''
+    if isinstance(value,spanToken):
+        return(value.freeze())
+    elif isinstance(value,(list,tuple)):
+        return(tuple([frozen_value(x) for x in value]))
+    elif isinstance(value,dict):
+        return(frozenDict({k:frozen_value(v) for k,v in value.items()}))
+    return(value)
+
+class frozenDict(dict):
+    '''
+    Read-only dict held by a frozen token.  Unlike a
+    mappingproxy it can be pickled and copied along
+    with the token.
+    '''
+    __slots__=()
+
+    def read_only(self,*args,**kwargs):
+        raise TypeError('Attributes of frozen tokens are read-only')
+
+    __setitem__=__delitem__=__ior__=clear=pop=popitem=setdefault=update=read_only
+
+    def __reduce__(self):
+        return((frozenDict,(dict(self),)))
+
 ######################
 # Reaction Rule Tokens
 ######################
 
-class reactionToken:
+class reactionToken(spanToken):
 
-    def __init__(self,inputString):
+    __slots__=('pos','token')
+    kind='reactionToken'
+
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=(reactionMatcher,)
+
+    def __init__(self,inputString,pos=0):
         '''
         Token that describes any sort of reaction.
         These tokens must start with the '{' character, which
@@ -17,12 +186,17 @@ class reactionToken:
         
         - Addition/Subtraction: { }/{! }
         - Substitution/Reversible reaction: { -> }/{ <-> }
+
+        The token is matched at index "pos" of the
+        input string.
         '''
-        self.__name__='reactionToken'
         self.inputString=inputString
-        #Get location of reaction match
-        self.match=self.matchFun()
-        if self.match is not None:
+        self.pos=pos
+        #Get location of reaction match, and the
+        # reaction type, once:
+        mtch=reactionMatcher(self.inputString,presence=False,pos=self.pos)
+        self.set_match(mtch)
+        if mtch is not None:
             #Get reaction type:
             self.token=self.get_reaction_type()
         else:
@@ -33,47 +207,29 @@ class reactionToken:
         Representation takes on the value of whatever 
         reaction token was instantiated in this object.
         '''
-        return(self.get_reaction_type().__repr__())
+        return(self.token.__repr__())
 
-    def detectFun(self):
-        '''
-        Reaction Detection Method
-        Logic:
-           reactionMatcher
-        '''
-        #Helper function:
-        isReaction=reactionMatcher(self.inputString)
-        return(isReaction)
-    
-    def matchFun(self):
-        '''
-        Matcher function for reaction instances.
-        If the reactionMatcher passes, get contents
-        in between { }.
-        '''
-        if self.detectFun():
-            return(reactionMatcher(self.inputString,presence=False))
-        else:
-            return(None)
-    
     def get_reaction_type(self):
         '''
         Returns token of the kind of reaction matched.
+        The reaction token shares the rule string and
+        span of this token.
 
         Internal methods to these token classes will run
         once instantiated.
         '''
-        reactionMatch=self.matchFun()
-        if reactionMatch is not None:
-            reactionText=reactionMatch.group()
-            if (additionMatcher(reactionText) or termAdditionMatcher(reactionText)) and not substitutionMatcher(reactionText):
-                return(additionToken(reactionText))
+        if self.end is not None:
+            reactionText=self.text
+            isSubstitution=substitutionMatcher(reactionText)
+            if (additionMatcher(reactionText) or termAdditionMatcher(reactionText)) and not isSubstitution:
+                return(additionToken(self.inputString,self.start,self.end))
             elif subtractionMatcher(reactionText) or termSubtractionMatcher(reactionText):
-                return(subtractionToken(reactionText))
-            elif substitutionMatcher(reactionText) and not reversibleMatcher(reactionText):
-                return(substitutionToken(reactionText))
-            elif reversibleMatcher(reactionText):
-                return(reversibleToken(reactionText))
+                return(subtractionToken(self.inputString,self.start,self.end))
+            isReversible=reversibleMatcher(reactionText)
+            if isSubstitution and not isReversible:
+                return(substitutionToken(self.inputString,self.start,self.end))
+            elif isReversible:
+                return(reversibleToken(self.inputString,self.start,self.end))
 
     def substrate(self):
         return(self.token.substrate())
@@ -84,31 +240,32 @@ class reactionToken:
 
 class additionToken(reactionToken):
 
-    def __init__(self,inputString):
+    __slots__=('ligand_token',)
+    kind='additionToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         This class describes addition reactions which
         have the form { }.
         
-        The input string to this class is passed
-        by the reactionToken __init__ method.
+        The input string and span of this class are 
+        passed by the reactionToken __init__ method.
 
-        The input string should be of the form {.+?}
+        The spanned text should be of the form {.+?}
         '''
-        self.__name__='additionToken'
-        self.inputString=inputString
-        self.ligand_string=self.get_ligand()
+        self.set_span(inputString,start,end)
         #Call the rule lexer to identify components
         # within the reaction rule:
-        self.ligand_token=lexer(self.ligand_string)
+        self.ligand_token=ligandLexer(self.get_ligand())
 
     def __repr__(self):
         if self.ligand_token is not None:
-            return('An addition of %s' %(self.ligand_token.__repr__()))
+            return('An addition of %s' %(list(self.ligand_token).__repr__()))
         else:
             return('PARSE ERROR')
 
     def get_ligand(self):
-        ligand=re.search('\{(.*?)\}',self.inputString).groups()[0]
+        ligand=re.search('\{(.*?)\}',self.text).groups()[0]
         return(ligand)
 
     def substrate(self):
@@ -119,7 +276,7 @@ class additionToken(reactionToken):
           substrate should be a "[".
         
         '''
-        if self.inputString[0]=='[':
+        if self.inputString[self.start]=='[':
             return(['['])
         else:
             return([''])
@@ -130,7 +287,7 @@ class additionToken(reactionToken):
         '''
         prd=self.ligand_token[0].product()
         #Handling possible terminal branch case:
-        if self.inputString[0]=='[':
+        if self.inputString[self.start]=='[':
             prd=''.join(['[',prd[0]])
             return(prd)
         else:
@@ -138,31 +295,32 @@ class additionToken(reactionToken):
 
 class subtractionToken(reactionToken):
 
-    def __init__(self,inputString):
+    __slots__=('ligand_token',)
+    kind='subtractionToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         This class describes subtraction reactions which
         have the form {! }.
         
-        The input string to this class is passed
-        by the reactionToken __init__ method.
+        The input string and span of this class are 
+        passed by the reactionToken __init__ method.
 
-        The input string should be of the form {.+?}
+        The spanned text should be of the form {.+?}
         '''
-        self.__name__='subtractionToken'
-        self.inputString=inputString
-        self.ligand_string=self.get_ligand()
+        self.set_span(inputString,start,end)
         #Call the rule lexer to identify components
         # within the reaction rule:
-        self.ligand_token=lexer(self.ligand_string)
+        self.ligand_token=ligandLexer(self.get_ligand())
 
     def __repr__(self):
         if self.ligand_token is not None:
-            return('A removal of %s' %(self.ligand_token.__repr__()))
+            return('A removal of %s' %(list(self.ligand_token).__repr__()))
         else:
             return('PARSE ERROR')
 
     def get_ligand(self):
-        ligand=re.search('\{\!(.+?)\}',self.inputString).groups()[0]
+        ligand=re.search('\{\!(.+?)\}',self.text).groups()[0]
         return(ligand)
 
     def substrate(self):
@@ -182,29 +340,31 @@ class subtractionToken(reactionToken):
 
 class substitutionToken(reactionToken):
 
-    def __init__(self,inputString):
+    __slots__=('from_ligand_token','to_ligand_token')
+    kind='substitutionToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         This class describes substitution reactions which
         have the form {A -> B}.
         
-        The input string to this class is passed
-        by the reactionToken __init__ method.
+        The input string and span of this class are 
+        passed by the reactionToken __init__ method.
         '''
-        self.__name__='substitutionToken'
-        self.inputString=inputString
-        self.from_ligand_string,self.to_ligand_string=self.get_from_to()
+        self.set_span(inputString,start,end)
+        from_ligand_string,to_ligand_string=self.get_from_to()
         #Call the entityToken class to identify 
         # the class of the ligand:
-        self.from_ligand_token,self.to_ligand_token=(lexer(self.from_ligand_string),lexer(self.to_ligand_string))
+        self.from_ligand_token,self.to_ligand_token=(ligandLexer(from_ligand_string),ligandLexer(to_ligand_string))
 
     def __repr__(self):
         if self.from_ligand_token is not None and self.to_ligand_token is not None:
-            return('A conversion from %s to %s' %(self.from_ligand_token.__repr__(),self.to_ligand_token.__repr__()))
+            return('A conversion from %s to %s' %(list(self.from_ligand_token).__repr__(),list(self.to_ligand_token).__repr__()))
         else:
             return('PARSE ERROR')
 
     def get_from_to(self):
-        frm,to=re.search('\{(.+?)\-\>(.+?)\}',self.inputString).groups()
+        frm,to=re.search('\{(.+?)\-\>(.+?)\}',self.text).groups()
         return(frm,to)
 
     def substrate(self):
@@ -222,29 +382,31 @@ class substitutionToken(reactionToken):
 
 class reversibleToken(reactionToken):
 
-    def __init__(self,inputString):
+    __slots__=('from_ligand_token','to_ligand_token')
+    kind='substitutionToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         This class describes reversible reactions which
         have the form {A <-> B}.
         
-        The input string to this class is passed
-        by the reactionToken __init__ method.
+        The input string and span of this class are 
+        passed by the reactionToken __init__ method.
         '''
-        self.__name__='substitutionToken'
-        self.inputString=inputString
-        self.from_ligand_string,self.to_ligand_string=self.get_from_to()
+        self.set_span(inputString,start,end)
+        from_ligand_string,to_ligand_string=self.get_from_to()
         #Call the entityToken class to identify 
         # the class of the ligand:
-        self.from_ligand_token,self.to_ligand_token=(lexer(self.from_ligand_string),lexer(self.to_ligand_string))
+        self.from_ligand_token,self.to_ligand_token=(ligandLexer(from_ligand_string),ligandLexer(to_ligand_string))
 
     def __repr__(self):
         if self.from_ligand_token is not None and self.to_ligand_token is not None:
-            return('A reversible conversion from %s to %s' %(self.from_ligand_token.__repr__(),self.to_ligand_token.__repr__()))
+            return('A reversible conversion from %s to %s' %(list(self.from_ligand_token).__repr__(),list(self.to_ligand_token).__repr__()))
         else:
             return('PARSE ERROR')
 
     def get_from_to(self):
-        frm,to=re.search('\{(.+?)\<\-\>(.+?)\}',self.inputString).groups()
+        frm,to=re.search('\{(.+?)\<\-\>(.+?)\}',self.text).groups()
         return(frm,to)
 
     def substrate(self):
@@ -265,9 +427,15 @@ class reversibleToken(reactionToken):
 # Constraint Tokens
 ###################
     
-class constraintToken:
+class constraintToken(spanToken):
+
+    __slots__=('pos','constr')
+    kind='constraintToken'
+
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=(quantityStartMatcher,attachRuleMatcher,negationRuleMatcher,quantifierMatcher)
     
-    def __init__(self,inputString):
+    def __init__(self,inputString,pos=0):
         '''
         Constraint tokens indicate the beginning of 
         quantitative and structural constraints of 
@@ -277,69 +445,38 @@ class constraintToken:
         as an attribute as well as its own recursive parsing
         routine which stores a local set of entities which
         are subject to the constraint
+
+        The token is matched at index "pos" of the
+        input string.
         '''
-        self.__name__='constraintToken'
         self.inputString=inputString
-        self.match=self.matchFun()
-        if self.match is not None:
-            self.constr=self.get_constraint_type()
-        else:
-            self.constr=None
+        self.pos=pos
+        #Get the constraint span and type once:
+        mtch,self.constr=self.get_constraint_type()
+        self.set_match(mtch)
         #Equate the substrate and product methods, returns 
         # empty string
-        self.product=self.substrate
 
     def __repr__(self):
         return(self.constr.__repr__())
 
-    def detectFun(self):
-        '''
-        Detection method for constraintTokens:
-        
-        Must be one of:
-        - n : Marks beginning of numerical constraint
-        - @ : Attachment constraint
-        - ! : Logical Negation Constraint
-        '''
-        isQuantityStart=quantityStartMatcher(self.inputString)
-        isAttach=attachRuleMatcher(self.inputString)
-        isNegation=negationRuleMatcher(self.inputString)
-        isQuantity=quantifierMatcher(self.inputString)
-        return(isQuantityStart or isAttach or isNegation or isQuantity)
-
-    def matchFun(self):
-        '''
-        Returns string matching object where constraint
-        token was detected.
-        '''
-        if self.detectFun():
-            if quantityStartMatcher(self.inputString):
-                return(quantityStartMatcher(self.inputString,presence=False))
-            elif attachRuleMatcher(self.inputString):
-                return(attachRuleMatcher(self.inputString,presence=False))
-            elif negationRuleMatcher(self.inputString):
-                return(negationRuleMatcher(self.inputString,presence=False))
-            elif quantifierMatcher(self.inputString):
-                return(quantifierMatcher(self.inputString,presence=False))
-        else:
-            return(None)
-
     def get_constraint_type(self):
         '''
-        Returns string matching object where constraint
-        token was detected.
-        '''
-        if self.detectFun():
-            if quantityStartMatcher(self.inputString):
-                return(quantityRule_token(quantityStartMatcher(self.inputString,presence=False)))
-            elif attachRuleMatcher(self.inputString):
-                return(attachRule_token(attachRuleMatcher(self.inputString,presence=False)))
-            elif negationRuleMatcher(self.inputString):
-                return(negationRule_token(negationRuleMatcher(self.inputString,presence=False)))
-            elif quantifierMatcher(self.inputString):
-                return(quantifierToken(self.inputString))
-        else:
-            return(None)
+        Returns the string matching object where constraint
+        token was detected, and the constraint token.
+        Each constraint matcher is tried once, in order.
+        '''
+        constraintMatchers=[
+            (quantityStartMatcher,quantityRule_token),
+            (attachRuleMatcher,attachRule_token),
+            (negationRuleMatcher,negationRule_token),
+            (quantifierMatcher,quantifierToken)
+        ]
+        for matcher,tokenClass in constraintMatchers:
+            mtch=matcher(self.inputString,presence=False,pos=self.pos)
+            if mtch is not None:
+                return(mtch,tokenClass(self.inputString,mtch.start(),mtch.end()))
+        return(None,None)
 
     def substrate(self):
         '''
@@ -347,133 +484,79 @@ class constraintToken:
         '''
         return('')
 
+    product=substrate
+
 class quantityRule_token(constraintToken):
 
-    def __init__(self,string):
-        self.__name__='quantityRule_token'
-        self.inputString=string
+    __slots__=()
+    kind='quantityRule_token'
+
+    detectMatchers=(quantityStartMatcher,)
+
+    def __init__(self,inputString,start=0,end=None):
+        self.set_span(inputString,start,end)
 
     def __repr__(self):
         return('Quantitiy of')
 
-    def detectFun(self):
-        '''
-        Detect method for token
-        Logic:
-           quantityStartMatcher
-        '''
-        isQuantityStart=quantityStartMatcher(self.inputString,presence=True)
-        return(isQuantityStart)
+class attachRule_token(constraintToken):
 
-    def matchFun(self):
-        '''
-        Returns match object.
-        If "detectFun" returns True, return a match object
-        using a matcherClass.
-        '''
-        if self.detectFun():
-            return(quantityStartMatcher(self.inputString))
-        else:
-            return(None)
+    __slots__=()
+    kind='attachRule_token'
 
-class attachRule_token(constraintToken):
+    detectMatchers=(attachRuleMatcher,)
 
-    def __init__(self,string):
-        self.__name__='attachRule_token'
-        self.inputString=string
+    def __init__(self,inputString,start=0,end=None):
+        self.set_span(inputString,start,end)
 
     def __repr__(self):
         return('An attachment constraint')
-        
-    def detectFun(self):
-        '''
-        Detect method for token
-        Logic:
-           attachRuleMatcher
-        '''
-        isAttachConstraint=attachRuleMatcher(self.inputString,presence=True)
-        return(isAttachConstraint)
-
-    def matchFun(self):
-        '''
-        Returns match object.
-        If "detectFun" returns True, return a match object
-        using a matcherClass.
-        '''
-        if self.detectFun():
-            return(attachRuleMatcher(self.inputString))
-        else:
-            return(None)
 
 class negationRule_token(constraintToken):
 
-    def __init__(self,string):
-        self.__name__='negationRule_token'
-        self.inputString=string
+    __slots__=()
+    kind='negationRule_token'
+
+    detectMatchers=(negationRuleMatcher,)
+
+    def __init__(self,inputString,start=0,end=None):
+        self.set_span(inputString,start,end)
 
     def __repr__(self):
         return('The absence of')
 
-    def detectFun(self):
-        '''
-        Detect method for token
-        Logic:
-           negationRuleMatcher
-        '''
-        isNegationConstraint=negationRuleMatcher(self.inputString,presence=True)
-        return(isNegationConstraint)
-
-    def matchFun(self):
-        '''
-        Returns match object.
-        If "detectFun" returns True, return a match object
-        using a matcherClass.
-        '''
-        if self.detectFun():
-            return(negationRuleMatcher(self.inputString))
-        else:
-            return(None)
+class quantifierToken(constraintToken):
 
+    __slots__=('quantifier','quantity')
+    kind='quantifierToken'
 
-class quantifierToken(constraintToken):
+    detectMatchers=(quantifierMatcher,)
 
-    def __init__(self,string):
-        self.__name__='quantifierToken'
+    def __init__(self,string,start=0,end=None):
         self.inputString=string
-        self.mtch=quantifierMatcher(self.inputString,presence=False)
+        self.start=start
+        #Find the quantifier at "start" once, and keep
+        # its quantifier and quantity:
+        mtch=quantifierMatcher(self.inputString,presence=False,pos=self.start)
+        if end is None:
+            self.set_match(mtch)
+        else:
+            self.end=end
+        if mtch is not None:
+            qt,val=mtch.groups()
+            self.quantifier,self.quantity=str(qt),int(val)
+        else:
+            self.quantifier,self.quantity=None,None
     
     def __repr__(self):
-        qt,val=self.mtch.groups()
-        return("Preceeding pattern matches %s %s times" %(qt,val))
+        return("Preceeding pattern matches %s %s times" %(self.quantifier,self.quantity))
 
     def get_quantifier_quantity(self):
         '''
         Returns the quantifier as a string
         and the quantity as an integer.
         '''
-        qt,val=self.mtch.groups()
-        return((str(qt),int(val)))
-        
-    
-    def detectFun(self):
-        '''
-        Detect method for token
-        Logic:
-           quantityStartMatcher
-        '''
-        isQuantifier=quantifierMatcher(self.inputString,presence=True)
-        return(isQuantifier)
-    
-    def matchFun(self):
-        '''
-        Returns match object.
-        If "detectFun" returns True, return a match object
-        using a matcherClass.
-        '''
-        if self.detectFun():
-            return(quantifierMatcher(self.inputString))
-        else:
-            return(None)
+        return((self.quantifier,self.quantity))
 
     def logical_fun(self,mtchs):
         '''
@@ -481,27 +564,22 @@ class quantifierToken(constraintToken):
         of match objects for a particular glycan constraint.
         Employed in constraint generation functions:
         '''
-        qt,val=self.get_quantifier_quantity()
-
-        l_fun=lambda pat,s:re.findall(pat,s)
-        if qt=="=":
-            return len(mtchs)==qt
-        elif qt==">=":
-            return len(mtchs)>=qt
-        elif qt=="<=":
-            return len(mtchs)<=qt
-        elif qt==">":
-            return len(mtchs)>qt
-        elif qt=="<":
-            return len(mtchs)<qt
+        return(compiledRuntime.quantity_check(self.quantifier,self.quantity,mtchs))
 
 ###############
 # Entity Tokens
 ###############
 
-class entityToken:
+class entityToken(spanToken):
+
+    __slots__=('pos','token')
+    kind='entityToken'
 
-    def __init__(self,inputString):
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=(monoMatcher,nucleotideSugarMatcher,modMatcher,compartmentMatcher,aglyconMatcher,
+        wildCardMatcher,transportMatcher,proteinConstraintMatcher,substrateMatcher)
+
+    def __init__(self,inputString,pos=0):
         '''
         Token that describes any sort of chemical entity.
         
@@ -511,41 +589,51 @@ class entityToken:
         - Modifications (Sulfation, Phosphorylation)
         - Compartments ( cis/medial/trans Golgi, ER, Lysosome)
         - Aglyca (Dol-P-P, Asn, Ser/Thr,Cer)
+
+        The token is matched at index "pos" of the
+        input string.
         '''
-        self.__name__='entityToken'
         #Object String input:
         self.inputString=inputString
-        ### Get token Type: ###
-        if self.detectFun():
-            self.match,self.token=self.detectMain()
+        self.pos=pos
+        ### Get token Type, once: ###
+        try:
+            detected=self.detectMain()
+        except:
+            detected=None
+        if detected is not None:
+            mtch,self.token=detected
+            self.set_match(mtch)
         else:
             #Try detecting unknown entity:
-            self.match=None
+            self.set_match(None)
             self.token=None
 
     def __repr__(self):
         try:
-            _,token=self.detectMain()
-            return(token.__repr__())
+            return(self.token.__repr__() if self.token is not None else 'PARSE ERROR')
         except:
             return('PARSE ERROR')
 
-    def mono_parse(self):
+    def mono_parse(self,monoMatch=None):
         '''
         Wrapper for the monoMatcher method.
+        "monoMatch" is used instead if it is given.
 
         Returns a dictionary of terms if successfully matched.
         Otherwise returns None
         '''
-        if monoMatcher(self.inputString):
-            #Get the match object into a group:
-            monoMatch=monoMatcher(self.inputString,presence=False)
-            if re.search('^\[',monoMatch.group()) is not None:
-                if re.search('\]$',monoMatch.group())  is not None:
+        #Get the match object into a group:
+        if monoMatch is None:
+            monoMatch=monoMatcher(self.inputString,presence=False,pos=self.pos)
+        if monoMatch is not None:
+            monoText=monoMatch.group()
+            if monoText.startswith('['):
+                if monoText.endswith(']'):
                     leftBracket=True;rightBracket=True
                 else:
                     leftBracket=True;rightBracket=False
-            elif re.search('\]$',monoMatch.group()):
+            elif monoText.endswith(']'):
                 leftBracket=False;rightBracket=True
             else:
                 leftBracket=False;rightBracket=False
@@ -556,13 +644,14 @@ class entityToken:
                 'innerReaction':monoMatch.groups()[4],
                 'modType':monoMatch.groups()[5],
                 'monoLink':monoMatch.groups()[6],
-                'branching':{'leftBracket':leftBracket,'rightBracket':rightBracket}
+                'branching':{'leftBracket':leftBracket,'rightBracket':rightBracket},
+                'match':monoMatch
             }
             return(matchDict)
         else:
             return None
 
-    def detectMono(self):
+    def detectMono(self,monoMatch=None):
         '''
         Method for detecting monosaccharide entities.
         Uses the "monoMatcher" method to detect valid monosaccharide
@@ -576,10 +665,12 @@ class entityToken:
         Group 5 Modification name (if present): Detected from "entityToken"'s allowed modification list.
         Group 6 Linkage information: (\([ab\?][12\?]\-[\d\?]\)).
 
+        Returns the monoMatcher match object along with
+        the monosaccharide attributes.
         '''
         #Parse the monosaccharide components using
         # the wrapping function;
-        mono_components=self.mono_parse()
+        mono_components=self.mono_parse(monoMatch)
         # If not a monosaccharide, return None:
         if mono_components is None:
             return(None)
@@ -636,8 +727,8 @@ class entityToken:
             # entity within them.  Substitution/Reversible tokens should
             # only have one entity in their "from" and "to" token attributes.
             rct_token=reactionToken(mono_components['innerReaction'])
-            if rct_token.token.__name__ in ['additionToken','subtractionToken']:
-                if rct_token.token.ligand_token[0].__name__=='unknownToken':
+            if rct_token.token.kind in ['additionToken','subtractionToken']:
+                if rct_token.token.ligand_token[0].kind=='unknownToken':
                     #Get Reaction Text:
                     rct_string=rct_token.token.ligand_token[0].product()[0]
                     #If the reaction text contains a comma and a number,
@@ -648,8 +739,8 @@ class entityToken:
                     if addMoreMono is not None:
                         #rct_token.token.ligand_token[0]=entityToken(addMoreMono.groups()[0]+mono_components['modType'])
                         rct_token=reactionToken(''.join(['{',addMoreMono.group(),mono_components['modType'],'}']))
-            elif rct_token.token.__name__ in ['substitutionToken','reversibleToken']:
-                if rct_token.token.from_ligand_token[0].token.__name__=='unknownToken' or rct_token.token.to_ligand_token[0].token.__name__=='unknownToken':
+            elif rct_token.token.kind in ['substitutionToken','reversibleToken']:
+                if rct_token.token.from_ligand_token[0].token.kind=='unknownToken' or rct_token.token.to_ligand_token[0].token.kind=='unknownToken':
                     #Get Reaction Text from "from" and "to" ligands:
                     from_rct_string=rctTok.token.from_ligand_token.product()
                     to_rct_string=rctTok.token.to_ligand_token.product()
@@ -665,7 +756,7 @@ class entityToken:
         else:
             rct_token=None
         #Return All Attributes:
-        return(mono_components['mono'],mono_components['monoLink'],mono_components['branching'],modTokens,rct_token,compartment_token)
+        return(mono_components['match'],(mono_components['mono'],mono_components['monoLink'],mono_components['branching'],modTokens,rct_token,compartment_token))
 
     def detectMain(self):
         '''
@@ -680,76 +771,44 @@ class entityToken:
         3. Aglyca: 
            - Must match exactly any of the Aglyca entries in entityDict.
         4. Other:
+
+        Monosaccharide tokens only depend on the matched
+        text, so they are shared through "entityInterner".
+        The other entity tokens are spans of the rule 
+        string, with the same offsets as this token.
         '''
         
         #Monosaccharide detection:
-        if self.detectMono() is not None:
-            monoMatch=monoMatcher(self.inputString,presence=False)
-            (mono,linkage,branching,modTokens,rct_token,compartment_token)=self.detectMono()
-            token=monoToken(mono,linkage,branching,modTokens,compartment_token,rct_token)
+        monoMatch=monoMatcher(self.inputString,presence=False,pos=self.pos)
+        if monoMatch is not None:
+            token=entityInterner(monoToken,monoMatch.group(),lambda:self.build_mono(monoMatch))
             return(monoMatch,token)
 
-        #Nucleotide Sugar:
-        elif nucleotideSugarMatcher(self.inputString):
-            mtch=nucleotideSugarMatcher(self.inputString,presence=False)
-            token=nsToken(mtch.group())
-            return(mtch,token)
-
-        #Modifications:
-        elif modMatcher(self.inputString):
-            mtch=modMatcher(self.inputString,presence=False)
-            token=modToken(mtch.group())
-            return(mtch,token)
-
-        #Compartments:
-        elif compartmentMatcher(self.inputString):
-            mtch=compartmentMatcher(self.inputString,presence=False)
-            token=compartmentToken(mtch.group())
-            return(mtch,token)
-
-        #Aglycon Matcher:
-        elif aglyconMatcher(self.inputString):
-            mtch=aglyconMatcher(self.inputString,presence=False)
-            token=aglycoToken(mtch.group())
-            return(mtch,token)
-        #Wild Card Matcher:
-        elif wildCardMatcher(self.inputString):
-            mtch=wildCardMatcher(self.inputString,presence=False)
-            token=wildCardToken(mtch.group())
-            return(mtch,token)
-        #Transport Arrows:
-        elif transportMatcher(self.inputString):
-            mtch=transportMatcher(self.inputString,presence=False)
-            token=transportToken(mtch.group())
-            return(mtch,token)
-        #Protein Constraints:
-        elif proteinConstraintMatcher(self.inputString):
-            mtch=proteinConstraintMatcher(self.inputString,presence=False)
-            token=proteinConstraintToken(mtch.group())
-            return(mtch,token)
-        #Substrate:
-        elif substrateMatcher(self.inputString):
-            mtch=substrateMatcher(self.inputString,presence=False)
-            token=substrateToken(mtch.group())
-            return(mtch,token)
+        #Remaining entities, each matcher is tried once:
+        entityMatchers=[
+            (nucleotideSugarMatcher,nsToken), #Nucleotide Sugar
+            (modMatcher,modToken), #Modifications
+            (compartmentMatcher,compartmentToken), #Compartments
+            (aglyconMatcher,aglycoToken), #Aglycon Matcher
+            (wildCardMatcher,wildCardToken), #Wild Card Matcher
+            (transportMatcher,transportToken), #Transport Arrows
+            (proteinConstraintMatcher,proteinConstraintToken), #Protein Constraints
+            (substrateMatcher,substrateToken) #Substrate
+        ]
+        for matcher,tokenClass in entityMatchers:
+            mtch=matcher(self.inputString,presence=False,pos=self.pos)
+            if mtch is not None:
+                return(mtch,tokenClass(self.inputString,mtch.start(),mtch.end()))
         #Nothing matched, return None:  
-        else:
-            return(None)
-        
-    def detectFun(self):
-        try:
-            match,token=self.detectMain()
-            return(True)
-        except:
-            return(False)
-
-    def matchFun(self):
-        if self.detectFun():
-            match,token=self.detectMain()
-            return(match)
-        else:
-            return(None)
+        return(None)
 
+    def build_mono(self,monoMatch):
+        '''
+        Builds the monoToken of a monoMatcher match.
+        '''
+        _,(mono,linkage,branching,modTokens,rct_token,compartment_token)=self.detectMono(monoMatch)
+        return(monoToken(mono,linkage,branching,modTokens,compartment_token,rct_token))
+        
     def substrate(self):
         '''
         Returns the entity's substrate representation:
@@ -764,6 +823,11 @@ class entityToken:
 
 class monoToken(entityToken):
 
+    __slots__=('mono','compartment','reactionToken','modTokens','linkage','branching','substrateStrings','productStrings')
+    kind='mono_token'
+    #Keep substrate/product permutations once built:
+    cacheExpansions=True
+
     def __init__(self,mono,linkage=None,branching=None,modifications=None,
         compartment=None,reaction=None):
         '''
@@ -787,7 +851,6 @@ class monoToken(entityToken):
         monosaccharide using the "substrate" and "product" methods.
         '''
         self.mono=mono
-        self.__name__='mono_token'
         self.compartment=compartment
         self.reactionToken=reaction
         self.modTokens=modifications
@@ -840,7 +903,7 @@ class monoToken(entityToken):
         if self.modTokens is not None:
             #Get modification type:
             for t in self.modTokens:
-                if t.__name__=='multiToken':
+                if t.kind=='multiToken':
                     tokStrings=t.product()
                 else:
                     tokStrings=[t.product()]
@@ -867,9 +930,17 @@ class monoToken(entityToken):
         else:
             return('','')
 
-    #Creates all permutations of a monosaccharide's representation:
+    #Creates all permutations of a monosaccharide's representation.
+    # Tokens are not altered once lexed, so the permutations are
+    # built on the first call and stored as a tuple in the
+    # "substrateStrings"/"productStrings" slots:
     def rp_stringWrap(fun):
+        cacheName=fun.__name__+'Strings'
         def _wrap(self):
+            if self.cacheExpansions:
+                cached=getattr(self,cacheName,None)
+                if cached is not None:
+                    return(cached)
             #Modifications:
             mod_perms=self.modification_perms()
             ### Decorator Function START: ###
@@ -897,11 +968,15 @@ class monoToken(entityToken):
             #Generate All possible monosaccharide representations:
             #String Order:
             # Left Bracket, Monosaccharide, Compartment, Modification Permutations,Linkage Information, Right Bracket: 
-            reactStrings=[''.join(x) for x in prod(*[[leftBracket],[self.mono],[compartment],modStrings,[linkage],[rightBracket]])]
+            reactStrings=tuple([''.join(x) for x in prod(*[[leftBracket],[self.mono],[compartment],modStrings,[linkage],[rightBracket]])])
             #if self.isextendbranch:
             #    reactStrings=[''.join(x) for x in prod(*[[leftBracket],[compartment],modStrings,[linkage],[rightBracket]])]
             #else:
             #    reactStrings=[''.join(x) for x in prod(*[[leftBracket],[self.mono],[compartment],modStrings,[linkage],[rightBracket]])]
+            if self.cacheExpansions:
+                #Stored on frozen tokens too, the
+                # expansions only depend on the token:
+                object.__setattr__(self,cacheName,reactStrings)
             return(reactStrings)
         return(_wrap)
 
@@ -932,32 +1007,36 @@ class monoToken(entityToken):
 
 class modToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='modToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='modToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def __repr__(self):
         mod,pos=self.get_mod_pos()
         return("A modification of %s on the %s position" %(mod,pos))
     
     def get_mod_pos(self):
-        pos,mod=re.search('(\d|N)(\D)',self.inputString).groups()
+        pos,mod=re.search('(\d|N)(\D)',self.text).groups()
         return(mod,pos)
     
     def substrate(self):
-        return(self.inputString)
+        return(self.text)
+
+    product=substrate
 
 class nsToken(entityToken):
 
-    def __init__(self,string,compartment=None):
+    __slots__=()
+    kind='NucleotideSugar_Token'
+
+    def __init__(self,string,start=0,end=None,compartment=None):
         '''
         Models nucleotide sugars.
         (UDP/GDP/CMP)-(sugar)
         '''
-        self.__name__='NucleotideSugar_Token'
-        self.inputString=string
-        self.product=self.substrate
+        self.set_span(string,start,end)
 
     def __repr__(self):
         try:
@@ -967,44 +1046,50 @@ class nsToken(entityToken):
         return('%s nucleotide attached to %s' %(mono,link))
 
     def get_nt_mono(self):
-        sch=re.search('(.+)\-(.+)',self.inputString)
+        sch=re.search('(.+)\-(.+)',self.text)
         nt,mono=sch.groups()
         return(nt,mono)
     
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 class compartmentToken(entityToken):
 
-    def __init__(self,inputString):
+    __slots__=()
+    kind='compartmentToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         Models instances of compartments.
         Usually are appended to the end of
         monosaccharides when describing transport
         rules.
         '''
-        self.__name__='compartmentToken'
-        self.inputString=inputString
-        self.product=self.substrate
+        self.set_span(inputString,start,end)
 
     def __repr__(self):
-        return('The %s compartment' %(self.inputString))
+        return('The %s compartment' %(self.text))
 
     def substrate(self):
-        return(self.inputString)
+        return(self.text)
+
+    product=substrate
 
 class aglycoToken(entityToken):
 
-    def __init__(self,inputString):
+    __slots__=()
+    kind='aglycoToken'
+
+    def __init__(self,inputString,start=0,end=None):
         '''
         Models aglycon instances.
         '''
-        self.__name__='aglycoToken'
-        self.inputString=inputString
-        self.product=self.substrate
+        self.set_span(inputString,start,end)
 
     def __repr__(self):
-        return('The %s aglycon' %(self.inputString))
+        return('The %s aglycon' %(self.text))
 
     #def substrate(self):
     #    return([self.inputString])
@@ -1012,29 +1097,35 @@ class aglycoToken(entityToken):
     def substrate(self):
         return(["$"])
 
+    product=substrate
+
 
 class wildCardToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='wildcardToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='wildcardToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
     
     def __repr__(self):
-        if '[' in self.inputString and ']' in self.inputString:
+        if '[' in self.text and ']' in self.text:
             return('One or more monosaccharide on a distinct branch')
         else:
             return('One or more monosaccharides')
 
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 class transportToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='transportToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='transportToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def get_from_to_compartment(self):
         '''
@@ -1049,7 +1140,7 @@ class transportToken(entityToken):
         '''
         #Detect substrate, from and to compartments:
         regex=r'(?P<substrate>.+?)\{(?P<from>\[.+?\])\-\>(?P<to>\[.+?\])\}'
-        substrate,frm,to=re.search(regex,self.inputString).groupdict().values()
+        substrate,frm,to=re.search(regex,self.text).groupdict().values()
         return(substrate,frm,to)
 
     def __repr__(self):
@@ -1058,62 +1149,81 @@ class transportToken(entityToken):
         return(msg)
 
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 class proteinConstraintToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='proteinConstraintToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='proteinConstraintToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def __repr__(self):
-        return('A %s protein constraint' %(self.inputString))
+        return('A %s protein constraint' %(self.text))
 
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 class substrateToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='substrateToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='substrateToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def __repr__(self):
-        if self.inputString=='R':
+        if self.text=='R':
             return('Some arbitrary substrate')
         else:
-            return('A %s substrate' %(self.inputString))
+            return('A %s substrate' %(self.text))
     
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 class unknownToken(entityToken):
 
-    def __init__(self,string):
-        self.__name__='unknownToken'
-        self.inputString=string
-        self.product=self.substrate
+    __slots__=()
+    kind='unknownToken'
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def __repr__(self):
-        return('An unknown entity: %s'%(self.inputString))
+        return('An unknown entity: %s'%(self.text))
 
     def substrate(self):
-        return([self.inputString])
+        return([self.text])
+
+    product=substrate
 
 ##############################
 # Multi-entity Token Container
 ##############################
 
-class multiToken:
+class multiToken(spanToken):
+
+    __slots__=('pos','tokens')
+    kind='multiToken'
 
-    def __init__(self,string):
-        self.__name__='multiToken'
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=(multiMatcher,)
+
+    def __init__(self,string,pos=0):
         self.inputString=string
-        self.entity_strings=self.get_option_list()
-        self.tokens=list(chain(*[lexer(e) for e in self.entity_strings]))
-        self.product=self.substrate
+        self.pos=pos
+        #Options are only read from a container
+        # matched at "pos":
+        self.set_match(multiMatcher(self.inputString,presence=False,pos=self.pos))
+        entity_strings=self.get_option_list() if self.end is not None else []
+        self.tokens=list(chain(*[ligandLexer(e) for e in entity_strings]))
 
     def __repr__(self):
         if len(self.tokens)>0:
@@ -1125,20 +1235,8 @@ class multiToken:
         else:
             return('PARSE ERROR')
     
-    def detectFun(self):
-        if multiMatcher(self.inputString):
-            return(True)
-        else:
-            return(False)
-
-    def matchFun(self):
-        if self.detectFun():
-            return(multiMatcher(self.inputString,presence=False))
-        else:
-            return(None)
-
     def get_option_list(self):
-        s=re.search('\<(.+?)\>',self.inputString).group()
+        s=self.text
         s=re.sub('(<|>)','',s)
         return(s.split(','))
     
@@ -1155,60 +1253,62 @@ class multiToken:
         else:
             return([x.product() for x in self.tokens])
 
+    product=substrate
+
 
 ##################
 # Separator Tokens
 ##################
 
-class logicalToken:
+class logicalToken(spanToken):
+
+    __slots__=('pos','logicalToken')
+    kind='logicalToken'
 
-    def __init__(self,string):
-        self.__name__='logicalToken'
+    #Matchers which detect the token at the front of a string:
+    detectMatchers=(orMatcher,andMatcher)
+
+    def __init__(self,string,pos=0):
         self.inputString=string
-        self.logicalToken=self.get_type()
+        self.pos=pos
+        #Get the separator span and type once:
+        mtch,self.logicalToken=self.get_type()
+        self.set_match(mtch)
 
     def __repr__(self):
-        return(self.get_type().__repr__())
+        return(self.logicalToken.__repr__())
 
-    def detectFun(self):
-        if orMatcher(self.inputString) or andMatcher(self.inputString):
-            return(True)
-        else:
-            return(False)
-    
-    def matchFun(self):
-        if self.detectFun():
-            if orMatcher(self.inputString):
-                return(orMatcher(self.inputString,presence=False))
-            elif andMatcher(self.inputString):
-                return(andMatcher(self.inputString,presence=False))
-        else:
-            return(None)
-    
     def get_type(self):
-        if self.detectFun():
-            mtch=self.matchFun()
-            if orMatcher(self.inputString):
-                return(or_separator(mtch.group()))
-            elif andMatcher(self.inputString):
-                return(and_separator(mtch.group()))
-        else:
-            return(None)
+        mtch=orMatcher(self.inputString,presence=False,pos=self.pos)
+        if mtch is not None:
+            return(mtch,or_separator(self.inputString,mtch.start(),mtch.end()))
+        mtch=andMatcher(self.inputString,presence=False,pos=self.pos)
+        if mtch is not None:
+            return(mtch,and_separator(self.inputString,mtch.start(),mtch.end()))
+        return(None,None)
 
 class or_separator(logicalToken):
 
-    def __init__(self,string):
-        self.__name__='or_separator'
-        self.inputString=string
+    __slots__=()
+    kind='or_separator'
+
+    detectMatchers=(orMatcher,)
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
 
     def __repr__(self):
         return('Logical OR')
 
 class and_separator(logicalToken):
 
-    def __init__(self,string):
-        self.__name__='and_separator'
-        self.inputString=string
+    __slots__=()
+    kind='and_separator'
+
+    detectMatchers=(andMatcher,)
+
+    def __init__(self,string,start=0,end=None):
+        self.set_span(string,start,end)
     
     def __repr__(self):
         return('Logical AND')
@@ -1217,12 +1317,127 @@ class and_separator(logicalToken):
 # Default Lexer:
 #######################
 
-lexer=LexerClass(lexicon=[reactionToken,constraintToken,entityToken,multiToken,logicalToken],ukToken=unknownToken)
+#Shared entity tokens, keyed on their matched text:
+entityInterner=TokenInterner(freeze=spanToken.freeze)
+
+#Token classes that can start with a given character.
+# Any other character is tried as an entity first:
+tokenDispatch={
+    '{':[reactionToken],
+    '[':[reactionToken,entityToken],
+    '!':[constraintToken],
+    'n':[constraintToken],
+    '@':[constraintToken],
+    '=':[constraintToken],
+    '>':[constraintToken],
+    '<':[constraintToken,multiToken],
+    '|':[logicalToken],
+    '&':[logicalToken]
+}
+#Transport entities can start with any character
+# that comes before their compartment arrows:
+tokenDispatchGuards=[(transportArrowMatcher,[entityToken])]
+
+#Every character a token can start with: the dispatched
+# characters, modification positions, wildcards and the
+# first letters of the entity lexicons.  Transport entities
+# can start anywhere before their compartment arrows:
+tokenStartLexicons=['monosaccharides','Nucleotides','Aglyca','Substrates']
+tokenStartChars=set(tokenDispatch)|set('0123456789.')|set([w[0] for k in tokenStartLexicons for w in entityDict[k]])
+tokenStartGuards=[transportArrowMatcher]
+
+lexer=LexerClass(lexicon=[reactionToken,constraintToken,entityToken,multiToken,logicalToken],ukToken=unknownToken,positional=True,
+    dispatch=tokenDispatch,dispatchDefault=[entityToken],dispatchGuards=tokenDispatchGuards,
+    startChars=tokenStartChars,startGuards=tokenStartGuards)
+#Cached lexer for the fragments nested in reaction
+# and multi-entity tokens:
+ligandLexer=CachedLexer(lexer,maxsize=4096,freeze=spanToken.freeze)
+#Furthest a token reads past its own end, other than
+# when it looks for a closing bracket: one lexicon word
+# and its brackets or linkage.
+relexLookahead=2*max([len(w) for k in entityDict for w in entityDict[k]])
+#Monosaccharide modification reactions ending at the
+# first "}", tried before the "{A->B}" form:
+modReactionPattern=re.compile('\{\!?\,\d\}|\{\!?\d?\D+?\}')
+
+def relex_restart(inputString,editStart):
+    '''
+    Returns the earliest index from which tokens may 
+    read text at or after "editStart", for incremental
+    lexing.
+
+    Tokens only read "relexLookahead" characters past
+    their end, except at "{" and "<", which are read
+    up to their closing "}" or ">" (or "->" then "}"
+    for monosaccharide reactions).  Unless these close
+    well before the edit, the lexer restarts at them.
+    '''
+    limit=max(editStart-relexLookahead,0)
+    restart=limit
+    for opener in re.finditer('[\{\<]',inputString[:editStart]):
+        p=opener.start()
+        if opener.group()=='<':
+            closed=inputString.find('>',p+2,limit)!=-1
+        else:
+            arrow=inputString.find('->',p+2,limit)
+            closed=inputString.find('}',p+2,limit)!=-1 and (
+                modReactionPattern.match(inputString,p,limit) is not None or (arrow!=-1 and inputString.find('}',arrow+2,limit)!=-1))
+        if not closed:
+            restart=min(restart,p)
+    return(restart)
+
+#Re-lexes edited rule strings from their previous tokens:
+incrementalLexer=IncrementalLexer(lexer,restart=relex_restart,guards=[transportArrowMatcher])
+
+def clear_lexer_caches():
+    '''
+    Drops the tokens the lexers share between rules:
+    the lexed ligand fragments and the interned
+    entity tokens.
+    '''
+    ligandLexer.cache_clear()
+    entityInterner.clear()
+
+def lexicon_changed(name,words):
+    '''
+    Brings the lexers up to date after "words" are
+    registered in the "name" lexicon: the characters
+    tokens can start with and the re-lexing lookahead.
+    Tokens lexed with the old lexicon are dropped from
+    the caches.
+    '''
+    global relexLookahead
+    if name in tokenStartLexicons:
+        tokenStartChars.update([w[0] for w in words])
+        lexer.set_start_chars(tokenStartChars,tokenStartGuards)
+    relexLookahead=max(relexLookahead,2*max([len(w) for w in words]))
+    clear_lexer_caches()
+
+lexiconRegistry.listeners.append(lexicon_changed)
+
+def regex_backend_changed(name):
+    '''
+    Recompiles the lexers' own patterns with the new
+    regex backend.  Tokens lexed with the old backend
+    are dropped from the caches.
+    '''
+    lexer.set_start_chars(tokenStartChars,tokenStartGuards)
+    clear_lexer_caches()
+
+regexBackendListeners.append(regex_backend_changed)
 
 #########################
 # Unexpected Token Errors
 #########################
 
+class frozenTokenError(AttributeError):
+
+    def __init__(self,tok,name):
+        self.token=tok
+        self.name=name
+        self.msg="Can't set \"%s\" of a %s shared by the lexer caches" %(name,type(tok).__name__)
+        super().__init__(self.msg)
+
 class unexpectedTokenError(Exception):
 
     def __init__(self,expect_t,t):
@@ -1,11 +1,20 @@
 import re
+import sys
+import signal
+import warnings
+import threading
+import regexBackends
+
+#Possessive quantifiers and atomic groups, used
+# by safe matching, need python 3.11:
+possessiveSupported=sys.version_info>=(3,11)
 
 #########################################
 # Rule and Attribute Class Matching Class
 #########################################
 class matcherClass:
 
-    def __init__(self,regex,front=True):
+    def __init__(self,regex,front=True,safeRegex=None,requires=()):
         '''
         The matcherClass stores regular expression
         information used to lexicographically 
@@ -15,26 +24,108 @@ class matcherClass:
         to find matches within the rule string, starting
         at the beginning of the string.
 
+        "safeRegex" is an equivalent pattern written with
+        atomic groups and possessive quantifiers, used in
+        safe matching mode.  "requires" lists substrings
+        every match contains; in safe matching mode the
+        search stops early when one is missing.
         '''
+        self.regex=regex
+        self.front=front
         self.matchString=regex
         #Append "^" for stepping into the rule string.
         if front:
             self.matchString='^'+regex
         else:
             self.matchString=regex
+        self.safeRegex=safeRegex
+        self.requires=requires
+        self.set_safe(False)
+
+    def set_safe(self,safe):
+        '''
+        Compiles the matcher pattern, from "safeRegex"
+        in safe matching mode.
+        '''
+        if safe and not possessiveSupported:
+            raise Exception('Safe matching needs python 3.11 or later')
+        self.safe=safe
+        #Compile once: "front" matchers are anchored
+        # with pattern.match instead of the "^":
+        self.pattern=regexBackends.compile(self.safeRegex if safe and self.safeRegex is not None else self.regex)
+
+    def search(self,string,pos=0):
+        if self.safe:
+            for lit in self.requires:
+                if string.find(lit,pos)<0:
+                    return(None)
+        if matchBudget is not None:
+            return(budget_guard(self.pattern.pattern,string,self.search_pattern,string,pos))
+        return(self.search_pattern(string,pos))
 
-    def search(self,string):
-        return(re.search(self.matchString,string))
+    def search_pattern(self,string,pos=0):
+        if self.front:
+            return(self.pattern.match(string,pos))
+        else:
+            return(self.pattern.search(string,pos))
 
-    def isPresent(self,string):
-        searchRes=self.search(string)
+    def isPresent(self,string,pos=0):
+        searchRes=self.search(string,pos)
         return(True if searchRes is not None else False)
 
-    def __call__(self,string,presence=True):
+    def __call__(self,string,presence=True,pos=0):
         if presence:
-            return(self.isPresent(string))
+            return(self.isPresent(string,pos))
         else:
-            return(self.search(string))
+            return(self.search(string,pos))
+
+###############
+# Lexicon Tries
+###############
+
+class LexiconTrie:
+
+    def __init__(self,lexicon):
+        '''
+        Character trie of the words in a lexicon.
+
+        The trie is written out as a regular expression
+        with one branch per distinct character, so words
+        sharing a prefix are only read once:
+
+        Lexicon: [GlcNAc,GlcN,GlcA,Glc,Gal]
+        OUTPUT:  G(?:al|lc(?:A|N(?:Ac)?)?)
+
+        Each branch is optional where a word ends, and
+        the "?" is greedy, so the longest word is always
+        tried first regardless of the lexicon order.
+        '''
+        self.root=dict()
+        for word in lexicon:
+            self.insert(word)
+
+    def insert(self,word):
+        node=self.root
+        for ch in word:
+            node=node.setdefault(ch,dict())
+        #None marks the end of a word:
+        node[None]=True
+
+    def to_regex(self,node=None):
+        '''
+        Returns the regular expression for the words
+        below "node" (the whole trie by default).
+        '''
+        node=self.root if node is None else node
+        branches=[re.escape(ch)+self.to_regex(child) for ch,child in sorted([(k,v) for k,v in node.items() if k is not None])]
+        if len(branches)==0:
+            return('')
+        if len(branches)==1 and None not in node:
+            return(branches[0])
+        pattern='(?:'+'|'.join(branches)+')'
+        if None in node:
+            pattern+='?'
+        return(pattern)
 
 ############################
 # Lexion-based Matcher Class
@@ -42,7 +133,7 @@ class matcherClass:
 
 class LexMatcher:
 
-    def __init__(self,*args,regex=None,front=True):
+    def __init__(self,*args,regex=None,front=True,engine='alternation',safeRegex=None):
         '''
         The LexMatcher class creates a regular expression
         function which searches for expected values 
@@ -60,12 +151,53 @@ class LexMatcher:
         front=True
         OUTPUT
         Search String: "^(Gal|Glc|GlcNAc)\[.+?\]"
+
+        "engine" sets how each lexicon is written into
+        the pattern:
+        - "alternation" (default): the words joined in
+          lexicon order, as in the example above.
+        - "trie": a LexiconTrie alternation, which tries
+          the longest word first whatever the lexicon
+          order, "^(G(?:al|lc(?:NAc)?))\[.+?\]".  On the
+          rule corpus it is no faster than the 
+          alternation, so it is only used when switched
+          on with "set_lexicon_engine('trie')".
+
+        "safeRegex" is an equivalent "regex" written with
+        atomic groups and possessive quantifiers, used in
+        safe matching mode.
         '''
         self.lexicons=args
         self.regex=regex
+        self.front=front
+        self.safeRegex=safeRegex
+        self.safe=False
+        self.set_engine(engine)
+
+    def set_safe(self,safe):
+        '''
+        Rebuilds the matcher pattern, from "safeRegex"
+        in safe matching mode.
+        '''
+        if safe and not possessiveSupported:
+            raise Exception('Safe matching needs python 3.11 or later')
+        self.safe=safe
+        self.set_engine(self.engine)
+
+    def set_engine(self,engine):
+        '''
+        Builds and compiles the matcher pattern with
+        the "trie" or "alternation" lexicon engine.
+        '''
+        if engine not in ['trie','alternation']:
+            raise Exception('Unknown lexicon engine: %s' %(engine))
+        self.engine=engine
         self.lexRegex=self.make_regex()
+        #Compile once: "front" matchers are anchored
+        # with pattern.match instead of the "^":
+        self.pattern=regexBackends.compile(self.lexRegex)
         #Append "^" for stepping into the rule string.
-        if front:
+        if self.front:
             self.lexRegex='^'+self.lexRegex
     
     def make_regex(self):
@@ -78,11 +210,15 @@ class LexMatcher:
         lexicon in the right place.
         '''
         #Create lexicon patterns for every kwargs input:
-        lexPatterns=['('+'|'.join([re.escape(i) for i in x])+')' for x in self.lexicons]
+        if self.engine=='trie':
+            lexPatterns=['('+LexiconTrie(x).to_regex()+')' for x in self.lexicons]
+        else:
+            lexPatterns=['('+'|'.join([re.escape(i) for i in x])+')' for x in self.lexicons]
         #lexPattern='('+'|'.join([re.escape(x) for x in self.lexicon])+')'
-        if self.regex is not None:
+        template=self.safeRegex if self.safe and self.safeRegex is not None else self.regex
+        if template is not None:
             #Replace "%s"s with regex patterns in "lexPatterns":
-            regex=self.regex %(tuple(lexPatterns))
+            regex=template %(tuple(lexPatterns))
             return(regex)
         else:
             if len(lexPatterns)>1:
@@ -91,18 +227,26 @@ class LexMatcher:
                 lexPattern=lexPatterns[0]
             return(lexPattern)
 
-    def search(self,string):
-        return(re.search(self.lexRegex,string))
+    def search(self,string,pos=0):
+        if matchBudget is not None:
+            return(budget_guard(self.pattern.pattern,string,self.search_pattern,string,pos))
+        return(self.search_pattern(string,pos))
+
+    def search_pattern(self,string,pos=0):
+        if self.front:
+            return(self.pattern.match(string,pos))
+        else:
+            return(self.pattern.search(string,pos))
 
-    def isPresent(self,string):
-        searchRes=self.search(string)
+    def isPresent(self,string,pos=0):
+        searchRes=self.search(string,pos)
         return(True if searchRes is not None else False)
 
-    def __call__(self,string,presence=False):
+    def __call__(self,string,presence=False,pos=0):
         if presence:
-            return(self.isPresent(string))
+            return(self.isPresent(string,pos))
         else:
-            return(self.search(string))
+            return(self.search(string,pos))
 
 ####################
 # Reaction Matchers:
@@ -134,18 +278,24 @@ entityDict={
 monoMatcher=LexMatcher(entityDict['monosaccharides'],
         entityDict['Compartments'],
         entityDict['Modifications'],
-        regex="\[?%s(\[%s\])*((?:\d\,|\,\d|\d|\<.+?\>)*)((?:\{\!?\,\d\}|\{\!?\d?\D+?\}|\{.+?\<?\-\>.+?\}))*%s*(\([ab\?][12\?]\-[\d\?]\))*\]?")
+        regex="\[?%s(\[%s\])*((?:\d\,|\,\d|\d|\<.+?\>)*)((?:\{\!?\,\d\}|\{\!?\d?\D+?\}|\{.+?\<?\-\>.+?\}))*%s*(\([ab\?][12\?]\-[\d\?]\))*\]?",
+        safeRegex="\[?+%s(\[%s\])*+((?:\d\,|\,\d|\d|\<(?>.+?\>))*+)((?:\{\!?\,\d\}|\{\!?\d?(?>\D+?\})|\{(?>.+?\<?\-\>)(?>.+?\})))*+%s*+(\([ab\?][12\?]\-[\d\?]\))*+\]?")
 #Sugar Nucleotide Matching:
 nucleotideSugarMatcher=LexMatcher(entityDict['Nucleotides'],entityDict['monosaccharides'],regex="%s\-%s")
 #Modification Matcher
 modMatcher=LexMatcher(entityDict['Modifications'],regex="\d%s",front=True)
 modMatcher_middle=LexMatcher(entityDict['Modifications'],regex="\d%s",front=False)
 #Aglycon Matcher:
-aglyconMatcher=LexMatcher([x for x in entityDict['Aglyca']],front=True)
+aglyconMatcher=LexMatcher(entityDict['Aglyca'],front=True)
 #Compartment Matcher:
 compartmentMatcher=LexMatcher(entityDict['Compartments'],regex='\[%s\]',front=True)
 #Transport Matcher:
-transportMatcher=matcherClass('.+?\{\[.+?\]\-\>\[.+?\]\}')
+transportMatcher=matcherClass('.+?\{\[.+?\]\-\>\[.+?\]\}',
+        safeRegex='(?>.+?\{\[)(?>.+?\]\-\>\[)(?>.+?\]\})',requires=('{[',']->[',']}'))
+#Finds the compartment arrows of a transport ahead
+# of the current position:
+transportArrowMatcher=matcherClass('\{\[.+?\]\-\>\[.+?\]\}',front=False,
+        safeRegex='\{\[(?>.+?\]\-\>\[)(?>.+?\]\})',requires=('{[',']->[',']}'))
 #Protein Constraints:
 proteinConstraintMatcher=LexMatcher(entityDict['ProteinConstraints'],regex="\[%s\]")
 #Substrate Matcher:
@@ -164,8 +314,10 @@ negationRuleMatcher=LexMatcher(entityDict['monosaccharides'],regex="\!(?=%s)")
 reactionMatcher=matcherClass('\[?\{.+?\}\]?')
 additionMatcher=matcherClass('\{(?!\!).*?\}')
 subtractionMatcher=matcherClass('\{(?=\!).*?\}')
-substitutionMatcher=matcherClass('\{.*?\-\>.*?\}')
-reversibleMatcher=matcherClass('\{.*?\<\-\>.*?\}')
+substitutionMatcher=matcherClass('\{.*?\-\>.*?\}',
+        safeRegex='\{(?>.*?\-\>)(?>.*?\})',requires=('->','}'))
+reversibleMatcher=matcherClass('\{.*?\<\-\>.*?\}',
+        safeRegex='\{(?>.*?\<\-\>)(?>.*?\})',requires=('<->','}'))
 #Terminal Addition Matcher:
 termAdditionMatcher=matcherClass('\[\{(?!\!).*?\}')
 termSubtractionMatcher=matcherClass('\[\{(?=\!).*?\}')
@@ -199,3 +351,221 @@ quantifierMatcher=matcherClass('(\=|\>\=|\<\=|\>|\<)(\d)')
 #######################
 orMatcher=matcherClass('\|')
 andMatcher=matcherClass('\&')
+
+###########################
+# Compiled Matcher Registry
+###########################
+#Every matcher defined above, keyed on its name.
+# Patterns are compiled once when the matcher is
+# created, and recompiled in place by the functions
+# below that switch how every matcher is built:
+matcherRegistry={name:m for name,m in list(globals().items()) if isinstance(m,(matcherClass,LexMatcher))}
+
+def set_lexicon_engine(engine):
+    '''
+    Rebuilds every registered LexMatcher with the 
+    "alternation" (default) or "trie" lexicon engine.
+    '''
+    for m in matcherRegistry.values():
+        if isinstance(m,LexMatcher):
+            m.set_engine(engine)
+
+##################
+# Lexicon Registry
+##################
+
+class LexiconRegistry:
+
+    def __init__(self,lexicons,matchers):
+        '''
+        Registry of the entity lexicons ("entityDict")
+        the matchers are built from.
+
+        Words can be registered at run time: the lexicon
+        list is extended in place and only the matchers
+        built from that lexicon are rebuilt, in place, so
+        everything holding them sees the new words.
+
+        "version" goes up with every change.  Objects
+        built from the lexicons (cached tokens, compiled
+        rules) store it to tell when they are stale.
+        Functions in "listeners" are called with the
+        lexicon name and the new words once the matchers
+        are rebuilt.
+        '''
+        self.lexicons=lexicons
+        self.matchers=matchers
+        self.version=0
+        self.listeners=[]
+
+    def __getitem__(self,name):
+        return(self.lexicons[name])
+
+    def dependents(self,name):
+        '''
+        Returns the registered matchers built from the
+        "name" lexicon, keyed on matcher name.
+        '''
+        words=self.lexicons[name]
+        return({mName:m for mName,m in self.matchers.items() if isinstance(m,LexMatcher) and any([lex is words for lex in m.lexicons])})
+
+    def register(self,name,*words):
+        '''
+        Adds "words" to the "name" lexicon and rebuilds
+        the matchers that depend on it.  Returns the
+        lexicon version, unchanged if every word was
+        already known.
+
+        Example:
+        lexiconRegistry.register('monosaccharides','Kdn9Ac')
+        '''
+        if name not in self.lexicons:
+            raise Exception('Unknown lexicon: %s' %(name))
+        lexicon=self.lexicons[name]
+        newWords=[w for w in dict.fromkeys(words) if len(w)>0 and w not in lexicon]
+        if len(newWords)==0:
+            return(self.version)
+        lexicon.extend(newWords)
+        for m in self.dependents(name).values():
+            m.set_engine(m.engine)
+        self.version+=1
+        for fun in self.listeners:
+            fun(name,newWords)
+        return(self.version)
+
+lexiconRegistry=LexiconRegistry(entityDict,matcherRegistry)
+
+#Called with the backend name after the regex backend
+# changes, to recompile patterns built outside the
+# matcher registry:
+regexBackendListeners=[]
+
+def set_regex_backend(name):
+    '''
+    Makes "name" ("re", "rule", or "regex" when the
+    regex module is installed) the regular expression
+    backend, and recompiles every registered matcher
+    with it.
+    '''
+    regexBackends.set_backend(name)
+    for m in matcherRegistry.values():
+        m.set_safe(m.safe)
+    for fun in regexBackendListeners:
+        fun(name)
+
+def set_safe_matching(safe):
+    '''
+    Switches every registered matcher between its
+    backtracking pattern and the equivalent "safe"
+    pattern built from atomic groups and possessive
+    quantifiers.
+    '''
+    for m in matcherRegistry.values():
+        m.set_safe(safe)
+
+##############
+# Match Budget
+##############
+#Wall time (seconds) any one match may run for,
+# None for no limit:
+matchBudget=None
+#Reports of the matches that ran over budget:
+budgetViolations=[]
+#Number of matches run without a timer while a budget
+# is set (off the main thread, or without SIGALRM):
+budgetBypasses=0
+#Whether the SIGALRM handler of the budget is installed,
+# and the handler it replaced:
+budgetTimer=False
+previousAlarmHandler=None
+#(pattern,string,budget) of the match being timed:
+guardedMatch=None
+
+class matchBudgetError(Exception):
+
+    def __init__(self,pattern,string,budget):
+        self.pattern=pattern
+        self.string=string
+        self.budget=budget
+        super().__init__('Match ran over its %.3fs budget: pattern %s on a string of length %d' %(budget,pattern,len(string)))
+
+    def report(self):
+        return({'pattern':self.pattern,'string':self.string,'budget':self.budget})
+
+def set_match_budget(seconds):
+    '''
+    Aborts any match that runs longer than "seconds"
+    with a matchBudgetError.  None removes the limit.
+
+    The SIGALRM handler is installed once, when a
+    budget is first set, and the previous handler is
+    put back when the limit is removed.  Timers only
+    work in the main thread: a budget set elsewhere,
+    or on a platform without SIGALRM, is counted in
+    "budgetBypasses" for every match it can't guard.
+    '''
+    global matchBudget,budgetTimer,previousAlarmHandler
+    onMainThread=hasattr(signal,'SIGALRM') and threading.current_thread() is threading.main_thread()
+    if seconds is not None and not budgetTimer and onMainThread:
+        previousAlarmHandler=signal.signal(signal.SIGALRM,budget_expired)
+        budgetTimer=True
+    elif seconds is None and budgetTimer and onMainThread:
+        signal.signal(signal.SIGALRM,previousAlarmHandler)
+        budgetTimer,previousAlarmHandler=False,None
+    matchBudget=seconds
+
+def budget_expired(signum,frame):
+    '''
+    SIGALRM handler of the match budget.
+    '''
+    if guardedMatch is not None:
+        raise matchBudgetError(*guardedMatch)
+
+def budget_bypassed():
+    '''
+    Counts a match run without a timer while a budget
+    is set, with a warning the first time.
+    '''
+    global budgetBypasses
+    budgetBypasses+=1
+    if budgetBypasses==1:
+        warnings.warn('The match budget can only be enforced in the main thread on platforms with SIGALRM, matches elsewhere run unguarded (counted in tokenMatchers.budgetBypasses)',RuntimeWarning,stacklevel=3)
+
+def budget_guard(pattern,string,fun,*args):
+    '''
+    Runs "fun" with the budget timer set.  A match
+    running over budget is aborted, reported in 
+    "budgetViolations" and raised as a matchBudgetError.
+    Where no timer can be set "fun" runs unguarded, 
+    see "set_match_budget".
+    '''
+    global guardedMatch
+    if matchBudget is None:
+        return(fun(*args))
+    if not budgetTimer or threading.current_thread() is not threading.main_thread():
+        budget_bypassed()
+        return(fun(*args))
+    guardedMatch=(pattern,string,matchBudget)
+    signal.setitimer(signal.ITIMER_REAL,matchBudget)
+    try:
+        return(fun(*args))
+    except matchBudgetError as e:
+        budgetViolations.append(e.report())
+        raise
+    finally:
+        signal.setitimer(signal.ITIMER_REAL,0)
+        guardedMatch=None
+
+def budget_finditer(regex,string):
+    '''
+    finditer for the patterns built from rules, run
+    within the match budget.  "regex" is a compiled
+    pattern, or a pattern string compiled with the
+    active regex backend.  Matches are collected up
+    front when a budget is set, so the whole search
+    is timed.
+    '''
+    pattern=regexBackends.compile(regex) if isinstance(regex,str) else regex
+    if matchBudget is None:
+        return(pattern.finditer(string))
+    return(iter(budget_guard(pattern.pattern,string,lambda: list(pattern.finditer(string)))))